@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from catalog import pagination as keyset
+
+class CatalogPagination(PageNumberPagination):
+    """
+    Page numbers by default; keyset pagination when the request has ?cursor=
+
+    Keyset pages are ordered by the view's keyset_ordering (falling back to the
+    model's Meta.ordering), skip the COUNT(*) and cost the same at any depth.
+    Views that set keyset_default are always keyset paginated.
+    """
+
+    cursor_query_param = keyset.CURSOR_PARAM
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_page = None
+        if self.cursor_query_param not in request.query_params and not getattr(view, "keyset_default", False):
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        ordering = getattr(view, "keyset_ordering", None) or queryset.model._meta.ordering
+        try:
+            self.keyset_page = keyset.paginate(
+                queryset, ordering, request.query_params.get(self.cursor_query_param, ""), page_size,
+            )
+        except keyset.InvalidCursor:
+            raise NotFound("Invalid cursor.")
+        self.request = request
+        self.display_page_controls = False
+        return self.keyset_page.object_list
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ("next", self.get_cursor_link(self.keyset_page.next_cursor)),
+            ("previous", self.get_cursor_link(self.keyset_page.previous_cursor)),
+            ("results", data),
+        ]))
+
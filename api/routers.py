@@ -0,0 +1,11 @@
+from rest_framework.routers import DefaultRouter, Route
+
+class BulkRouter(DefaultRouter):
+    """
+    DefaultRouter that also routes PATCH on the list URL to bulk_partial_update
+    """
+    routes = [
+        route._replace(mapping={**route.mapping, 'patch': 'bulk_partial_update'})
+        if isinstance(route, Route) and not route.detail else route
+        for route in DefaultRouter.routes
+    ]
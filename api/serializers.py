@@ -1,18 +1,127 @@
+import datetime
+
+from django.contrib.auth.models import User
 from rest_framework import serializers
 
-from catalog.models import Author, Book, BookInstance
+from catalog.models import Author, Book, BookInstance, Genre, Hold, Language
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+def requested(request, param):
+    """the comma-separated names of a query parameter, or None without it"""
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class DynamicFieldsMixin:
+    """
+    On reads, keep only the fields named by ?fields= and nest the related
+    objects named by ?expand= (those in Meta.expandable, which names their
+    serializers) instead of linking them. Nested serializers are left alone: they have no request yet when
+    they are created.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        fields = requested(request, FIELDS_PARAM)
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+        expandable = getattr(self.Meta, 'expandable', {})
+        for name in (requested(request, EXPAND_PARAM) or set()) & set(expandable) & set(self.fields):
+            many = isinstance(self.fields[name], serializers.ManyRelatedField)
+            self.fields[name] = globals()[expandable[name]](many=many, read_only=True)
+
+# expanded related objects: primary keys and plain values, no hyperlinks
+class CompactGenreSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Genre
+        fields = ['id', 'name']
+
+class CompactLanguageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Language
+        fields = ['id', 'name']
 
-class AuthorSerializer(serializers.HyperlinkedModelSerializer):
+class AuthorSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Author
         fields = ['last_name', 'first_name', 'middle_name']
 
-class BookSerializer(serializers.HyperlinkedModelSerializer):
+class BookSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
+    class Meta:
+        model = Book
+        fields = ['title', 'author', 'isbn', 'genre', 'language', 'copies_total', 'copies_available']
+        # nested serializers by name, as they may be defined further down
+        expandable = {'author': 'CompactAuthorSerializer', 'genre': 'CompactGenreSerializer', 'language': 'CompactLanguageSerializer'}
+
+class BookInstanceSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
+    class Meta:
+        model = BookInstance
+        fields = ['id', 'book', 'imprint', 'status']
+        expandable = {'book': 'CompactBookSerializer'}
+
+class GenreSerializer(serializers.HyperlinkedModelSerializer):
+    class Meta:
+        model = Genre
+        fields = ['name']
+
+class LanguageSerializer(serializers.HyperlinkedModelSerializer):
+    class Meta:
+        model = Language
+        fields = ['name']
+
+# compact representations: primary keys instead of hyperlinks, so no URL
+# has to be reversed per related object
+class CompactAuthorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Author
+        fields = ['id', 'last_name', 'first_name', 'middle_name']
+
+class CompactBookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
-        fields = ['title', 'author', 'isbn', 'genre', 'language']
+        fields = ['id', 'title', 'author', 'isbn', 'genre', 'language', 'copies_total', 'copies_available']
+        expandable = BookSerializer.Meta.expandable
+
+class CompactBookInstanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = BookInstance
+        fields = ['id', 'book', 'imprint', 'status']
+        expandable = BookInstanceSerializer.Meta.expandable
+
+class OverdueLoanSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='book.title', read_only=True)
+    borrower = serializers.CharField(source='borrower.username', read_only=True, default=None)
 
-class BookInstanceSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = BookInstance
-        fields = ['id', 'book', 'imprint', 'status']
\ No newline at end of file
+        fields = ['id', 'book', 'title', 'borrower', 'due_back']
+
+# checkout desk: a loan is a copy with its borrower and due date
+class LoanSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookInstance
+        fields = ['id', 'book', 'imprint', 'status', 'borrower', 'due_back']
+
+class CheckoutSerializer(serializers.Serializer):
+    borrower = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    due_back = serializers.DateField(required=False)
+
+    def validate_due_back(self, value):
+        if value < datetime.date.today():
+            raise serializers.ValidationError('The due date is in the past.')
+        return value
+
+class HoldSerializer(serializers.ModelSerializer):
+    borrower = serializers.PrimaryKeyRelatedField(source='user', queryset=User.objects.all())
+
+    class Meta:
+        model = Hold
+        fields = ['id', 'book', 'borrower', 'placed_at']
+        read_only_fields = ['book']
@@ -1,3 +1,489 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
 
 # Create your tests here.
+class AuthorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        for author_id in range(25):
+            Author.objects.create(first_name=f"First {author_id}", last_name=f"Last {author_id % 7}")
+
+    def setUp(self):
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_page_numbers_by_default(self):
+        response = self.client.get("/api/authors/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 25)
+
+    def test_keyset_pages_cover_all_authors_in_order(self):
+        names = []
+        url = "/api/authors/?cursor="
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any("COUNT" in query["sql"] for query in queries.captured_queries))
+            data = response.json()
+            self.assertNotIn("count", data)
+            names.extend((author["last_name"], author["first_name"]) for author in data["results"])
+            url = data["next"]
+
+        expected = list(Author.objects.values_list("last_name", "first_name"))
+        self.assertEqual(names, expected)
+
+    def test_keyset_previous_link(self):
+        first = self.client.get("/api/authors/?cursor=").json()
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(self.client.get(second["previous"]).json()["results"], first["results"])
+
+class ConditionalRequestTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        author = Author.objects.create(first_name="Iain", last_name="Banks")
+        cls.book = Book.objects.create(title="Excession", summary="Minds", isbn="EXCESSION", author=author)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint="Orbit, 1996", status="a")
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_list_and_detail_are_not_modified(self):
+        for url in ("/api/books/", f"/api/books/{self.book.pk}/", "/api/copies/", f"/api/copies/{self.copy.pk}/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.has_header("Last-Modified"))
+            # session, user; the cached response carries Last-Modified
+            with self.assertNumQueries(2):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 304)
+
+    def test_copy_write_changes_the_book_list(self):
+        etag = self.client.get("/api/books/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.copy.status = "o"
+            self.copy.save()
+        response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["copies_available"], 0)
+
+    def test_unknown_copy_is_not_found(self):
+        self.assertEqual(self.client.get("/api/copies/not-a-uuid/").status_code, 404)
+
+class ResponseCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        cls.author = Author.objects.create(first_name="Iain", last_name="Banks")
+        cls.book = Book.objects.create(title="Excession", summary="Minds", isbn="EXCESSION", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_hits_skip_the_orm_and_the_serializer(self):
+        for url in ("/api/authors/", f"/api/books/{self.book.pk}/", "/api/books/?fields=title&page=1"):
+            first = self.client.get(url)
+            # session, user
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, first.content)
+            self.assertEqual(response["ETag"], first["ETag"])
+            self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_query_string_order_does_not_matter(self):
+        self.client.get("/api/books/?page=1&fields=title")
+        with self.assertNumQueries(2):
+            self.client.get("/api/books/?fields=title&page=1")
+
+    def test_writes_supersede_entries(self):
+        self.client.get("/api/authors/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = "Iain M."
+            self.author.save()
+        response = self.client.get("/api/authors/")
+        self.assertEqual(response.json()["results"][0]["first_name"], "Iain M.")
+
+    # the committed staticfiles manifest has no entries for DRF's assets
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_browsable_api_is_not_cached(self):
+        self.client.get("/api/authors/", HTTP_ACCEPT="text/html")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/authors/", HTTP_ACCEPT="text/html")
+        self.assertGreater(len(queries), 2)
+
+class BookReadPathTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        author = Author.objects.create(first_name="Iain", last_name="Banks")
+        language = Language.objects.create(name="English")
+        genres = [Genre.objects.create(name=name) for name in ("Science Fiction", "Space Opera")]
+        for number in range(10):
+            book = Book.objects.create(title=f"Culture {number}", summary="Minds", isbn=f"CULTURE{number}", author=author, language=language)
+            book.genre.set(genres)
+            BookInstance.objects.create(book=book, imprint="Orbit, 1987", status="a")
+
+    def setUp(self):
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_book_list_query_count_is_constant(self):
+        # session, user, Last-Modified, count, books, genres
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/books/")
+        self.assertEqual(response.status_code, 200)
+        book = response.json()["results"][0]
+        self.assertTrue(book["author"].startswith("http://testserver/api/authors/"))
+        self.assertEqual(len(book["genre"]), 2)
+
+    def test_compact_books_use_primary_keys(self):
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/books/?compact=true")
+        book = response.json()["results"][0]
+        genre_ids = sorted(Genre.objects.values_list("id", flat=True))
+        self.assertEqual(book["author"], Author.objects.get().id)
+        self.assertEqual(sorted(book["genre"]), genre_ids)
+
+    def test_copy_list_does_not_load_books(self):
+        # session, user, Last-Modified, count, copies
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/copies/?compact=1")
+        self.assertEqual(len(response.json()["results"]), 10)
+
+class SparseFieldsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        cls.author = Author.objects.create(first_name="Ursula", last_name="Le Guin")
+        language = Language.objects.create(name="English")
+        genres = [Genre.objects.create(name=name) for name in ("Fantasy", "Science Fiction")]
+        for number in range(5):
+            book = Book.objects.create(title=f"Earthsea {number}", summary="Wizards", isbn=f"EARTH{number}", author=cls.author, language=language)
+            book.genre.set(genres)
+            BookInstance.objects.create(book=book, imprint="Parnassus, 1968", status="a")
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_fields_prune_output_and_columns(self):
+        # session, user, Last-Modified, count, books: no genre query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/books/?fields=title,copies_available")
+        self.assertEqual(len(queries), 5)
+        self.assertNotIn("summary", queries[-1]["sql"])
+        book = response.json()["results"][0]
+        self.assertEqual(set(book), {"title", "copies_available"})
+
+    def test_expand_nests_related_objects(self):
+        # session, user, Last-Modified, count, books with authors and languages, genres
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/books/?expand=author,genre,language")
+        book = response.json()["results"][0]
+        self.assertEqual(book["author"], {"id": self.author.pk, "last_name": "Le Guin", "first_name": "Ursula", "middle_name": ""})
+        self.assertEqual(sorted(genre["name"] for genre in book["genre"]), ["Fantasy", "Science Fiction"])
+        self.assertEqual(book["language"]["name"], "English")
+
+    def test_expand_book_of_copies(self):
+        # session, user, Last-Modified, count, copies with books, genres
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/copies/?expand=book&fields=id,book")
+        copy = response.json()["results"][0]
+        self.assertEqual(set(copy), {"id", "book"})
+        self.assertTrue(copy["book"]["title"].startswith("Earthsea"))
+        self.assertEqual(len(copy["book"]["genre"]), 2)
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get("/api/books/?fields=title,price&expand=publisher")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"fields", "expand"})
+
+    def test_expanded_author_changes_the_etag(self):
+        url = f"/api/books/{Book.objects.first().pk}/?expand=author"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.author.first_name = "U. K."
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["author"]["first_name"], "U. K.")
+
+    def test_writes_ignore_the_parameters(self):
+        response = self.client.post("/api/authors/?fields=last_name", {"first_name": "Ada", "last_name": "Byron"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["first_name"], "Ada")
+
+class BulkWriteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        cls.book = Book.objects.create(title="Beloved", summary="Sethe", isbn="9781400033416")
+        cls.copies = [BookInstance.objects.create(book=cls.book, imprint="Vintage", status="m") for _ in range(5)]
+
+    def setUp(self):
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_bulk_create_authors(self):
+        payload = [{"first_name": f"Toni {number}", "last_name": "Morrison"} for number in range(3)]
+        response = self.client.post("/api/authors/?compact=true", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(Author.objects.filter(last_name="Morrison").count(), 3)
+
+    def test_bulk_create_books_with_genres(self):
+        genre = Genre.objects.create(name="Literary Fiction")
+        payload = [
+            {"title": "Sula", "isbn": "9781400033430", "genre": [genre.pk]},
+            {"title": "Jazz", "isbn": "9781400076215", "genre": [genre.pk]},
+        ]
+        response = self.client.post("/api/books/?compact=true", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Book.objects.filter(genre=genre).count(), 2)
+
+    def test_bulk_create_is_all_or_nothing_with_per_item_errors(self):
+        genre = Genre.objects.create(name="Literary Fiction")
+        payload = [
+            {"title": "Paradise", "isbn": "9780679433743", "genre": [genre.pk]},
+            {"title": "Duplicate", "isbn": self.book.isbn, "genre": [genre.pk]},
+            {"isbn": "9780375409448", "genre": [genre.pk]},
+        ]
+        response = self.client.post("/api/books/?compact=true", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("isbn", errors[1])
+        self.assertIn("title", errors[2])
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_bulk_create_reports_duplicates_within_the_batch(self):
+        genre = Genre.objects.create(name="Literary Fiction")
+        payload = [
+            {"title": "Sula", "isbn": "9781400033430", "genre": [genre.pk]},
+            {"title": "Sula again", "isbn": "9781400033430", "genre": [genre.pk]},
+        ]
+        response = self.client.post("/api/books/?compact=true", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("isbn", errors[1])
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_bulk_partial_update_reports_duplicates_within_the_batch(self):
+        other = Book.objects.create(title="Sula", summary="", isbn="9781400033430")
+        payload = [{"id": self.book.pk, "isbn": "9781400076215"}, {"id": "x"}, {"id": other.pk, "isbn": "9781400076215"}]
+        response = self.client.patch("/api/books/?compact=true", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual((errors[0], list(errors[1]), list(errors[2])), ({}, ["id"], ["isbn"]))
+
+    def test_bulk_partial_update_copy_status(self):
+        payload = [{"id": str(copy.pk), "status": "a"} for copy in self.copies[:3]]
+        with self.assertNumQueries(9):
+            # session, user, copies, savepoint, one UPDATE, change log, book ids, recount, release
+            response = self.client.patch("/api/copies/?compact=true", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BookInstance.objects.filter(status="a").count(), 3)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.copies_available, self.book.copies_maintenance), (3, 2))
+
+    def test_bulk_partial_update_reports_unknown_ids(self):
+        payload = [{"id": str(self.copies[0].pk), "status": "a"}, {"id": "not-a-uuid", "status": "a"}]
+        response = self.client.patch("/api/copies/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0], {})
+        self.assertIn("id", response.json()["errors"][1])
+        self.assertEqual(BookInstance.objects.filter(status="a").count(), 0)
+
+    @override_settings(API_BULK_MAX_ITEMS=2)
+    def test_batch_size_limit(self):
+        payload = [{"first_name": "A", "last_name": "B"}] * 3
+        response = self.client.post("/api/authors/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+class OverdueEndpointTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        staff = User.objects.create_user(username="librarian", password="1X<ISRUkw+tuK")
+        staff.user_permissions.add(Permission.objects.get(codename="can_mark_returned"))
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        borrowers = [User.objects.create_user(username=f"borrower{number}") for number in range(2)]
+        book = Book.objects.create(title="Overdue", summary="", isbn="1", author=Author.objects.create(last_name="Late"))
+        today = datetime.date.today()
+        for copy in range(12):
+            BookInstance.objects.create(
+                book=book, borrower=borrowers[copy % 2], status="o",
+                due_back=today + datetime.timedelta(days=-(copy + 1) if copy % 3 else 1),
+            )
+
+    def test_requires_permission(self):
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+        self.assertEqual(self.client.get("/api/copies/overdue/").status_code, 403)
+
+    def test_overdue_loans_grouped_by_borrower(self):
+        self.client.login(username="librarian", password="1X<ISRUkw+tuK")
+        loans = []
+        url = "/api/copies/overdue/"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn("count", data)
+            loans.extend(data["results"])
+            url = data["next"]
+
+        self.assertEqual(len(loans), 8)
+        self.assertEqual([loan["borrower"] for loan in loans], ["borrower0"] * 4 + ["borrower1"] * 4)
+        self.assertTrue(all(loan["title"] == "Overdue" for loan in loans))
+        for borrower in ("borrower0", "borrower1"):
+            dates = [loan["due_back"] for loan in loans if loan["borrower"] == borrower]
+            self.assertEqual(dates, sorted(dates))
+
+class CheckoutEndpointTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="librarian", password="1X<ISRUkw+tuK")
+        cls.staff.user_permissions.add(Permission.objects.get(codename="can_mark_returned"))
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        cls.readers = [User.objects.create_user(username=f"reader{number}") for number in range(2)]
+        cls.book = Book.objects.create(title="Checkout", summary="", isbn="1", author=Author.objects.create(last_name="Desk"))
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint="Desk Press, 2000", status="a")
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="librarian", password="1X<ISRUkw+tuK")
+
+    def checkout(self, reader):
+        return self.client.post(f"/api/books/{self.book.pk}/checkout/", {"borrower": reader.pk})
+
+    def test_requires_permission(self):
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+        self.assertEqual(self.checkout(self.readers[0]).status_code, 403)
+
+    def test_checkout_hold_and_checkin(self):
+        response = self.checkout(self.readers[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["id"], response.json()["status"], response.json()["borrower"]), (str(self.copy.pk), "o", self.readers[0].pk))
+        self.assertEqual(self.checkout(self.readers[1]).status_code, 409)
+
+        response = self.client.post(f"/api/books/{self.book.pk}/hold/", {"borrower": self.readers[1].pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["borrower"], self.readers[1].pk)
+
+        response = self.client.post(f"/api/copies/{self.copy.pk}/checkin/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["status"], response.json()["borrower"]), ("r", self.readers[1].pk))
+        self.assertEqual(self.client.post(f"/api/copies/{self.copy.pk}/checkin/").status_code, 409)
+        self.assertEqual(self.checkout(self.readers[1]).status_code, 200)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_on_loan, 1)
+
+    def test_unknown_book_or_copy(self):
+        self.assertEqual(self.client.post("/api/books/999/checkout/", {"borrower": self.readers[0].pk}).status_code, 404)
+        self.assertEqual(self.client.post("/api/copies/not-a-uuid/checkin/").status_code, 404)
+
+class ExportEndpointTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        author = Author.objects.create(first_name="Iain", last_name="Banks")
+        for number in range(15):
+            book = Book.objects.create(title=f"Culture {number}", summary="Minds", isbn=f"CULTURE{number}", author=author)
+            BookInstance.objects.create(book=book, imprint="Orbit, 1987", status="a")
+
+    def setUp(self):
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_whole_catalog_in_one_request(self):
+        response = self.client.get("/api/books/export/ndjson/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        books = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(books), 15)
+        self.assertEqual(books[0]["author_last_name"], "Banks")
+
+    def test_gzipped_csv(self):
+        response = self.client.get("/api/copies/export/csv/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(lines[0], "id,book_id,isbn,title,imprint,status,due_back,updated_at")
+        self.assertEqual(len(lines), 16)
+
+    def test_unknown_format_is_not_found(self):
+        self.assertEqual(self.client.get("/api/books/export/xml/").status_code, 404)
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="apiuser", password="1X<ISRUkw+tuK")
+        cls.author = Author.objects.create(first_name="Ursula", last_name="Le Guin")
+        cls.book = Book.objects.create(title="The Dispossessed", summary="Shevek", isbn="DISPOSSESSED", author=cls.author)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint="Harper, 1974", status="a")
+
+    def setUp(self):
+        self.client.login(username="apiuser", password="1X<ISRUkw+tuK")
+
+    def test_sync_from_the_start_then_deltas(self):
+        response = self.client.get("/api/changes/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([(entry["type"], entry["deleted"]) for entry in data["results"]], [("author", False), ("copy", False), ("book", False)])
+        self.assertEqual(data["results"][2]["data"]["copies_available"], 1)
+        self.assertFalse(data["more"])
+
+        # nothing new
+        self.assertEqual(self.client.get("/api/changes/", {"cursor": data["cursor"]}).json()["results"], [])
+
+        copy_id = str(self.copy.pk)
+        self.copy.delete()
+        self.author.last_name = "Le Guin (1929-2018)"
+        self.author.save()
+        with self.assertNumQueries(6):
+            # session, user, log, books, their genres, authors
+            data = self.client.get("/api/changes/", {"cursor": data["cursor"]}).json()
+        self.assertEqual(data["results"], [
+            {"type": "copy", "id": copy_id, "deleted": True, "data": None},
+            {"type": "book", "id": self.book.pk, "deleted": False, "data": data["results"][1]["data"]},
+            {"type": "author", "id": self.author.pk, "deleted": False, "data": {
+                "id": self.author.pk, "last_name": "Le Guin (1929-2018)", "first_name": "Ursula", "middle_name": "",
+            }},
+        ])
+        self.assertEqual(data["results"][1]["data"]["copies_total"], 0)
+
+    def test_pages(self):
+        cursor, seen = None, []
+        while True:
+            data = self.client.get("/api/changes/", {"limit": 1, **({"cursor": cursor} if cursor else {})}).json()
+            seen.extend(entry["type"] for entry in data["results"])
+            cursor = data["cursor"]
+            if not data["more"]:
+                break
+        self.assertEqual(seen, ["author", "book", "copy", "book"])
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get("/api/changes/", {"cursor": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/changes/", {"limit": 0}).status_code, 400)
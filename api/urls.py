@@ -1,16 +1,21 @@
+from django.conf import settings
 from django.urls import include, path
 
-from rest_framework import routers
-
 from api import views
+from api.routers import BulkRouter
+from local_library.async_views import async_patterns
 
 # register models and add API URLs to their data
-router = routers.DefaultRouter()
+router = BulkRouter()
 router.register(r'authors', views.AuthorViewSet)
 router.register(r'books', views.BookViewSet)
 router.register(r'copies', views.BookInstanceViewSet)
+router.register(r'genres', views.GenreViewSet)
+router.register(r'languages', views.LanguageViewSet)
+router.register(r'changes', views.ChangeFeedViewSet, basename='change')
 
+# reads run as async views when serving under ASGI
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_patterns(router.urls) if settings.ASYNC_VIEWS else router.urls)),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework'))
 ]
\ No newline at end of file
@@ -1,30 +1,580 @@
-from rest_framework import viewsets
-from rest_framework import permissions
-from rest_framework.decorators import permission_classes
+import hashlib
+import re
 
-from api.serializers import AuthorSerializer, BookSerializer, BookInstanceSerializer
-from catalog.models import Author, Book, BookInstance
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import urlencode
+from rest_framework import serializers, viewsets
+from rest_framework import permissions, status
+from rest_framework.decorators import action, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
 
-class AuthorViewSet(viewsets.ModelViewSet):
+from api.serializers import (
+    AuthorSerializer, BookSerializer, BookInstanceSerializer, GenreSerializer, LanguageSerializer,
+    CompactAuthorSerializer, CompactBookSerializer, CompactBookInstanceSerializer, OverdueLoanSerializer,
+    CheckoutSerializer, HoldSerializer, LoanSerializer, EXPAND_PARAM, FIELDS_PARAM, requested,
+)
+from catalog import changes, conditional, export, fragments, loans
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.signals import post_bulk_save
+from local_library import routers
+from local_library.async_views import streaming_content
+
+class CompactSerializerMixin:
+    """
+    Serve the compact (primary key) representation for ?compact=true
+    """
+    compact_serializer_class = None
+
+    def use_compact(self):
+        return self.request is not None and self.request.query_params.get('compact', '').lower() in ('1', 'true')
+
+    def get_serializer_class(self):
+        if self.compact_serializer_class is not None and self.use_compact():
+            return self.compact_serializer_class
+        return super().get_serializer_class()
+
+class ConditionalMixin:
+    """
+    ETag and Last-Modified on list and retrieve, answering a matching
+    If-None-Match / If-Modified-Since with 304 before anything is loaded
+
+    The ETag hashes the catalog fragment versions of what the response shows
+    (list_etag_names, or get_object_etag_names() for one object); Last-Modified
+    is MAX(updated_at) over the model, or the object's updated_at.
+    """
+    list_etag_names = ()
+
+    def get_object_etag_names(self, pk):
+        return list(self.list_etag_names)
+
+    def get_extra_etag_names(self):
+        """names of related objects shown on request, for both list and retrieve"""
+        return []
+
+    def conditional(self, request, queryset, names, get_response):
+        return conditional.respond(
+            request,
+            conditional.etag(names, [request.accepted_renderer.format]),
+            conditional.last_modified(queryset),
+            get_response,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            request, self.get_queryset().model.objects.all(), list(self.list_etag_names) + self.get_extra_etag_names(),
+            lambda: super(ConditionalMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        try:
+            pk = model._meta.pk.to_python(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except DjangoValidationError:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional(
+            request, model.objects.filter(pk=pk), list(self.get_object_etag_names(pk)) + self.get_extra_etag_names(),
+            lambda: super(ConditionalMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+class ResponseCacheMixin:
+    """
+    Serve JSON list and retrieve responses pre-rendered from the shared cache
+
+    An entry is keyed on the response's ETag (the catalog fragment versions of
+    what it shows, see ConditionalMixin), the URL with its query string
+    sorted, and the user's permission scope: the cache_scope_permissions they
+    hold. Writes bump the versions and with them the key, so entries are never
+    deleted one by one; superseded ones are not read again and expire. A hit
+    runs no query beyond authentication, and no serializer. Users pinned to
+    the primary database after a write bypass the cache.
+    """
+    cache_scope_permissions = ()
+
+    def use_response_cache(self, request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and request.accepted_renderer.format == 'json'
+            and not routers.is_pinned(request.user)
+        )
+
+    def get_response_cache_key(self, request, etag):
+        scope = [perm for perm in self.cache_scope_permissions if request.user.has_perm(perm)]
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        key = repr((etag, request.build_absolute_uri(request.path), query, scope))
+        return f'api:response:{hashlib.md5(key.encode()).hexdigest()}'
+
+    def conditional(self, request, queryset, names, get_response):
+        self.response_cache_key = None
+        if not self.use_response_cache(request):
+            return super().conditional(request, queryset, names, get_response)
+        etag = conditional.etag(names, [request.accepted_renderer.format])
+        key = self.get_response_cache_key(request, etag)
+        entry = cache.get(key)
+        if entry is not None:
+            return conditional.respond(
+                request, etag, entry['last_modified'],
+                lambda: HttpResponse(entry['content'], content_type=entry['content_type']),
+            )
+        last_modified = conditional.last_modified(queryset)
+        # stored by finalize_response(), once the response is rendered
+        self.response_cache_key, self.response_last_modified = key, last_modified
+        return conditional.respond(request, etag, last_modified, get_response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'response_cache_key', None) and response.status_code == 200 and isinstance(response, Response):
+            response.render()
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'last_modified': self.response_last_modified,
+            }
+            # what was read from a replica is kept only briefly
+            cache.set(self.response_cache_key, entry, routers.cache_timeout(settings.API_CACHE_TIMEOUT))
+        return response
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+class ExportMixin:
+    """
+    Stream every row of export_kind in one response, as NDJSON or CSV
+
+    Gzipped when the client accepts it. See catalog/export.py.
+    """
+    export_kind = None
+
+    @action(detail=False, url_path=r'export/(?P<export_format>ndjson|csv)')
+    def export(self, request, export_format):
+        compress = bool(ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        pieces = export.stream(self.export_kind, export_format, using=routers.read_alias(request.user), compress=compress)
+        response = StreamingHttpResponse(
+            streaming_content(pieces, request._request), content_type=f'{export.FORMATS[export_format]}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_kind}.{export_format}"'
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+class ReplicaReadMixin:
+    """
+    Read from a replica database for list and retrieve, unless the user is
+    pinned to the primary after a write (local_library/routers.py)
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # after authentication: the user's pin decides
+        if request.method in ('GET', 'HEAD') and self.action in self.replica_actions:
+            self.replica_token = routers.start_replica_reads(request.user)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            routers.stop_replica_reads(self.replica_token)
+
+def _plan(serializer, prefix=''):
+    """
+    (columns, select_related, prefetch_related) that serializer reads, or
+    None when a field's source isn't a plain field or relation
+    """
+    model = serializer.Meta.model
+    names = {field.name for field in model._meta.concrete_fields}
+    columns, select, prefetch = {prefix + model._meta.pk.name}, set(), set()
+    for field in serializer.fields.values():
+        source = field.source
+        if isinstance(field, (serializers.ManyRelatedField, serializers.ListSerializer)):
+            prefetch.add(prefix + source)
+        elif source not in names:
+            return None
+        elif isinstance(field, serializers.BaseSerializer):
+            nested = _plan(field, f'{prefix}{source}__')
+            if nested is None:
+                return None
+            columns.add(prefix + source)
+            columns |= nested[0]
+            select |= {prefix + source} | nested[1]
+            prefetch |= nested[2]
+        else:
+            columns.add(prefix + source)
+    return columns, select, prefetch
+
+class SparseFieldsMixin:
+    """
+    Fetch only the columns and relations a read shows, as narrowed by
+    ?fields= and widened by ?expand= (see DynamicFieldsMixin); unknown
+    names are a 400
+    """
+    # names of the catalog fragment versions an expanded relation is in
+    expand_etag_names = {}
+
+    def is_sparse_read(self):
+        return self.request is not None and self.request.method in ('GET', 'HEAD') and self.action in ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not self.is_sparse_read():
+            return
+        meta = self.get_serializer_class().Meta
+        errors = {}
+        unknown = (requested(request, FIELDS_PARAM) or set()) - set(meta.fields)
+        if unknown:
+            errors[FIELDS_PARAM] = f'Unknown fields: {", ".join(sorted(unknown))}.'
+        unknown = (requested(request, EXPAND_PARAM) or set()) - set(getattr(meta, 'expandable', {}))
+        if unknown:
+            errors[EXPAND_PARAM] = f'Cannot expand: {", ".join(sorted(unknown))}.'
+        if errors:
+            raise ValidationError(errors)
+
+    def get_extra_etag_names(self):
+        names = super().get_extra_etag_names()
+        expand = requested(self.request, EXPAND_PARAM) or set()
+        return names + sorted(self.expand_etag_names[name] for name in expand if name in self.expand_etag_names)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.is_sparse_read():
+            return queryset
+        plan = _plan(self.get_serializer())
+        if plan is None:
+            return queryset
+        columns, select, prefetch = plan
+        # the ordering columns are read to make keyset cursors
+        ordering = list(queryset.query.order_by) + list(getattr(self, 'keyset_ordering', None) or queryset.model._meta.ordering)
+        names = {field.name for field in queryset.model._meta.concrete_fields}
+        columns |= {name.lstrip('-') for name in ordering if isinstance(name, str) and name.lstrip('-') in names}
+        queryset = queryset.prefetch_related(None).prefetch_related(*prefetch)
+        if select:
+            queryset = queryset.select_related(*select)
+        return queryset.only(*columns)
+
+class BulkMixin:
+    """
+    Accept a list of objects on POST (bulk create) and PATCH (bulk partial
+    update, each item identified by "id") to the list URL.
+
+    Every item is validated before anything is written; if any item fails,
+    nothing is saved and the response carries one error entry per item. Valid
+    batches are written with bulk_create/bulk_update in one transaction.
+    """
+    # rows per INSERT/UPDATE statement and items per request, defaulting to
+    # the API_BULK_BATCH_SIZE and API_BULK_MAX_ITEMS settings
+    bulk_batch_size = None
+    bulk_max_items = None
+
+    def get_bulk_batch_size(self):
+        return self.bulk_batch_size or getattr(settings, 'API_BULK_BATCH_SIZE', 500)
+
+    def get_bulk_max_items(self):
+        return self.bulk_max_items or getattr(settings, 'API_BULK_MAX_ITEMS', 1000)
+
+    def get_bulk_items(self, data):
+        if not isinstance(data, list):
+            raise ValidationError({'detail': 'Expected a list of items.'})
+        if not data:
+            raise ValidationError({'detail': 'Expected at least one item.'})
+        if len(data) > self.get_bulk_max_items():
+            raise ValidationError({'detail': f'At most {self.get_bulk_max_items()} items per request.'})
+        return data
+
+    def validate_bulk(self, serializers):
+        errors = [
+            {} if serializer.is_valid() else serializer.errors
+            for serializer in serializers
+        ]
+        self.validate_batch_uniqueness(serializers, errors)
+        if any(errors):
+            raise ValidationError({'errors': errors})
+
+    def validate_batch_uniqueness(self, serializers, errors):
+        """
+        Flag items repeating another item's value of a unique field
+
+        Each item is checked against the database on its own, so a value twice
+        in one batch would otherwise only fail as an IntegrityError.
+        """
+        model = self.get_queryset().model
+        unique = [field.name for field in model._meta.concrete_fields if field.unique and not field.primary_key]
+        for name in unique:
+            seen = set()
+            for serializer, item_errors in zip(serializers, errors):
+                value = getattr(serializer, '_validated_data', {}).get(name)
+                if value is None:
+                    continue
+                if value in seen:
+                    item_errors.setdefault(name, []).append('This value appears more than once in the batch.')
+                seen.add(value)
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        serializers = [self.get_serializer(data=item) for item in self.get_bulk_items(request.data)]
+        self.validate_bulk(serializers)
+        instances = self.write_bulk(serializers, created=True)
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_201_CREATED)
+
+    def bulk_partial_update(self, request, *args, **kwargs):
+        items = self.get_bulk_items(request.data)
+        model = self.get_queryset().model
+        pk_field = model._meta.pk
+        ids = []
+        for item in items:
+            try:
+                ids.append(pk_field.to_python(item.get('id')) if isinstance(item, dict) else None)
+            except DjangoValidationError:
+                ids.append(None)
+        instances = self.filter_queryset(self.get_queryset()).in_bulk([pk for pk in ids if pk is not None])
+
+        serializers, errors, serializer_errors = [], [], []
+        for item, pk in zip(items, ids):
+            instance = instances.get(pk)
+            if instance is None:
+                errors.append({'id': ['A valid id of an existing object is required.']})
+                continue
+            self.check_object_permissions(request, instance)
+            # the id only identifies the object, don't validate it as a change
+            changes = {name: value for name, value in item.items() if name != 'id'}
+            serializer = self.get_serializer(instance, data=changes, partial=True)
+            errors.append({} if serializer.is_valid() else serializer.errors)
+            serializers.append(serializer)
+            serializer_errors.append(errors[-1])
+        self.validate_batch_uniqueness(serializers, serializer_errors)
+        if any(errors):
+            raise ValidationError({'errors': errors})
+
+        instances = self.write_bulk(serializers, created=False)
+        return Response(self.get_serializer(instances, many=True).data)
+
+    def write_bulk(self, serializers, created):
+        model = self.get_queryset().model
+        many_to_many = {field.name: field for field in model._meta.many_to_many}
+        instances, relations, fields = [], [], set()
+        for serializer in serializers:
+            instance = serializer.instance or model()
+            for name, value in serializer.validated_data.items():
+                if name in many_to_many:
+                    relations.append((instance, many_to_many[name], value))
+                elif name != model._meta.pk.name:
+                    setattr(instance, name, value)
+                    fields.add(name)
+            instances.append(instance)
+        if not created and fields:
+            # bulk_update() skips pre_save(), so set auto_now timestamps here
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for instance in instances:
+                        field.pre_save(instance, add=False)
+                    fields.add(field.name)
+
+        batch_size = self.get_bulk_batch_size()
+        try:
+            with transaction.atomic():
+                if not created:
+                    if fields:
+                        model.objects.bulk_update(instances, fields, batch_size=batch_size)
+                elif connection.features.can_return_rows_from_bulk_insert or model._meta.pk.has_default():
+                    model.objects.bulk_create(instances, batch_size=batch_size)
+                else:
+                    # the backend can't report generated ids from a bulk insert
+                    for instance in instances:
+                        instance.save()
+                for instance, field, values in relations:
+                    through = getattr(model, field.name).through
+                    source = field.m2m_field_name()
+                    target = field.m2m_reverse_field_name()
+                    through.objects.filter(**{source: instance}).delete()
+                    through.objects.bulk_create(
+                        [through(**{source: instance, target: value}) for value in values],
+                        batch_size=batch_size,
+                    )
+                post_bulk_save.send(sender=model, pks=[instance.pk for instance in instances], instances=instances)
+        except IntegrityError:
+            raise ValidationError({'detail': 'The batch conflicts with existing data.'})
+        return instances
+
+class AuthorViewSet(ReplicaReadMixin, SparseFieldsMixin, ResponseCacheMixin, ConditionalMixin, BulkMixin, CompactSerializerMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Authors to be viewed or edited
     """
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
+    compact_serializer_class = CompactAuthorSerializer
     permission_classes = [permissions.IsAuthenticated]
+    list_etag_names = ['author_list']
 
-class BookViewSet(viewsets.ModelViewSet):
+    def get_object_etag_names(self, pk):
+        return fragments.author_names([pk])
+
+class CanMarkReturned(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.has_perm('catalog.can_mark_returned')
+
+class BookViewSet(ExportMixin, ReplicaReadMixin, SparseFieldsMixin, ResponseCacheMixin, ConditionalMixin, BulkMixin, CompactSerializerMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Books to be viewed or edited
     """
-    queryset = Book.objects.all()
+    # author and language render from their ids; genres come in one extra query per page
+    queryset = Book.objects.prefetch_related('genre').order_by('title', 'id')
     serializer_class = BookSerializer
+    compact_serializer_class = CompactBookSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ["title"]
+    export_kind = 'books'
+    # books show their copy counters
+    list_etag_names = ['book_list', 'copies']
+    expand_etag_names = {'author': 'author_list', 'genre': 'genre_list', 'language': 'language_list'}
+
+    def get_object_etag_names(self, pk):
+        return fragments.book_page_names(pk)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, CanMarkReturned])
+    def checkout(self, request, pk=None):
+        """
+        Lend the borrower an available copy of the book (or the copy kept for their hold)
+        """
+        book = get_object_or_404(Book.objects.only('id'), pk=pk)
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            copy = loans.checkout(book.pk, serializer.validated_data['borrower'], serializer.validated_data.get('due_back'))
+        except loans.NoCopyAvailable as error:
+            return Response({'detail': str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response(LoanSerializer(copy).data)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, CanMarkReturned])
+    def hold(self, request, pk=None):
+        """
+        Queue the borrower for the next copy of the book that is returned
+        """
+        book = get_object_or_404(Book.objects.only('id'), pk=pk)
+        serializer = HoldSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        hold = loans.place_hold(book.pk, serializer.validated_data['user'])
+        return Response(HoldSerializer(hold).data, status=status.HTTP_201_CREATED)
 
-class BookInstanceViewSet(viewsets.ModelViewSet):
+class BookInstanceViewSet(ExportMixin, ReplicaReadMixin, SparseFieldsMixin, ResponseCacheMixin, ConditionalMixin, BulkMixin, CompactSerializerMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows BookInstances to be viewed or edited
     """
-    queryset = BookInstance.objects.all()
+    queryset = BookInstance.objects.order_by('due_back', 'id')
     serializer_class = BookInstanceSerializer
-    permission_classes = [permissions.IsAuthenticated]
\ No newline at end of file
+    compact_serializer_class = CompactBookInstanceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    export_kind = 'copies'
+    list_etag_names = ['copies']
+    # expanded books show their genre links and counters, which book_list covers
+    expand_etag_names = {'book': 'book_list'}
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, CanMarkReturned])
+    def checkin(self, request, pk=None):
+        """
+        Take the copy back, keeping it for the first reader holding its book
+        """
+        try:
+            copy = loans.checkin(BookInstance._meta.pk.to_python(pk))
+        except (DjangoValidationError, BookInstance.DoesNotExist):
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except loans.NotOnLoan as error:
+            return Response({'detail': str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response(LoanSerializer(copy).data)
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated, CanMarkReturned])
+    def overdue(self, request):
+        """
+        Overdue loans grouped by borrower, oldest first, keyset paginated
+        """
+        self.keyset_ordering = ['borrower', 'due_back']
+        self.keyset_default = True
+
+        def get_response():
+            page = self.paginate_queryset(BookInstance.objects.overdue().select_related('book', 'borrower'))
+            return self.get_paginated_response(OverdueLoanSerializer(page, many=True).data)
+
+        # which loans are overdue changes with the date
+        return conditional.respond(
+            request,
+            conditional.etag(['copies', 'book_list'], [request.accepted_renderer.format, conditional.start_of_day()]),
+            max(conditional.last_modified(BookInstance.objects.all()) or conditional.start_of_day(), conditional.start_of_day()),
+            get_response,
+        )
+
+class GenreViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that allows Genres to be viewed
+    """
+    queryset = Genre.objects.order_by('name', 'id')
+    serializer_class = GenreSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+class LanguageViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that allows Languages to be viewed
+    """
+    queryset = Language.objects.order_by('name', 'id')
+    serializer_class = LanguageSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+class ChangeFeedViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    API endpoint listing changed Authors, Books and copies since a cursor
+
+    Each entry is the latest change to one object: its compact representation,
+    or a tombstone (deleted, no data) when it no longer exists. Start without
+    a cursor, then pass the returned cursor; while more is true, the next page
+    is ready. See catalog/changes.py.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_classes = {
+        'author': CompactAuthorSerializer,
+        'book': CompactBookSerializer,
+        'copy': CompactBookInstanceSerializer,
+    }
+    querysets = {
+        'author': Author.objects.all(),
+        'book': Book.objects.prefetch_related('genre'),
+        'copy': BookInstance.objects.all(),
+    }
+    default_limit = 100
+    max_limit = 1000
+
+    def list(self, request):
+        try:
+            after = changes.decode_cursor(request.query_params['cursor']) if 'cursor' in request.query_params else 0
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'detail': 'Invalid cursor or limit.'})
+        if limit < 1:
+            raise ValidationError({'detail': 'The limit must be positive.'})
+        entries, last, more = changes.page(after, min(limit, self.max_limit))
+
+        entries = [
+            (kind, changes.MODELS[kind]._meta.pk.to_python(object_id), deleted)
+            for kind, object_id, deleted in entries
+        ]
+        wanted = {}
+        for kind, pk, deleted in entries:
+            if not deleted:
+                wanted.setdefault(kind, []).append(pk)
+        # one query per kind (and the books' genres)
+        found = {kind: self.querysets[kind].in_bulk(pks) for kind, pks in wanted.items()}
+
+        results = []
+        for kind, pk, deleted in entries:
+            instance = None if deleted else found[kind].get(pk)
+            results.append({
+                'type': kind,
+                'id': pk,
+                # gone since it was logged: its delete is further on
+                'deleted': instance is None,
+                'data': None if instance is None else self.serializer_classes[kind](instance).data,
+            })
+        return Response({'results': results, 'cursor': changes.encode_cursor(last), 'more': more})
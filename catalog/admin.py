@@ -1,36 +1,151 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
 
-from catalog.models import Book, Author, Genre, BookInstance, Language
+from catalog import search
+from catalog.models import Book, Author, Genre, BookInstance, Hold, Language
+from catalog.pagination import EstimatedCountPaginator
+
+# the admin is built for tables of many thousands of rows: changelists load
+# related rows in bulk and skip the unfiltered COUNT(*), foreign keys use
+# autocomplete widgets instead of <select>s of every row, searches go through
+# the full-text index, and inlines show one page of their rows at a time.
+
+class SearchIndexMixin:
+    """admin search (and autocomplete) through the full-text index, prefix matching the last word"""
+
+    search_kind = None
+    search_limit = 500
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        pks = search.ranked_ids(search_term, self.search_kind, self.search_limit, prefix=True)
+        return queryset.filter(pk__in=pks), False
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """an inline formset over one page of the related rows"""
+
+    per_page = 20
+    params = QueryDict()
+
+    @property
+    def page_param(self):
+        return f"{self.prefix}-page"
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            queryset = super().get_queryset()
+            self.page = Paginator(queryset, self.per_page).get_page(self.params.get(self.page_param))
+            if self.is_bound:
+                # the rows the form was rendered with, even if they moved to another page since
+                pk_name = self.model._meta.pk.name
+                pks = [self.data.get(f"{self.add_prefix(number)}-{pk_name}") for number in range(self.initial_form_count())]
+                self._queryset = queryset.filter(pk__in=[pk for pk in pks if pk])
+            else:
+                self._queryset = self.page.object_list
+        return self._queryset
+
+    def _page_url(self, number):
+        params = self.params.copy()
+        params[self.page_param] = number
+        return f"?{params.urlencode()}"
+
+    def previous_page_url(self):
+        return self._page_url(self.page.previous_page_number()) if self.page.has_previous() else None
+
+    def next_page_url(self):
+        return self._page_url(self.page.next_page_number()) if self.page.has_next() else None
+
+class PaginatedTabularInline(admin.TabularInline):
+    formset = PaginatedInlineFormSet
+    template = "admin/catalog/edit_inline/paginated_tabular.html"
+    per_page = 20
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.params = request.GET
+        return formset
 
 # Register your models here.
-class BookInline(admin.TabularInline):
+class BookInline(PaginatedTabularInline):
     model = Book
+    ordering = ("title", "id")
+    autocomplete_fields = ["genre", "language"]
 
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorAdmin(SearchIndexMixin, admin.ModelAdmin):
     list_display = ("last_name", "first_name", "middle_name", "date_of_birth", "date_of_death")
     fields = ["last_name", "first_name", "middle_name", ("date_of_birth", "date_of_death")]
     inlines = [BookInline]
+    search_fields = ("last_name", "first_name")
+    search_kind = "author"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 admin.site.register(Author, AuthorAdmin)
 
-class BookInstanceInline(admin.TabularInline):
+class BookInstanceInline(PaginatedTabularInline):
     model = BookInstance
     extra = 0
+    ordering = ("due_back", "id")
+    autocomplete_fields = ["borrower"]
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
-    list_display = ("title", "author", "display_genre")
+class BookAdmin(SearchIndexMixin, admin.ModelAdmin):
+    list_display = ("title", "author", "display_genre", "copies_available", "copies_total")
+    list_select_related = ("author",)
     inlines = [BookInstanceInline]
+    autocomplete_fields = ["author", "genre", "language"]
+    search_fields = ("title", "isbn")
+    search_kind = "book"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # display_genre reads the prefetched genres
+        return super().get_queryset(request).prefetch_related("genre")
+
+class OverdueListFilter(admin.SimpleListFilter):
+    title = "overdue"
+    parameter_name = "overdue"
+
+    def lookups(self, request, model_admin):
+        return (("yes", "Yes"), ("no", "No"))
+
+    def queryset(self, request, queryset):
+        if self.value() == "yes":
+            return queryset.filter(overdue=True)
+        if self.value() == "no":
+            return queryset.filter(overdue=False)
 
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
-    list_display = ("book", "status", "borrower", "due_back", "is_overdue", "id")
-    list_filter = ("status", "due_back")
+    list_display = ("book", "status", "borrower", "due_back", "overdue", "id")
+    list_filter = ("status", OverdueListFilter, "due_back")
+    list_select_related = ("book", "borrower")
+    autocomplete_fields = ["book", "borrower"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None,                      {"fields": ("book", "imprint", "id")}),
         ("Availability",            {"fields": ("status", "due_back", "borrower")}),
     )
 
-admin.site.register(Genre)
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_overdue()
+
+    @admin.display(boolean=True, ordering="overdue")
+    def overdue(self, obj):
+        return obj.overdue
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ("book", "user", "placed_at")
+    list_select_related = ("book", "user")
+    autocomplete_fields = ["book", "user"]
 
-admin.site.register(Language)
\ No newline at end of file
+@admin.register(Genre, Language)
+class NameAdmin(admin.ModelAdmin):
+    search_fields = ("name",)
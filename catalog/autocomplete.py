@@ -0,0 +1,237 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from catalog.models import Author, Book
+
+# in-process prefix index of book titles and author names for search-as-you-type
+#
+# every title/name is stored under each of its word-start suffixes
+# ("the left hand of darkness", "left hand of darkness", ...), so typing
+# any word of it finds it. keys live in one sorted list: a lookup is a
+# bisect to the first key >= the prefix and a scan while keys still match.
+#
+# each worker keeps its own index, built when the worker starts (see
+# local_library/wsgi.py and asgi.py). a write bumps a version shared through
+# the cache and publishes the change under it, so the other workers apply the
+# same change within REFRESH_SECONDS instead of reloading the catalog; a
+# worker that missed changes (evicted, or too many) reloads.
+
+# hard cap on suggestions per lookup
+MAX_RESULTS = 10
+# don't index more word-start suffixes than this per title/name
+MAX_SUFFIXES = 8
+# how often a worker checks whether another worker changed the catalog
+REFRESH_SECONDS = 5
+VERSION_CACHE_KEY = "catalog:autocomplete:version"
+CHANGE_CACHE_KEY = "catalog:autocomplete:change:{}"
+# how long a published change is kept for the workers yet to apply it
+CHANGE_TIMEOUT = 60 * 60
+# a worker further behind than this reloads instead of applying the changes
+MAX_CHANGES = 1000
+# published by bulk writes that bypass the signals: every worker reloads
+RELOAD = "reload"
+
+def normalize(text):
+    """lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.lower().split())
+
+def _suffixes(text):
+    words = normalize(text).split()
+    return [" ".join(words[i:]) for i in range(min(len(words), MAX_SUFFIXES))]
+
+def _entry(instance):
+    """return (kind, label, texts to index) for a Book or Author"""
+    if isinstance(instance, Book):
+        return "book", instance.title, [instance.title]
+    names = " ".join(name for name in (instance.first_name, instance.middle_name, instance.last_name) if name)
+    return "author", str(instance), [names]
+
+class PrefixIndex:
+    """sorted (key, kind, pk) tuples plus a label per indexed object"""
+
+    def __init__(self):
+        self._keys = []
+        self._labels = {}
+        self._object_keys = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def load(self, entries):
+        """replace the index contents with (kind, pk, label, texts) entries"""
+        keys, labels, object_keys = [], {}, {}
+        for kind, pk, label, texts in entries:
+            own = [(key, kind, pk) for text in texts for key in _suffixes(text)]
+            keys.extend(own)
+            labels[kind, pk] = label
+            object_keys[kind, pk] = own
+        keys.sort()
+        with self._lock:
+            self._keys, self._labels, self._object_keys = keys, labels, object_keys
+
+    # writers change copies and swap them in, like load(): readers don't take
+    # the lock, and a list changed under a lookup's scan could shrink past it
+
+    def add(self, kind, pk, label, texts):
+        with self._lock:
+            keys, labels = self._remove(kind, pk)
+            own = [(key, kind, pk) for text in texts for key in _suffixes(text)]
+            for item in own:
+                insort(keys, item)
+            labels[kind, pk] = label
+            self._object_keys[kind, pk] = own
+            self._keys, self._labels = keys, labels
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._keys, self._labels = self._remove(kind, pk)
+
+    def _remove(self, kind, pk):
+        """return copies of the keys and labels without the object's"""
+        keys, labels = list(self._keys), dict(self._labels)
+        for item in self._object_keys.pop((kind, pk), []):
+            position = bisect_left(keys, item)
+            if position < len(keys) and keys[position] == item:
+                del keys[position]
+        labels.pop((kind, pk), None)
+        return keys, labels
+
+    def lookup(self, prefix, limit=MAX_RESULTS):
+        """return up to limit (kind, pk, label) matches, in key order"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        keys, labels = self._keys, self._labels
+        matches, seen = [], set()
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys) and len(matches) < limit:
+            key, kind, pk = keys[position]
+            if not key.startswith(prefix):
+                break
+            # keys and labels are swapped one after the other, so skip
+            # objects whose label isn't there (yet or any more)
+            label = labels.get((kind, pk))
+            if label is not None and (kind, pk) not in seen:
+                seen.add((kind, pk))
+                matches.append((kind, pk, label))
+            position += 1
+        return matches
+
+_index = PrefixIndex()
+_state = {"built": False, "version": None, "checked": 0.0, "missing": None}
+_build_lock = threading.RLock()
+
+def _shared_version():
+    cache.add(VERSION_CACHE_KEY, int(time.time() * 1000), None)
+    return cache.get(VERSION_CACHE_KEY)
+
+def build():
+    """(re)load the index from the database"""
+    with _build_lock:
+        version = _shared_version()
+        # from the primary: a lagging replica would leave the index stale until the next change
+        entries = [
+            ("book", pk, title, [title])
+            for pk, title in Book.objects.using(DEFAULT_DB_ALIAS).values_list("pk", "title").iterator()
+        ]
+        for author in Author.objects.using(DEFAULT_DB_ALIAS).only("first_name", "middle_name", "last_name").iterator():
+            kind, label, texts = _entry(author)
+            entries.append((kind, author.pk, label, texts))
+        _index.load(entries)
+        _state.update(built=True, version=version, checked=time.monotonic(), missing=None)
+
+def warm():
+    """build the index as a worker starts, rather than on its first lookup"""
+    try:
+        build()
+    except DatabaseError:
+        # e.g. not migrated yet; the first lookup builds it
+        pass
+    finally:
+        connections.close_all()
+
+def _apply(change):
+    kind, pk, label, texts = change
+    if label is None:
+        _index.remove(kind, pk)
+    else:
+        _index.add(kind, pk, label, texts)
+
+def _catch_up():
+    """apply the changes published since this worker's version, or reload"""
+    shared = _shared_version()
+    versions = range(_state["version"] + 1, shared + 1)
+    if shared < _state["version"] or len(versions) > MAX_CHANGES:
+        build()
+        return
+    published = cache.get_many([CHANGE_CACHE_KEY.format(version) for version in versions])
+    for version in versions:
+        change = published.get(CHANGE_CACHE_KEY.format(version))
+        if change is None:
+            # published just after its version was taken, so look again next
+            # time; still missing then, it was evicted
+            if _state["missing"] == version:
+                build()
+            else:
+                _state["missing"] = version
+            return
+        if change == RELOAD:
+            build()
+            return
+        _apply(change)
+        _state["version"] = version
+
+def get_index():
+    """return the index, building it on first use and applying changes made by other workers"""
+    if not _state["built"]:
+        build()
+    elif time.monotonic() - _state["checked"] > REFRESH_SECONDS and _build_lock.acquire(blocking=False):
+        # one thread catches up; the others read the index as it is
+        try:
+            _state["checked"] = time.monotonic()
+            _catch_up()
+        finally:
+            _build_lock.release()
+    return _index
+
+def _publish(change):
+    """bump the shared version and publish change under it"""
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        # evicted: every worker reloads once the version is set again
+        return
+    cache.set(CHANGE_CACHE_KEY.format(version), change, CHANGE_TIMEOUT)
+    # this worker has the change already; stay current only if nobody else changed it meanwhile
+    if change != RELOAD and _state["version"] is not None and version == _state["version"] + 1:
+        _state["version"] = version
+
+def update(instance):
+    kind, label, texts = _entry(instance)
+    change = (kind, instance.pk, label, texts)
+    if _state["built"]:
+        _apply(change)
+    _publish(change)
+
+def remove(model, pk):
+    change = ("book" if model is Book else "author", pk, None, None)
+    if _state["built"]:
+        _apply(change)
+    _publish(change)
+
+def invalidate():
+    """make every worker reload its index, for bulk writes that bypass the signals"""
+    _publish(RELOAD)
+    # check the shared version on the next lookup instead of a few seconds later
+    _state["checked"] = 0.0
+
+def suggest(prefix, limit=MAX_RESULTS):
+    return get_index().lookup(prefix, max(1, min(limit, MAX_RESULTS)))
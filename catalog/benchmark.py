@@ -0,0 +1,252 @@
+import datetime
+import random
+import statistics
+import time
+import uuid
+from contextlib import ExitStack
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from catalog import counters, search
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from local_library.metrics import QueryTimer
+
+# synthetic catalog generation and URL timing for the benchmark command
+#
+# the catalog is made from a seeded random generator, so the same seed and
+# sizes give the same rows. every named GET-able URL of catalog/urls.py and
+# api/urls.py is then requested as a superuser and its latency and query
+# count recorded; a run can be saved as JSON and compared with a baseline.
+
+WORDS = (
+    "amber", "atlas", "beacon", "canyon", "cedar", "cinder", "comet", "coral", "delta", "ember",
+    "falcon", "fjord", "garnet", "harbor", "hollow", "iris", "jasper", "juniper", "lantern", "maple",
+    "meadow", "nimbus", "onyx", "orchid", "pebble", "quartz", "raven", "river", "saffron", "sable",
+    "solstice", "spruce", "tempest", "thistle", "umber", "velvet", "willow", "winter", "yarrow", "zephyr",
+)
+FIRST_NAMES = (
+    "Ada", "Alan", "Beatrix", "Carl", "Dora", "Edith", "Felix", "Grace", "Hugo", "Ines",
+    "Jonas", "Kara", "Leo", "Mira", "Nils", "Olga", "Pablo", "Rosa", "Sven", "Tess",
+)
+GENRES = 20
+LANGUAGES = 8
+BORROWERS = 500
+# status of a generated copy: mostly available, a fifth on loan
+STATUS_WEIGHTS = (("a", 60), ("o", 20), ("m", 10), ("r", 10))
+
+# URLs that can't be timed with a plain GET
+SKIPPED = {"rest_framework:logout"}
+# query strings for URLs that do nothing useful without one
+QUERIES = {
+    "catalog:search": {"search": "river"},
+    "catalog:autocomplete": {"q": "riv"},
+}
+# the model behind a function view's pk
+MODELS = {"catalog:renew_book_librarian": BookInstance}
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def generate(authors, books, copies, seed=0, batch_size=5000, log=None):
+    """fill an empty catalog with deterministic synthetic rows"""
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    today = datetime.date.today()
+
+    with transaction.atomic():
+        Genre.objects.bulk_create(Genre(name=f"{_words(rng, 2).title()} {number}") for number in range(GENRES))
+        Language.objects.bulk_create(Language(name=f"Language {number}") for number in range(LANGUAGES))
+        User.objects.bulk_create(User(username=f"bench-reader-{number}") for number in range(BORROWERS))
+        # measure() logs in with force_login, so the librarian needs no password
+        User.objects.create_superuser(username="bench-librarian", password=None)
+    genre_ids = list(Genre.objects.values_list("id", flat=True))
+    language_ids = list(Language.objects.values_list("id", flat=True))
+    borrower_ids = list(User.objects.filter(username__startswith="bench-reader-").values_list("id", flat=True))
+
+    rows = (
+        Author(
+            first_name=rng.choice(FIRST_NAMES),
+            middle_name=rng.choice(FIRST_NAMES)[0] if rng.random() < 0.3 else "",
+            last_name=f"{rng.choice(WORDS).title()}{rng.choice(WORDS)}",
+        )
+        for _ in range(authors)
+    )
+    for batch in _batches(rows, batch_size):
+        Author.objects.bulk_create(batch)
+    author_ids = list(Author.objects.order_by("id").values_list("id", flat=True))
+    log(f"{len(author_ids)} authors")
+
+    rows = (
+        Book(
+            title=_words(rng, rng.randint(1, 5)).capitalize(),
+            isbn=f"B{number:012d}",
+            summary=_words(rng, 30),
+            author_id=rng.choice(author_ids) if author_ids else None,
+            language_id=rng.choice(language_ids),
+        )
+        for number in range(books)
+    )
+    for batch in _batches(rows, batch_size):
+        with transaction.atomic():
+            Book.objects.bulk_create(batch)
+    book_ids = list(Book.objects.order_by("id").values_list("id", flat=True))
+    links = (
+        Book.genre.through(book_id=book_id, genre_id=genre_id)
+        for book_id in book_ids
+        for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+    )
+    for batch in _batches(links, batch_size):
+        Book.genre.through.objects.bulk_create(batch)
+    log(f"{len(book_ids)} books")
+
+    statuses, weights = zip(*STATUS_WEIGHTS)
+
+    def copy():
+        status = rng.choices(statuses, weights)[0]
+        on_loan = status == "o"
+        return BookInstance(
+            # uuid4 would differ between runs
+            id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            book_id=rng.choice(book_ids),
+            imprint=f"{_words(rng, 1).title()} Press, {rng.randint(1900, 2020)}",
+            status=status,
+            due_back=today + datetime.timedelta(days=rng.randint(-30, 30)) if on_loan else None,
+            borrower_id=rng.choice(borrower_ids) if on_loan else None,
+        )
+
+    if book_ids:
+        for batch in _batches((copy() for _ in range(copies)), batch_size):
+            with transaction.atomic():
+                BookInstance.objects.bulk_create(batch)
+    log(f"{BookInstance.objects.count()} copies")
+
+    # bulk_create skips the signals, so derived data is rebuilt in one go
+    with transaction.atomic():
+        counters.recount()
+        search.rebuild()
+    if connection.vendor in ("postgresql", "sqlite"):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    cache.clear()
+
+def _patterns(patterns, prefix="", urlconfs=()):
+    """yield (name, pattern, the urlconf modules it was included through)"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            namespace = f"{prefix}{pattern.namespace}:" if pattern.namespace else prefix
+            urlconf = getattr(pattern.urlconf_name, "__name__", pattern.urlconf_name)
+            yield from _patterns(pattern.url_patterns, namespace, urlconfs + (urlconf,))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f"{prefix}{pattern.name}", pattern, urlconfs
+
+def _model(name, pattern):
+    if name in MODELS:
+        return MODELS[name]
+    view = pattern.callback
+    for attribute in ("cls", "view_class"):
+        owner = getattr(view, attribute, None)
+        queryset = getattr(owner, "queryset", None)
+        if queryset is not None:
+            return queryset.model
+        if getattr(owner, "model", None) is not None:
+            return owner.model
+    return None
+
+def targets():
+    """return (name, path) for every named GET URL of the catalog and the API"""
+    found = {}
+    for name, pattern, urlconfs in _patterns(get_resolver().url_patterns):
+        # the API is mounted under catalog/ as well; it is timed once, under api/
+        wanted = urlconfs[:1] == ("api.urls",) or (urlconfs[:1] == ("catalog.urls",) and "api.urls" not in urlconfs)
+        if name in found or name in SKIPPED or not wanted:
+            continue
+        # API actions that only take writes
+        actions = getattr(pattern.callback, "actions", None)
+        if actions is not None and "get" not in actions:
+            continue
+        groups = set(pattern.pattern.regex.groupindex)
+        if "format" in groups:
+            continue
+        kwargs = {}
+        if "pk" in groups:
+            model = _model(name, pattern)
+            # the middle row, so neither end of an index is favoured
+            total = model.objects.count()
+            if not total:
+                continue
+            kwargs["pk"] = model.objects.order_by("pk").values_list("pk", flat=True)[total // 2]
+        elif groups:
+            continue
+        found[name] = reverse(name, kwargs=kwargs)
+    return sorted(found.items())
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def measure(repeat=10, warmup=1, cold=False, host="127.0.0.1", log=None):
+    """time every target URL, returning {name: result}"""
+    log = log or (lambda message: None)
+    user = User.objects.filter(is_superuser=True).order_by("pk").first()
+    if user is None:
+        raise ValueError("the benchmark needs a superuser to request every page")
+    # a failing page is recorded with its status rather than stopping the run
+    client = Client(SERVER_NAME=host, raise_request_exception=False)
+    client.force_login(user)
+    results = {}
+    for name, path in targets():
+        params = QUERIES.get(name, {})
+        latencies, queries, status = [], [], None
+        for run in range(warmup + repeat):
+            if cold:
+                cache.clear()
+            timer = QueryTimer()
+            with ExitStack() as stack:
+                for each in connections.all():
+                    stack.enter_context(each.execute_wrapper(timer))
+                started = time.perf_counter()
+                response = client.get(path, params)
+                elapsed = time.perf_counter() - started
+            status = response.status_code
+            if run >= warmup:
+                latencies.append(elapsed * 1000)
+                queries.append(timer.count)
+        results[name] = {
+            "path": path,
+            "status": status,
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(_percentile(latencies, 0.95), 3),
+            "queries": max(queries),
+        }
+        log(f"{name:40} {status} p50 {results[name]['p50_ms']:9.2f}ms  p95 {results[name]['p95_ms']:9.2f}ms  {results[name]['queries']} queries")
+    return results
+
+def compare(results, baseline, tolerance=0.2, floor_ms=1.0):
+    """return the regressions of results against a baseline's results, as messages"""
+    regressions = []
+    for name, result in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["status"] != before["status"]:
+            regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+        for key in ("p50_ms", "p95_ms"):
+            # a small absolute change is noise, however large relative to a fast page
+            if result[key] > before[key] * (1 + tolerance) and result[key] - before[key] > floor_ms:
+                regressions.append(f"{name}: {key} {before[key]:.2f} -> {result[key]:.2f}")
+    return regressions
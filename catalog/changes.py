@@ -0,0 +1,72 @@
+import base64
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from catalog.models import Author, Book, BookInstance, Change
+
+# append-only change log of authors, books and copies, for delta sync
+#
+# the receivers in catalog/signals.py log every saved and deleted author, book
+# and copy, and the books a copy, author, genre or language write changes, in
+# the transaction making the write, so a write and its log rows commit or roll
+# back together. clients read the log forward from an opaque cursor holding
+# the last Change id they have seen (see page()).
+#
+# a Change id is taken when the row is inserted but shows once its transaction
+# commits, so a lower id can appear after a higher one was read. a page stops
+# at the first row younger than CHANGE_FEED_SETTLE_SECONDS, so transactions
+# shorter than that land before a cursor passes them. changed_at is taken
+# before the id, so a lower id can also carry a later time; cutting at the
+# first unsettled row, rather than leaving it out, never moves a cursor past it.
+
+MODELS = {"author": Author, "book": Book, "copy": BookInstance}
+KINDS = {model: kind for kind, model in MODELS.items()}
+CURSOR_PREFIX = "change"
+
+def record(model, pks, deleted=False, book_ids=()):
+    """log a write to the rows of model with the given pks, and to the books with book_ids, in the current transaction"""
+    logged = [(KINDS[model], pks, deleted), ("book", book_ids, False)]
+    Change.objects.bulk_create([
+        Change(kind=kind, object_id=object_id, deleted=deleted)
+        for kind, ids, deleted in logged
+        for object_id in sorted({str(pk) for pk in ids if pk is not None})
+    ])
+
+def encode_cursor(change_id):
+    return base64.urlsafe_b64encode(f"{CURSOR_PREFIX}:{change_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """the Change id in a cursor made by encode_cursor(); raises ValueError for anything else"""
+    prefix, _, change_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().partition(":")
+    if prefix != CURSOR_PREFIX:
+        raise ValueError(f"not a change feed cursor: {cursor!r}")
+    return int(change_id)
+
+def page(after=0, limit=100):
+    """
+    read up to limit settled log rows past the Change id after
+
+    returns ([(kind, object_id, deleted)], last id read, whether more rows
+    follow): one entry per object, for its latest change, in log order
+    """
+    settled = timezone.now() - datetime.timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    rows = list(
+        Change.objects.filter(id__gt=after)
+        .order_by("id")
+        .values_list("id", "kind", "object_id", "deleted", "changed_at")[: limit + 1]
+    )
+    for index, row in enumerate(rows):
+        if row[4] > settled:
+            rows = rows[:index]
+            break
+    more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for _, kind, object_id, deleted, _ in rows:
+        # moved to the end: entries follow the order of their latest change
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = deleted
+    entries = [(kind, object_id, deleted) for (kind, object_id), deleted in latest.items()]
+    return entries, rows[-1][0] if rows else after, more
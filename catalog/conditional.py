@@ -0,0 +1,78 @@
+import datetime
+
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+from django.utils.cache import get_conditional_response
+
+from catalog import fragments
+
+# conditional GET for catalog pages and API resources
+#
+# the ETag hashes the fragment versions (catalog/fragments.py) of what a
+# response shows, and Last-Modified is the newest updated_at among its rows.
+# both come from a cache lookup and one aggregate query, so an unchanged
+# resource is answered with 304 Not Modified before anything is loaded.
+# deleting a row bumps the versions but can't advance MAX(updated_at), which
+# is why clients should prefer If-None-Match (it wins when both are sent).
+
+def etag(names, vary=()):
+    return quote_etag(fragments.digest(names, vary))
+
+def last_modified(queryset, *fields):
+    """return the newest of the given datetime fields (default updated_at) over queryset"""
+    fields = fields or ("updated_at",)
+    found = queryset.aggregate(**{f"newest_{number}": Max(field) for number, field in enumerate(fields)})
+    found = [value for value in found.values() if value is not None]
+    return max(found) if found else None
+
+def start_of_day():
+    return timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time()))
+
+def respond(request, etag, last_modified, get_response):
+    """return 304 when the request's validators match, else get_response(), with ETag/Last-Modified set"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = get_response()
+    if response.status_code in (200, 304):
+        if etag and not response.has_header("ETag"):
+            response["ETag"] = etag
+        if timestamp and not response.has_header("Last-Modified"):
+            response["Last-Modified"] = http_date(timestamp)
+    return response
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified for a class-based view's GET.
+
+    get_etag_names() lists the fragment versions the page depends on and
+    get_last_modified() dates it. Pages are personalized (base.html shows
+    the user), so the ETag varies on the user; pages that highlight overdue
+    copies set changes_daily, which also varies it on the date.
+    """
+
+    changes_daily = False
+
+    def get_etag_names(self):
+        raise NotImplementedError
+
+    def get_etag_vary(self):
+        vary = [self.request.user.pk]
+        if self.changes_daily:
+            vary.append(timezone.localdate())
+        return vary
+
+    def get_last_modified(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        modified = self.get_last_modified()
+        if modified is not None and self.changes_daily:
+            modified = max(modified, start_of_day())
+        return respond(
+            request,
+            etag(self.get_etag_names(), self.get_etag_vary()),
+            modified,
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs),
+        )
@@ -0,0 +1,57 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from catalog.models import Book, BookInstance
+
+# per-book copy counters, so availability is read from the book row instead
+# of being counted from BookInstance at read time
+
+STATUS_FIELDS = {
+    "a": "copies_available",
+    "o": "copies_on_loan",
+    "m": "copies_maintenance",
+    "r": "copies_reserved",
+}
+
+def adjust(book_id, status, delta):
+    """add delta to a book's total and per-status counters in one UPDATE"""
+    if book_id is None:
+        return
+    # the counters are part of the book, so they date it too
+    changes = {"copies_total": F("copies_total") + delta, "updated_at": timezone.now()}
+    if status in STATUS_FIELDS:
+        changes[STATUS_FIELDS[status]] = F(STATUS_FIELDS[status]) + delta
+    Book.objects.filter(pk=book_id).update(**changes)
+
+def move(book_id, old_status, new_status):
+    """move one copy of a book between two status counters in one UPDATE"""
+    if book_id is None or old_status == new_status:
+        return
+    changes = {"updated_at": timezone.now()}
+    if old_status in STATUS_FIELDS:
+        changes[STATUS_FIELDS[old_status]] = F(STATUS_FIELDS[old_status]) - 1
+    if new_status in STATUS_FIELDS:
+        changes[STATUS_FIELDS[new_status]] = F(STATUS_FIELDS[new_status]) + 1
+    Book.objects.filter(pk=book_id).update(**changes)
+
+def _count(condition=Q()):
+    copies = (
+        BookInstance.objects.filter(condition, book=OuterRef("pk"))
+        .order_by()
+        .values("book")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(copies), Value(0))
+
+def recount(book_ids=None):
+    """recompute the counters set-wise, for all books or the given ones"""
+    books = Book.objects.all()
+    if book_ids is not None:
+        books = books.filter(pk__in=[book_id for book_id in book_ids if book_id is not None])
+    return books.update(
+        updated_at=timezone.now(),
+        copies_total=_count(),
+        **{field: _count(Q(status=status)) for status, field in STATUS_FIELDS.items()},
+    )
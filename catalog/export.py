@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.text import compress_sequence
+
+from catalog.models import Book, BookInstance
+
+# full-catalog export as NDJSON or CSV
+#
+# rows are read through a server-side cursor (iterator()) chunk_size at a time
+# and each chunk is encoded as one piece of output, so memory stays flat however
+# large the catalog. prefetch_related() doesn't work with iterator(), so the
+# genres of each chunk of books are read with one more query. book rows use the
+# columns import_catalog reads. copies leave out their borrower.
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CHUNK_SIZE = 2000
+
+BOOK_FIELDS = [
+    "id", "title", "isbn", "summary",
+    "author_id", "author_first_name", "author_middle_name", "author_last_name",
+    "genres", "language", "copies_total", "copies_available", "updated_at",
+]
+COPY_FIELDS = ["id", "book_id", "isbn", "title", "imprint", "status", "due_back", "updated_at"]
+
+def _chunks(queryset, chunk_size):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def books(using=DEFAULT_DB_ALIAS, chunk_size=CHUNK_SIZE):
+    """chunks of book rows with their author, genres and language, by id"""
+    queryset = Book.objects.using(using).order_by("id").values(
+        "id", "title", "isbn", "summary", "author_id", "language__name", "copies_total", "copies_available", "updated_at",
+        author_first_name=F("author__first_name"),
+        author_middle_name=F("author__middle_name"),
+        author_last_name=F("author__last_name"),
+    )
+    for chunk in _chunks(queryset, chunk_size):
+        genres = {}
+        links = Book.genre.through.objects.using(using).filter(book_id__in=[row["id"] for row in chunk])
+        for book_id, name in links.order_by("genre__name").values_list("book_id", "genre__name"):
+            genres.setdefault(book_id, []).append(name)
+        for row in chunk:
+            row["genres"] = genres.get(row["id"], [])
+            row["language"] = row.pop("language__name")
+        yield chunk
+
+def copies(using=DEFAULT_DB_ALIAS, chunk_size=CHUNK_SIZE):
+    """chunks of copy rows with their book's isbn and title, by id"""
+    queryset = BookInstance.objects.using(using).order_by("id").values(
+        "id", "book_id", "imprint", "status", "due_back", "updated_at",
+        isbn=F("book__isbn"), title=F("book__title"),
+    )
+    return _chunks(queryset, chunk_size)
+
+EXPORTS = {"books": (books, BOOK_FIELDS), "copies": (copies, COPY_FIELDS)}
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ";".join(value)
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+def _csv(rows):
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue().encode()
+
+def _encode(chunks, fields, output_format):
+    if output_format == "csv":
+        yield _csv([fields])
+        for chunk in chunks:
+            yield _csv([_csv_value(row[field]) for field in fields] for row in chunk)
+    else:
+        for chunk in chunks:
+            yield "".join(
+                json.dumps({field: row[field] for field in fields}, cls=DjangoJSONEncoder) + "\n" for row in chunk
+            ).encode()
+
+def stream(kind, output_format, using=DEFAULT_DB_ALIAS, chunk_size=CHUNK_SIZE, compress=False):
+    """the export of kind ("books" or "copies") in output_format, as pieces of bytes, gzipped if compress"""
+    rows, fields = EXPORTS[kind]
+    pieces = _encode(rows(using, chunk_size), fields, output_format)
+    return compress_sequence(pieces) if compress else pieces
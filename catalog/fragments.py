@@ -0,0 +1,115 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.pagination import CURSOR_PARAM
+from local_library import routers
+
+# versioned fragment cache for the catalog pages
+#
+# a cached fragment's key includes the current version of everything it
+# shows: "book:<pk>" (a book page), "author:<pk>" (an author page),
+# "book_list", "author_list", "genre_list", "language_list" and "copies"
+# (any copy). writes replace those versions once they commit, so a fragment
+# is never served stale; superseded entries are simply never read again and
+# age out of the cache. book pages also depend on "genre_list" and
+# "language_list" (see book_page_names()), so a genre or language edit bumps
+# one name rather than the page of every book it is linked to.
+# the same versions make the ETags of catalog/conditional.py.
+
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+def _version_key(name):
+    return f"catalog:fragment:version:{name}"
+
+def versions(names):
+    """return the current version token of each name, creating missing ones"""
+    keys = [_version_key(name) for name in names]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # add() never overwrites a token set by a concurrent bump
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, "") for key in keys]
+
+def digest(names, vary=()):
+    """hash the current versions of names together with request-specific parts"""
+    return hashlib.md5(repr((versions(names), list(vary))).encode()).hexdigest()
+
+def make_key(fragment, names, vary=()):
+    return f"catalog:fragment:{fragment}:{digest(names, vary)}"
+
+def bump(names):
+    """give each name a new version once the current transaction commits"""
+    names = set(names)
+    if names:
+        transaction.on_commit(lambda: cache.set_many({_version_key(name): uuid.uuid4().hex for name in names}, None))
+
+def book_names(book_ids):
+    return {f"book:{pk}" for pk in book_ids if pk is not None}
+
+def book_page_names(pk):
+    """the names a book's page depends on: the book, and the genres and languages it names"""
+    return book_names([pk]) | {"genre_list", "language_list"}
+
+def author_names(author_ids):
+    return {f"author:{pk}" for pk in author_ids if pk is not None}
+
+def affected(model, pks):
+    """return the names of the fragments showing the given rows"""
+    pks = list(pks)
+    if model is Book:
+        author_ids = Book.objects.filter(pk__in=pks).values_list("author_id", flat=True)
+        return {"book_list"} | book_names(pks) | author_names(author_ids)
+    if model is Author:
+        book_ids = Book.objects.filter(author_id__in=pks).values_list("id", flat=True)
+        return {"author_list"} | author_names(pks) | book_names(book_ids)
+    if model is BookInstance:
+        return {"copies"} | book_names(BookInstance.objects.filter(pk__in=pks).values_list("book_id", flat=True))
+    if model is Genre:
+        return {"genre_list"}
+    if model is Language:
+        # deleting a language nulls the books' language_id without their signals
+        return {"language_list", "book_list"}
+    return set()
+
+class FragmentCacheMixin:
+    """
+    Serve a page's content from the fragment cache.
+
+    fragment_template_name renders the content (pagination included) and
+    get_fragment_names() lists the versions it depends on. On a hit the view
+    skips get_object()/get_queryset() and the fragment's rendering; only the
+    page around it is rendered.
+    """
+
+    fragment_template_name = None
+
+    def get_fragment_names(self):
+        raise NotImplementedError
+
+    def get_fragment_vary(self):
+        return [self.request.GET.get("page"), self.request.GET.get(CURSOR_PARAM)]
+
+    def get(self, request, *args, **kwargs):
+        self.fragment_key = make_key(self.fragment_template_name, self.get_fragment_names(), self.get_fragment_vary())
+        fragment = cache.get(self.fragment_key)
+        if fragment is None:
+            return super().get(request, *args, **kwargs)
+        return self.response_class(
+            request=request,
+            template=[self.template_name],
+            context={"view": self, "fragment": fragment},
+            using=self.template_engine,
+        )
+
+    def render_to_response(self, context, **response_kwargs):
+        context["fragment"] = render_to_string(self.fragment_template_name, context, self.request)
+        cache.set(self.fragment_key, context["fragment"], routers.cache_timeout(FRAGMENT_TIMEOUT))
+        return super().render_to_response(context, **response_kwargs)
@@ -0,0 +1,140 @@
+import datetime
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from catalog import changes as changelog
+from catalog import counters, fragments, stats
+from catalog.models import BookInstance, Hold
+
+# checkout and return of book copies
+#
+# a checkout claims one available copy of a book. the copy is read with
+# SELECT ... FOR UPDATE SKIP LOCKED, so concurrent checkouts of a popular
+# title each lock a different copy instead of queueing behind the first, and
+# is then taken with an UPDATE conditional on its status, which on its own
+# keeps a copy from being lent twice where there are no row locks (SQLite).
+#
+# readers waiting for a book queue as Holds. a returned copy goes to the
+# oldest hold as a reserved ('r') copy, due back for pickup, and an available
+# copy is only lent while there are more available copies than readers queued
+# ahead of the borrower, so holds are served in order.
+#
+# every transaction locks the copy first, then the hold, then the book row
+# (its counters), and never waits for a second copy, so they can't deadlock.
+
+LOAN_PERIOD = datetime.timedelta(weeks=3)
+PICKUP_PERIOD = datetime.timedelta(weeks=1)
+class LoanError(Exception):
+    pass
+
+class NoCopyAvailable(LoanError):
+    pass
+
+class NotOnLoan(LoanError):
+    pass
+
+class _HoldServed(Exception):
+    """the reader's hold was served by a check-in while they checked out"""
+
+def _skip_locked(queryset):
+    if connection.features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset
+
+def _claim(candidates, changes):
+    """apply changes to one of the candidate copies, returning its pk, or None when none is left"""
+    while True:
+        pk = _skip_locked(candidates.order_by("id")).values_list("pk", flat=True).first()
+        if pk is None:
+            return None
+        # without row locks another checkout may have taken it since; then try the next copy
+        if candidates.filter(pk=pk).update(**changes):
+            return pk
+
+def _moved(copy_id, book_id, old_status, new_status):
+    # what the post_save receivers do for a saved copy, for a copy changed by update()
+    changelog.record(BookInstance, [copy_id], book_ids=[book_id])
+    counters.move(book_id, old_status, new_status)
+    stats.invalidate()
+    fragments.bump({"copies"} | fragments.book_names([book_id]))
+
+def _claim_available(book_id, user, changes):
+    """
+    claim an available copy for user, unless the readers queued ahead of them
+    need all of them, and drop user's hold; returns the copy's pk, or None when
+    a check-in kept a copy for user meanwhile
+    """
+    queue = Hold.objects.filter(book_id=book_id)
+    hold = queue.filter(user=user).values_list("placed_at", "id").first()
+    if hold is not None:
+        queue = queue.filter(Q(placed_at__lt=hold[0]) | Q(placed_at=hold[0], id__lt=hold[1]))
+    ahead = queue.count()
+    if ahead and BookInstance.objects.filter(book_id=book_id, status="a").count() <= ahead:
+        raise NoCopyAvailable(f"book {book_id} is held for other readers")
+    try:
+        with transaction.atomic():
+            pk = _claim(BookInstance.objects.filter(book_id=book_id, status="a"), changes)
+            if pk is None:
+                raise NoCopyAvailable(f"no copy of book {book_id} is available")
+            if hold is not None:
+                # locked after the copy, as checkin() does, which skips it from here on
+                if not Hold.objects.select_for_update().filter(pk=hold[1]).values_list("pk", flat=True).first():
+                    raise _HoldServed
+                Hold.objects.filter(pk=hold[1]).delete()
+            return pk
+    except _HoldServed:
+        return None
+
+def checkout(book_id, user, due_back=None, today=None):
+    """lend user a copy of a book, returning the copy; raises NoCopyAvailable"""
+    today = today or datetime.date.today()
+    changes = {"status": "o", "borrower": user, "due_back": due_back or today + LOAN_PERIOD, "updated_at": timezone.now()}
+    with transaction.atomic():
+        # a copy kept for the reader when their hold came up
+        reserved = BookInstance.objects.filter(book_id=book_id, status="r", borrower=user)
+        old_status = "r"
+        pk = _claim(reserved, changes)
+        if pk is None:
+            old_status = "a"
+            pk = _claim_available(book_id, user, changes)
+        if pk is None:
+            # a check-in kept a copy for the reader while they checked out
+            old_status = "r"
+            pk = _claim(reserved, changes)
+            if pk is None:
+                raise NoCopyAvailable(f"no copy of book {book_id} is available")
+        _moved(pk, book_id, old_status, "o")
+        return BookInstance.objects.select_related("book").get(pk=pk)
+
+def checkin(copy_id, today=None):
+    """take back a copy on loan, keeping it for the first reader waiting; raises NotOnLoan"""
+    today = today or datetime.date.today()
+    with transaction.atomic():
+        # the copy row alone: PostgreSQL can't lock the nullable side of an outer join
+        copy = BookInstance.objects.select_for_update().get(pk=copy_id)
+        if copy.status != "o":
+            raise NotOnLoan(f"copy {copy_id} is not on loan")
+        hold = _skip_locked(Hold.objects.filter(book_id=copy.book_id)).first()
+        if hold is None:
+            changes = {"status": "a", "borrower": None, "due_back": None}
+        else:
+            changes = {"status": "r", "borrower_id": hold.user_id, "due_back": today + PICKUP_PERIOD}
+        changes.update(updated_at=timezone.now(), reminded_on=None)
+        if not BookInstance.objects.filter(pk=copy_id, status="o").update(**changes):
+            raise NotOnLoan(f"copy {copy_id} is not on loan")
+        if hold is not None:
+            hold.delete()
+        _moved(copy_id, copy.book_id, "o", changes["status"])
+    for name, value in changes.items():
+        setattr(copy, name, value)
+    return copy
+
+def place_hold(book_id, user):
+    """queue user for a copy of a book, returning their Hold (the existing one if already queued)"""
+    try:
+        with transaction.atomic():
+            return Hold.objects.create(book_id=book_id, user=user)
+    except IntegrityError:
+        return Hold.objects.get(book_id=book_id, user=user)
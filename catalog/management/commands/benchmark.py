@@ -0,0 +1,78 @@
+import datetime
+import json
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from catalog import benchmark
+from catalog.models import Author, Book, BookInstance
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic catalog, time every catalog and API URL and compare with a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--authors", type=int, default=2000, help="authors to generate")
+        parser.add_argument("--books", type=int, default=10000, help="books to generate")
+        parser.add_argument("--copies", type=int, default=50000, help="copies to generate")
+        parser.add_argument("--seed", type=int, default=0, help="random seed of the generated catalog")
+        parser.add_argument("--batch-size", type=int, default=5000, help="rows per bulk insert")
+        parser.add_argument("--reuse", action="store_true", help="time the catalog already in the database")
+        parser.add_argument("--repeat", type=int, default=10, help="timed requests per URL")
+        parser.add_argument("--cold", action="store_true", help="clear the cache before every request")
+        parser.add_argument("--host", default="127.0.0.1", help="Host header of the requests")
+        parser.add_argument("--output", help="write the results to this JSON file")
+        parser.add_argument("--baseline", help="compare with the results in this JSON file")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="allowed latency increase over the baseline")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--repeat and --batch-size must be positive")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as handle:
+                baseline = json.load(handle)
+
+        if not options["reuse"]:
+            if Author.objects.exists() or Book.objects.exists() or BookInstance.objects.exists():
+                raise CommandError("the catalog is not empty; use an empty database or --reuse")
+            self.stdout.write(f"Generating {options['authors']} authors, {options['books']} books, {options['copies']} copies")
+            benchmark.generate(
+                options["authors"], options["books"], options["copies"],
+                seed=options["seed"], batch_size=options["batch_size"], log=self.stdout.write,
+            )
+
+        try:
+            results = benchmark.measure(
+                repeat=options["repeat"], cold=options["cold"], host=options["host"], log=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        report = {
+            "meta": {
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "seed": options["seed"],
+                "authors": Author.objects.count(),
+                "books": Book.objects.count(),
+                "copies": BookInstance.objects.count(),
+                "repeat": options["repeat"],
+                "cold": options["cold"],
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline["results"], tolerance=options["tolerance"])
+            for regression in regressions:
+                self.stderr.write(f"REGRESSION {regression}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
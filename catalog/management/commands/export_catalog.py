@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import export
+
+
+class Command(BaseCommand):
+    help = "Stream every book or copy in the catalog to an NDJSON or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(export.EXPORTS), help="what to export")
+        parser.add_argument("path", help="output file, or - for stdout")
+        parser.add_argument("--format", choices=sorted(export.FORMATS), help="output format (default: from the file extension)")
+        parser.add_argument("--gzip", action="store_true", help="gzip the output (default: when the path ends in .gz)")
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE, help="rows fetched from the database at a time")
+        parser.add_argument("--database", default="default", help="database to read from, e.g. a replica")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        name = path[:-3] if path.endswith(".gz") else path
+        output_format = options["format"] or ("csv" if name.endswith(".csv") else "ndjson")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        pieces = export.stream(
+            options["kind"], output_format, using=options["database"],
+            chunk_size=options["chunk_size"], compress=options["gzip"] or path.endswith(".gz"),
+        )
+        stream = sys.stdout.buffer if path == "-" else open(path, "wb")
+        written = 0
+        try:
+            for piece in pieces:
+                stream.write(piece)
+                written += len(piece)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        if path != "-":
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes of {options['kind']} to {path}."))
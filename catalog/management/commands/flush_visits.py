@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from catalog import visits
+
+
+class Command(BaseCommand):
+    help = "Write the visits buffered in the cache to the database"
+
+    def handle(self, *args, **options):
+        flushed = visits.flush_all()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} visits."))
@@ -0,0 +1,209 @@
+import csv
+import datetime
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.signals import post_bulk_save
+
+# one input row describes a book and the copies of it being onboarded;
+# books are deduplicated on ISBN, so further rows for a known ISBN only add copies
+#
+#   title, isbn, summary, author_first_name, author_middle_name, author_last_name,
+#   genres (";"-separated in CSV, a list in JSONL), language,
+#   imprint, status, due_back, copies (defaults to 1)
+
+STATUSES = {code for code, _ in BookInstance.LOAN_STATUS}
+
+def _read_csv(stream):
+    for row in csv.DictReader(stream):
+        row["genres"] = [name for name in (row.get("genres") or "").split(";") if name.strip()]
+        yield row
+
+def _read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+def _clean(row):
+    """normalize one input row, raising ValueError when it can't be imported"""
+    title = (row.get("title") or "").strip()
+    isbn = (row.get("isbn") or "").strip()
+    if not title or not isbn:
+        raise ValueError("title and isbn are required")
+    if len(isbn) > 13:
+        raise ValueError(f"isbn {isbn!r} is longer than 13 characters")
+    status = (row.get("status") or BookInstance._meta.get_field("status").default).strip()
+    if status not in STATUSES:
+        raise ValueError(f"unknown status {status!r}")
+    genres = row.get("genres") or []
+    if isinstance(genres, str):
+        genres = genres.split(";")
+    return {
+        "title": title,
+        "isbn": isbn,
+        "summary": (row.get("summary") or "").strip(),
+        "author": tuple((row.get(f"author_{part}_name") or "").strip() for part in ("last", "first", "middle")),
+        "genres": [name.strip() for name in genres if name.strip()],
+        "language": (row.get("language") or "").strip(),
+        "imprint": (row.get("imprint") or "").strip(),
+        "status": status,
+        "due_back": datetime.date.fromisoformat(row["due_back"]) if row.get("due_back") else None,
+        "copies": int(row.get("copies") or 1),
+    }
+
+class Command(BaseCommand):
+    help = "Stream books, authors and copies from a CSV or JSONL file into the catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="input file, or - for stdin")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default: from the file extension)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="rows per transaction and bulk insert")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        self.batch_size = options["batch_size"]
+        if self.batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+
+        # genres and languages are few, keep them all in memory
+        self.genres = dict(Genre.objects.values_list("name", "id"))
+        self.languages = dict(Language.objects.values_list("name", "id"))
+        self.totals = {"rows": 0, "skipped": 0, "books": 0, "authors": 0, "copies": 0}
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        started = time.monotonic()
+        try:
+            rows = _read_jsonl(stream) if input_format == "jsonl" else _read_csv(stream)
+            while True:
+                chunk = list(islice(rows, self.batch_size))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"{self.totals['rows']} rows ({self.totals['rows'] / elapsed:.0f} rows/sec)")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.totals['rows']} rows in {elapsed:.1f}s ({self.totals['rows'] / max(elapsed, 1e-6):.0f} rows/sec): "
+            f"{self.totals['books']} new books, {self.totals['authors']} new authors, "
+            f"{self.totals['copies']} copies, {self.totals['skipped']} rows skipped."
+        ))
+
+    def import_chunk(self, chunk):
+        rows = []
+        for raw in chunk:
+            self.totals["rows"] += 1
+            try:
+                rows.append(_clean(raw))
+            except (ValueError, TypeError) as error:
+                self.totals["skipped"] += 1
+                self.stderr.write(f"row {self.totals['rows']}: {error}")
+
+        self.resolve_names(rows)
+        authors = self.resolve_authors({row["author"] for row in rows if any(row["author"])})
+        books = self.resolve_books(rows, authors)
+
+        copies = [
+            BookInstance(
+                book_id=books[row["isbn"]],
+                imprint=row["imprint"],
+                status=row["status"],
+                due_back=row["due_back"],
+            )
+            for row in rows
+            for _ in range(row["copies"])
+        ]
+        BookInstance.objects.bulk_create(copies, batch_size=self.batch_size)
+        self.totals["copies"] += len(copies)
+        post_bulk_save.send(sender=BookInstance, pks=[copy.pk for copy in copies])
+
+    def resolve_names(self, rows):
+        """create genres and languages not seen before"""
+        for model, lookup, names in (
+            (Genre, self.genres, {name for row in rows for name in row["genres"]}),
+            (Language, self.languages, {row["language"] for row in rows if row["language"]}),
+        ):
+            missing = sorted(names - lookup.keys())
+            if missing:
+                model.objects.bulk_create([model(name=name) for name in missing])
+                lookup.update(model.objects.filter(name__in=missing).values_list("name", "id"))
+                post_bulk_save.send(sender=model, pks=[lookup[name] for name in missing])
+
+    def resolve_authors(self, keys):
+        """map (last, first, middle) to an author id, creating missing authors"""
+        if not keys:
+            return {}
+
+        def lookup():
+            found = {}
+            for author_id, *key in Author.objects.filter(last_name__in={key[0] for key in keys}).values_list(
+                "id", "last_name", "first_name", "middle_name"
+            ).order_by("id"):
+                found.setdefault(tuple(key), author_id)
+            return found
+
+        authors = lookup()
+        missing = keys - authors.keys()
+        if missing:
+            Author.objects.bulk_create(
+                [Author(last_name=last, first_name=first, middle_name=middle) for last, first, middle in missing],
+                batch_size=self.batch_size,
+            )
+            authors = lookup()
+            self.totals["authors"] += len(missing)
+            post_bulk_save.send(sender=Author, pks=[authors[key] for key in missing])
+        return authors
+
+    def resolve_books(self, rows, authors):
+        """map ISBN to a book id, creating books (and their genre links) for new ISBNs"""
+        isbns = {row["isbn"] for row in rows}
+        books = dict(Book.objects.filter(isbn__in=isbns).values_list("isbn", "id"))
+
+        new_rows = {}
+        for row in rows:
+            if row["isbn"] not in books:
+                new_rows.setdefault(row["isbn"], row)
+        if not new_rows:
+            return books
+
+        created = Book.objects.bulk_create(
+            [
+                Book(
+                    title=row["title"],
+                    isbn=isbn,
+                    summary=row["summary"],
+                    author_id=authors.get(row["author"]),
+                    language_id=self.languages.get(row["language"]),
+                )
+                for isbn, row in new_rows.items()
+            ],
+            batch_size=self.batch_size,
+        )
+        if connection.features.can_return_rows_from_bulk_insert:
+            books.update((book.isbn, book.pk) for book in created)
+        else:
+            books.update(Book.objects.filter(isbn__in=new_rows.keys()).values_list("isbn", "id"))
+
+        Book.genre.through.objects.bulk_create(
+            [
+                Book.genre.through(book_id=books[isbn], genre_id=self.genres[name])
+                for isbn, row in new_rows.items()
+                for name in set(row["genres"])
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        self.totals["books"] += len(new_rows)
+        post_bulk_save.send(sender=Book, pks=[books[isbn] for isbn in new_rows])
+        return books
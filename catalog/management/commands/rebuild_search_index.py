@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for books and authors"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
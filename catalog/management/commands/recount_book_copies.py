@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute every book's copy counters from its BookInstance rows"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = counters.recount()
+        self.stdout.write(self.style.SUCCESS(f"Recounted copies for {updated} books."))
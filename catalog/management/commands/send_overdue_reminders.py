@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import reminders
+
+
+class Command(BaseCommand):
+    help = "Queue one overdue-loan digest per borrower in the mail queue and send the queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="digests per bulk insert, messages per send batch")
+        parser.add_argument("--queue-only", action="store_true", help="only queue the digests, leave sending to send_mail")
+        parser.add_argument("--throttle", type=float, help="seconds between messages (default: MAILER_EMAIL_THROTTLE)")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        digests, loans = reminders.enqueue(batch_size=options["batch_size"])
+        self.stdout.write(f"Queued {digests} reminders covering {loans} overdue loans.")
+        if options["queue_only"]:
+            return
+        sent, deferred = reminders.deliver(batch_size=options["batch_size"], throttle=options["throttle"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} messages, deferred {deferred}."))
@@ -0,0 +1,71 @@
+from django.db import migrations
+from django.db.utils import NotSupportedError
+
+# full-text index over books and authors, see catalog/search.py
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE catalog_searchindex (
+        kind varchar(10) NOT NULL,
+        object_id bigint NOT NULL,
+        document tsvector NOT NULL,
+        PRIMARY KEY (kind, object_id)
+    )
+    """,
+    "CREATE INDEX catalog_searchindex_document ON catalog_searchindex USING GIN (document)",
+    """
+    INSERT INTO catalog_searchindex (kind, object_id, document)
+    SELECT 'book', id,
+        setweight(to_tsvector('english', title || ' ' || isbn), 'A') ||
+        setweight(to_tsvector('english', summary), 'B')
+    FROM catalog_book
+    """,
+    """
+    INSERT INTO catalog_searchindex (kind, object_id, document)
+    SELECT 'author', id,
+        setweight(to_tsvector('english', concat_ws(' ', first_name, middle_name, last_name)), 'A')
+    FROM catalog_author
+    """,
+]
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE catalog_searchindex USING fts5(
+        kind UNINDEXED, object_id UNINDEXED, heading, body,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    INSERT INTO catalog_searchindex (rowid, kind, object_id, heading, body)
+    SELECT id * 2, 'book', id, title || ' ' || isbn, summary FROM catalog_book
+    """,
+    """
+    INSERT INTO catalog_searchindex (rowid, kind, object_id, heading, body)
+    SELECT id * 2 + 1, 'author', id, first_name || ' ' || middle_name || ' ' || last_name, ''
+    FROM catalog_author
+    """,
+]
+
+def create_search_index(apps, schema_editor):
+    statements = {
+        "postgresql": POSTGRES_CREATE,
+        "sqlite": SQLITE_CREATE,
+    }.get(schema_editor.connection.vendor)
+    if statements is None:
+        raise NotSupportedError(f"full-text search is not supported on {schema_editor.connection.vendor}")
+    for statement in statements:
+        schema_editor.execute(statement)
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute("DROP TABLE catalog_searchindex")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_alter_bookinstance_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+import catalog.pagination
+from django.db import migrations, models
+
+# indexes matching the keyset pagination orderings, and partial ones over the
+# copies on loan (see catalog.pagination.KeysetIndex)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_book_copy_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=catalog.pagination.KeysetIndex(fields=['last_name', 'first_name', 'middle_name', 'id'], name='catalog_author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=catalog.pagination.KeysetIndex(fields=['title', 'id'], name='catalog_book_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=catalog.pagination.KeysetIndex(condition=models.Q(('status', 'o')), fields=['due_back', 'id'], name='catalog_bi_on_loan_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=catalog.pagination.KeysetIndex(condition=models.Q(('status', 'o')), fields=['borrower', 'due_back', 'id'], name='catalog_bi_on_loan_user_idx'),
+        ),
+    ]
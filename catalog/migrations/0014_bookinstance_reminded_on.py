@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_visitcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookinstance',
+            name='reminded_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
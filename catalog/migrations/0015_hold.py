@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0014_bookinstance_reminded_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('placed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['placed_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=models.Index(condition=models.Q(('status', 'a')), fields=['book', 'id'], name='catalog_bi_available_idx'),
+        ),
+        migrations.AddField(
+            model_name='hold',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='catalog.book'),
+        ),
+        migrations.AddField(
+            model_name='hold',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='hold',
+            index=models.Index(fields=['book', 'placed_at', 'id'], name='catalog_hold_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.UniqueConstraint(fields=('book', 'user'), name='catalog_hold_once_per_reader'),
+        ),
+    ]
@@ -1,9 +1,19 @@
 import uuid
 from datetime import date
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, router, transaction
+
+from catalog.pagination import KeysetIndex
 # from django.urls import reverse
 
+class ChangeLogged:
+    """Saves in one transaction with the change log rows the signals write (see catalog/changes.py)."""
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
 # Create your models here.
 class Genre(models.Model):
     """Model representing book genre."""
@@ -21,16 +31,20 @@ class Language(models.Model):
         """String representing the Language object"""
         return self.name
 
-class Author(models.Model):
+class Author(ChangeLogged, models.Model):
     """Model representing an author."""
     last_name = models.CharField(max_length=100)
     first_name = models.CharField(max_length=100)
     middle_name = models.CharField(max_length=100, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('Died', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['last_name', 'first_name', 'middle_name']
+        indexes = [
+            KeysetIndex(fields=['last_name', 'first_name', 'middle_name', 'id'], name='catalog_author_name_idx'),
+        ]
 
     def __str__(self):
         if self.middle_name:
@@ -38,7 +52,7 @@ class Author(models.Model):
         else:
             return f"{self.last_name}, {self.first_name}"
 
-class Book(models.Model):
+class Book(ChangeLogged, models.Model):
     """Model representing a book (general information, NOT rental information)."""
     title = models.CharField(max_length=200)
     author = models.ForeignKey(Author, on_delete=models.SET_NULL, null=True) 
@@ -51,18 +65,58 @@ class Book(models.Model):
         )
     genre = models.ManyToManyField(Genre, help_text='Select a genre for this book.')
     language = models.ForeignKey('Language', on_delete=models.SET_NULL, null=True)
+    # copy counts kept in step with BookInstance writes (see catalog/counters.py)
+    copies_total = models.PositiveIntegerField(default=0, editable=False)
+    copies_available = models.PositiveIntegerField(default=0, editable=False)
+    copies_on_loan = models.PositiveIntegerField(default=0, editable=False)
+    copies_maintenance = models.PositiveIntegerField(default=0, editable=False)
+    copies_reserved = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    COUNTER_FIELDS = ('copies_total', 'copies_available', 'copies_on_loan', 'copies_maintenance', 'copies_reserved')
+
+    class Meta:
+        indexes = [
+            KeysetIndex(fields=['title', 'id'], name='catalog_book_title_idx'),
+        ]
 
     def __str__(self):
         """String representation of Book object."""
         return self.title
 
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        """Save the book without overwriting copy counters changed since it was loaded."""
+        if not self._state.adding and update_fields is None and not force_insert:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+
     def display_genre(self):
         """Create a string for genre; required to display genre in Admin"""
         return ", ".join(genre.name for genre in self.genre.all()[:3])
     
     display_genre.short_description = "Genre"
 
-class BookInstance(models.Model):
+class BookInstanceQuerySet(models.QuerySet):
+    """Queries over book copies that can be filtered and sorted in the database."""
+
+    def on_loan(self):
+        return self.filter(status__exact='o')
+
+    def overdue(self, today=None):
+        """copies on loan whose due date has passed"""
+        return self.on_loan().filter(due_back__lt=today or date.today())
+
+    def with_overdue(self, today=None):
+        """annotate each copy with a boolean `overdue`, matching BookInstance.is_overdue for loans"""
+        return self.annotate(overdue=models.ExpressionWrapper(
+            models.Q(status='o', due_back__lt=today or date.today()),
+            output_field=models.BooleanField(),
+        ))
+
+class BookInstance(ChangeLogged, models.Model):
     """Model representing a specific copy of a book (ex. of rental stock)."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, help_text='Unique ID for this particular book across whole library.')
     book = models.ForeignKey('Book', on_delete=models.RESTRICT, null=True)
@@ -84,10 +138,23 @@ class BookInstance(models.Model):
         default='m',
         help_text='Book availability',
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # date of the last overdue reminder that listed this loan (see catalog/reminders.py)
+    reminded_on = models.DateField(null=True, blank=True, editable=False)
+
+    objects = BookInstanceQuerySet.as_manager()
 
     class Meta:
         ordering = ['due_back']
         permissions = (('can_mark_returned', 'set_as_returned'),)
+        indexes = [
+            # loans by due date: overdue lookups and the staff loan list
+            KeysetIndex(fields=['due_back', 'id'], condition=models.Q(status='o'), name='catalog_bi_on_loan_due_idx'),
+            # a borrower's loans by due date, and the overdue report
+            KeysetIndex(fields=['borrower', 'due_back', 'id'], condition=models.Q(status='o'), name='catalog_bi_on_loan_user_idx'),
+            # a book's available copies, claimed by checkouts (see catalog/loans.py)
+            models.Index(fields=['book', 'id'], condition=models.Q(status='a'), name='catalog_bi_available_idx'),
+        ]
 
     def __str__(self):
         return f"{self.id} ({self.book.title})"
@@ -97,4 +164,51 @@ class BookInstance(models.Model):
         """method that checks whether a book is overdue or not"""
         if self.due_back and date.today() > self.due_back:
             return True
-        return False
\ No newline at end of file
+        return False
+
+class Hold(models.Model):
+    """Model representing a reader waiting for a copy of a book (see catalog/loans.py)."""
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='holds')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holds')
+    placed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['placed_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'user'], name='catalog_hold_once_per_reader'),
+        ]
+        indexes = [
+            # a book's queue, first come first served
+            models.Index(fields=['book', 'placed_at', 'id'], name='catalog_hold_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} waiting for {self.book_id} since {self.placed_at:%Y-%m-%d}"
+
+class VisitCounter(models.Model):
+    """Model holding a persisted page visit count (see catalog/visits.py)."""
+    name = models.CharField(max_length=100, unique=True)
+    count = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.count}"
+
+class Change(models.Model):
+    """Model representing a write to an author, book or copy, in the append-only change log (see catalog/changes.py)."""
+    KINDS = (
+        ('author', 'Author'),
+        ('book', 'Book'),
+        ('copy', 'Copy'),
+    )
+
+    kind = models.CharField(max_length=6, choices=KINDS)
+    object_id = models.CharField(max_length=36)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # the feed reads forward from a cursor by the primary key
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.id}: {self.kind} {self.object_id}{' deleted' if self.deleted else ''}"
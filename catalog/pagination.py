@@ -0,0 +1,254 @@
+import base64
+import binascii
+import copy
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections, models
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+# keyset (cursor) pagination
+#
+# instead of OFFSET n, a page is "the next per_page rows after the last row
+# of the previous page" in the view's ordering, expressed as a WHERE clause
+# over the ordering columns. with an index on those columns page N costs the
+# same as page 1, and no COUNT(*) is needed. the primary key is always added
+# as the last ordering column so every row has a unique position.
+#
+# nullable columns are ordered NULLS FIRST (ascending) / NULLS LAST
+# (descending) on every backend, so NULL consistently sorts lowest.
+
+CURSOR_PARAM = "cursor"
+
+class InvalidCursor(Exception):
+    pass
+
+def get_ordering(model, ordering):
+    """return [(field, descending)] for the ordering, with the pk as tiebreaker"""
+    fields = []
+    for name in ordering:
+        descending = name.startswith("-")
+        field = model._meta.pk if name.lstrip("-") == "pk" else model._meta.get_field(name.lstrip("-"))
+        fields.append((field, descending))
+    if model._meta.pk not in [field for field, _ in fields]:
+        fields.append((model._meta.pk, False))
+    return fields
+
+def _order_by(fields, reverse=False):
+    expressions = []
+    for field, descending in fields:
+        descending = descending != reverse
+        if descending:
+            expressions.append(F(field.attname).desc(nulls_last=True) if field.null else F(field.attname).desc())
+        else:
+            expressions.append(F(field.attname).asc(nulls_first=True) if field.null else F(field.attname).asc())
+    return expressions
+
+def order(queryset, ordering):
+    """return queryset sorted in keyset order: ordering, then pk, NULLs lowest"""
+    return queryset.order_by(*_order_by(get_ordering(queryset.model, ordering)))
+
+class KeysetIndex(models.Index):
+    """
+    An index whose columns sort the way keyset pagination orders them.
+
+    PostgreSQL puts NULLs last in ascending indexes, so nullable columns get
+    an explicit NULLS FIRST (ascending) / NULLS LAST (descending); SQLite
+    already sorts NULLs lowest. List the pk last to cover the tiebreaker.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        index = self
+        if schema_editor.connection.vendor == "postgresql":
+            index = copy.copy(self)
+            index.fields_orders = [
+                (name, _nulls_suffix(model._meta.get_field(name), order)) for name, order in self.fields_orders
+            ]
+        return super(KeysetIndex, index).create_sql(model, schema_editor, using=using, **kwargs)
+
+def _nulls_suffix(field, order):
+    if not field.null:
+        return order
+    return "DESC NULLS LAST" if order == "DESC" else "NULLS FIRST"
+
+def _beyond(field, value, upward):
+    """Q for rows sorting strictly above (upward) or below a value, NULL lowest"""
+    name = field.attname
+    if upward:
+        if value is None:
+            return Q(**{f"{name}__isnull": False})
+        return Q(**{f"{name}__gt": value})
+    if value is None:
+        return Q(pk__in=[])
+    condition = Q(**{f"{name}__lt": value})
+    if field.null:
+        condition |= Q(**{f"{name}__isnull": True})
+    return condition
+
+def _equal(field, value):
+    if value is None:
+        return Q(**{f"{field.attname}__isnull": True})
+    return Q(**{field.attname: value})
+
+def _seek(fields, values, forward):
+    """Q for rows after (forward) or before the position given by values"""
+    conditions = []
+    prefix = Q()
+    for (field, descending), value in zip(fields, values):
+        conditions.append(prefix & _beyond(field, value, upward=forward != descending))
+        prefix &= _equal(field, value)
+    condition = reduce(operator.or_, conditions)
+
+    # repeat the first column as a plain range, so the planner walks one
+    # index range instead of OR-ing an index search per column
+    (field, descending), value = fields[0], values[0]
+    upward = forward != descending
+    if value is not None and (upward or not field.null):
+        condition &= Q(**{f"{field.attname}__{'gte' if upward else 'lte'}": value})
+    return condition
+
+def encode_cursor(fields, obj, forward):
+    values = [getattr(obj, field.attname) for field, _ in fields]
+    payload = json.dumps({"f": forward, "v": values}, cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(fields, cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = [field.to_python(value) for (field, _), value in zip(fields, payload["v"])]
+        forward = bool(payload["f"])
+    except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+        raise InvalidCursor(cursor)
+    if len(values) != len(fields):
+        raise InvalidCursor(cursor)
+    return values, forward
+
+class KeysetPage:
+    """one page of a keyset-paginated queryset"""
+
+    is_keyset = True
+
+    def __init__(self, object_list, fields, has_next, has_previous):
+        self.object_list = object_list
+        self.fields = fields
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.fields, self.object_list[-1], forward=True)
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.fields, self.object_list[0], forward=False)
+
+def paginate(queryset, ordering, cursor, per_page):
+    """return the KeysetPage of queryset found at cursor ("" for the first page)"""
+    fields = get_ordering(queryset.model, ordering)
+    if not cursor:
+        rows = list(queryset.order_by(*_order_by(fields))[:per_page + 1])
+        return KeysetPage(rows[:per_page], fields, has_next=len(rows) > per_page, has_previous=False)
+
+    values, forward = decode_cursor(fields, cursor)
+    queryset = queryset.filter(_seek(fields, values, forward))
+    if forward:
+        rows = list(queryset.order_by(*_order_by(fields))[:per_page + 1])
+        return KeysetPage(rows[:per_page], fields, has_next=len(rows) > per_page, has_previous=True)
+    # walk backwards from the cursor, then restore the display order
+    rows = list(queryset.order_by(*_order_by(fields, reverse=True))[:per_page + 1])
+    return KeysetPage(rows[:per_page][::-1], fields, has_next=True, has_previous=len(rows) > per_page)
+
+class KeysetPaginationMixin:
+    """
+    Opt-in keyset pagination for a ListView.
+
+    Requests carrying ?cursor= (empty for the first page) are paginated on
+    keyset_ordering; all other requests keep the regular page numbers,
+    unless keyset_default is set.
+    """
+
+    keyset_ordering = None
+    keyset_default = False
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering or self.model._meta.ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        if CURSOR_PARAM not in self.request.GET and not self.keyset_default:
+            # page numbers walk the same order (and index) as the keyset pages
+            return super().paginate_queryset(order(queryset, self.get_keyset_ordering()), page_size)
+        try:
+            page = paginate(queryset, self.get_keyset_ordering(), self.request.GET.get(CURSOR_PARAM, ""), page_size)
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return (None, page, page.object_list, page.has_other_pages())
+
+
+# estimated counts
+#
+# COUNT(*) over a whole large table is a full scan on PostgreSQL. the
+# planner's statistics already hold the row count as of the last ANALYZE
+# (or autovacuum), which is close enough for a page count.
+
+def estimated_count(model, using="default"):
+    """return the planner's row estimate for model's table, or None without statistics"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+            row = cursor.fetchone()
+            # -1 until the table is first analyzed
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == "sqlite":
+            try:
+                # the first number of any of the table's rows is its row count
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            except DatabaseError:
+                # no sqlite_stat1 before the first ANALYZE
+                return None
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A Paginator that counts an unfiltered queryset from the table statistics.
+
+    The estimate is used once it reaches estimate_threshold rows; smaller
+    tables and filtered querysets are counted exactly.
+    """
+
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, "query") and not queryset.query.where and not queryset.query.distinct:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
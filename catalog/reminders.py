@@ -0,0 +1,136 @@
+import datetime
+import smtplib
+import time
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from mailer.engine import acquire_lock, ensure_message_id, release_lock
+from mailer.models import PRIORITY_DEFERRED, PRIORITY_MEDIUM, RESULT_FAILURE, RESULT_SUCCESS, Message, MessageLog, get_message_id
+
+from catalog.models import BookInstance
+
+# overdue reminders: one digest per borrower, queued in django-mailer's table
+#
+# the overdue loans of everyone due a reminder are read in one query, in
+# borrower order off the on-loan borrower index, and grouped while streaming.
+# each batch of digests is queued with one bulk insert, in the transaction
+# that marks its loans reminded, so a second run on the same day skips them.
+# deliver() then sends queued messages over one SMTP connection.
+
+SUBJECT_TEMPLATE = "catalog/email/overdue_reminder_subject.txt"
+BODY_TEMPLATE = "catalog/email/overdue_reminder.txt"
+# connection failures after which the connection is opened again
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+def due(today=None):
+    """overdue loans of borrowers with an email and a loan not reminded about today, by borrower"""
+    today = today or datetime.date.today()
+    overdue = BookInstance.objects.overdue(today).exclude(borrower__email="")
+    pending = overdue.exclude(reminded_on=today).values("borrower")
+    return (
+        overdue.filter(borrower__in=pending)
+        .select_related("book", "borrower")
+        .order_by("borrower", "due_back", "id")
+    )
+
+def render(borrower, loans, today):
+    context = {"borrower": borrower, "loans": loans, "today": today}
+    subject = " ".join(render_to_string(SUBJECT_TEMPLATE, context).split())
+    return EmailMessage(subject, render_to_string(BODY_TEMPLATE, context), to=[borrower.email])
+
+def enqueue(today=None, batch_size=1000):
+    """queue a digest for every borrower due a reminder, returning (digests, loans)"""
+    today = today or datetime.date.today()
+    loans = due(today).iterator(chunk_size=batch_size)
+    digests = (list(group) for _, group in groupby(loans, key=lambda loan: loan.borrower_id))
+    totals = [0, 0]
+    while True:
+        batch = list(islice(digests, batch_size))
+        if not batch:
+            return tuple(totals)
+        messages, reminded = [], []
+        for loans in batch:
+            message = Message(priority=PRIORITY_MEDIUM)
+            message.email = render(loans[0].borrower, loans, today)
+            messages.append(message)
+            reminded.extend(loan.pk for loan in loans)
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+            BookInstance.objects.filter(pk__in=reminded).update(reminded_on=today)
+        totals[0] += len(messages)
+        totals[1] += len(reminded)
+
+def deliver(messages=None, batch_size=1000, throttle=None):
+    """
+    send queued messages over one SMTP connection, returning (sent, deferred)
+
+    Messages are read batch_size at a time; the sent ones are deleted and
+    logged per batch. A message the server refuses is deferred, as
+    django-mailer does. throttle (default MAILER_EMAIL_THROTTLE) is slept
+    between messages. Holds django-mailer's send lock (MAILER_USE_FILE_LOCK),
+    so it never sends alongside its send_mail command.
+    """
+    messages = Message.objects.non_deferred() if messages is None else messages
+    if throttle is None:
+        throttle = getattr(settings, "MAILER_EMAIL_THROTTLE", 0)
+    use_lock = getattr(settings, "MAILER_USE_FILE_LOCK", True)
+    if use_lock:
+        acquired, lock = acquire_lock()
+        if not acquired:
+            return 0, 0
+    backend = getattr(settings, "MAILER_EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+    connection = get_connection(backend=backend)
+    sent = deferred = 0
+    last_pk = 0
+    try:
+        while True:
+            batch = list(messages.filter(pk__gt=last_pk).order_by("pk")[:batch_size])
+            if not batch:
+                return sent, deferred
+            last_pk = batch[-1].pk
+            done, failed, discarded, logs = [], [], [], []
+            for message in batch:
+                email = message.email
+                if email is None:
+                    # unreadable, dropped as django-mailer does
+                    discarded.append(message.pk)
+                    continue
+                ensure_message_id(email)
+                try:
+                    # send_messages() would open and close a connection per call
+                    connection.open()
+                    connection.send_messages([email])
+                except Exception as error:
+                    if isinstance(error, CONNECTION_ERRORS):
+                        connection.close()
+                    failed.append(message.pk)
+                    logs.append(_log(message, email, RESULT_FAILURE, error))
+                else:
+                    done.append(message.pk)
+                    logs.append(_log(message, email, RESULT_SUCCESS))
+                if throttle:
+                    time.sleep(throttle)
+            with transaction.atomic():
+                Message.objects.filter(pk__in=done + discarded).delete()
+                Message.objects.filter(pk__in=failed).update(priority=PRIORITY_DEFERRED, retry_count=F("retry_count") + 1)
+                MessageLog.objects.bulk_create(logs)
+            sent += len(done)
+            deferred += len(failed)
+    finally:
+        connection.close()
+        if use_lock:
+            release_lock(lock)
+
+def _log(message, email, result, error=""):
+    return MessageLog(
+        message_data=message.message_data,
+        message_id=get_message_id(email),
+        when_added=message.when_added,
+        priority=message.priority,
+        result=result,
+        log_message=str(error),
+    )
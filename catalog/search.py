@@ -0,0 +1,294 @@
+import re
+from collections import namedtuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+
+from catalog.models import Author, Book
+
+# ranked full-text search over books and authors
+#
+# the index lives in its own table (created by migration 0009): a tsvector
+# column with a GIN index on PostgreSQL, an FTS5 virtual table on SQLite.
+# every row has a heavily weighted "heading" (title + ISBN, or the author's
+# names) and a lightly weighted "body" (the book summary).
+#
+# ranking and counting stop at MAX_CANDIDATES matches, so a common word costs
+# no more than a rare one: the best of the first MAX_CANDIDATES matches are
+# returned, and counts (so page numbers) stop there.
+
+INDEX_TABLE = "catalog_searchindex"
+MAX_CANDIDATES = 1000
+
+KINDS = {"book": Book, "author": Author}
+
+SearchHit = namedtuple("SearchHit", ["kind", "object", "rank"])
+
+def _document(instance):
+    """return (kind, heading, body) for a Book or Author"""
+    if isinstance(instance, Book):
+        return "book", f"{instance.title} {instance.isbn}", instance.summary or ""
+    if isinstance(instance, Author):
+        names = (instance.first_name, instance.middle_name, instance.last_name)
+        return "author", " ".join(name for name in names if name), ""
+    raise TypeError(f"{type(instance).__name__} is not searchable")
+
+class PostgresSearchBackend:
+    """tsvector documents ranked with ts_rank, matched through a GIN index"""
+
+    config = "english"
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _vector(self, heading, body):
+        return (
+            f"setweight(to_tsvector('{self.config}', {heading}), 'A') || "
+            f"setweight(to_tsvector('{self.config}', {body}), 'B')"
+        )
+
+    def index(self, instance):
+        kind, heading, body = _document(instance)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {INDEX_TABLE} (kind, object_id, document) "
+                f"VALUES (%s, %s, {self._vector('%s', '%s')}) "
+                f"ON CONFLICT (kind, object_id) DO UPDATE SET document = EXCLUDED.document",
+                [kind, instance.pk, heading, body],
+            )
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE kind = %s AND object_id = %s", [kind, pk])
+
+    def _insert_select(self, kind, where=""):
+        if kind == "book":
+            vector, table = self._vector("title || ' ' || isbn", "summary"), Book._meta.db_table
+        else:
+            vector = self._vector("concat_ws(' ', first_name, middle_name, last_name)", "''")
+            table = Author._meta.db_table
+        return (
+            f"INSERT INTO {INDEX_TABLE} (kind, object_id, document) "
+            f"SELECT '{kind}', id, {vector} FROM {table}{where}"
+        )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {INDEX_TABLE}")
+            cursor.execute(self._insert_select("book"))
+            cursor.execute(self._insert_select("author"))
+
+    def index_many(self, kind, pks):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE kind = %s AND object_id = ANY(%s)", [kind, list(pks)])
+            cursor.execute(self._insert_select(kind, " WHERE id = ANY(%s)"), [list(pks)])
+
+    def _tsquery(self, query, prefix):
+        """the tsquery SQL and its parameter; prefix makes the last word match as a prefix"""
+        if not prefix:
+            return f"plainto_tsquery('{self.config}', %s)", query
+        # \w+ words carry no tsquery operators
+        words = re.findall(r"\w+", query)
+        return f"to_tsquery('{self.config}', %s)", " & ".join(words[:-1] + [f"{words[-1]}:*"]) if words else ""
+
+    def _candidates(self, query, kind, prefix):
+        """SQL and parameters for the first MAX_CANDIDATES matching rows, unranked"""
+        tsquery, param = self._tsquery(query, prefix)
+        sql = f"SELECT kind, object_id, document FROM {INDEX_TABLE} WHERE document @@ {tsquery}"
+        params = [param]
+        if kind:
+            sql += " AND kind = %s"
+            params.append(kind)
+        return f"{sql} LIMIT {MAX_CANDIDATES}", params
+
+    def count(self, query, kind=None, prefix=False):
+        candidates, params = self._candidates(query, kind, prefix)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({candidates}) AS candidates", params)
+            return cursor.fetchone()[0]
+
+    def ranked(self, query, kind=None, offset=0, limit=10, prefix=False):
+        candidates, params = self._candidates(query, kind, prefix)
+        tsquery, param = self._tsquery(query, prefix)
+        sql = (
+            f"SELECT kind, object_id, ts_rank(document, {tsquery}) AS rank "
+            f"FROM ({candidates}) AS candidates "
+            f"ORDER BY rank DESC, kind, object_id LIMIT %s OFFSET %s"
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [param, *params, limit, offset])
+            return cursor.fetchall()
+
+class SQLiteSearchBackend:
+    """FTS5 documents ranked with bm25"""
+
+    # the FTS5 rowid packs the object id and its kind, so updates and
+    # deletes are rowid lookups instead of scans of the UNINDEXED columns
+    kind_codes = {"book": 0, "author": 1}
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _rowid(self, kind, pk):
+        return pk * len(self.kind_codes) + self.kind_codes[kind]
+
+    def _match(self, query, prefix=False):
+        # quote every word so user input can't inject FTS5 query syntax
+        match = " ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+        return f"{match}*" if prefix and match else match
+
+    def index(self, instance):
+        kind, heading, body = _document(instance)
+        rowid = self._rowid(kind, instance.pk)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [rowid])
+            cursor.execute(
+                f"INSERT INTO {INDEX_TABLE} (rowid, kind, object_id, heading, body) VALUES (%s, %s, %s, %s, %s)",
+                [rowid, kind, instance.pk, heading, body],
+            )
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [self._rowid(kind, pk)])
+
+    def _insert_select(self, kind, where=""):
+        rowid = f"id * {len(self.kind_codes)} + {self.kind_codes[kind]}"
+        if kind == "book":
+            columns, table = "title || ' ' || isbn, summary", Book._meta.db_table
+        else:
+            columns, table = "first_name || ' ' || middle_name || ' ' || last_name, ''", Author._meta.db_table
+        return (
+            f"INSERT INTO {INDEX_TABLE} (rowid, kind, object_id, heading, body) "
+            f"SELECT {rowid}, '{kind}', id, {columns} FROM {table}{where}"
+        )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+            cursor.execute(self._insert_select("book"))
+            cursor.execute(self._insert_select("author"))
+
+    def index_many(self, kind, pks):
+        pks = list(pks)
+        placeholders = ", ".join(["%s"] * len(pks))
+        rowids = [self._rowid(kind, pk) for pk in pks]
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid IN ({placeholders})", rowids)
+            cursor.execute(self._insert_select(kind, f" WHERE id IN ({placeholders})"), pks)
+
+    def _candidates(self, match, kind):
+        """SQL and parameters for the rowids of the first MAX_CANDIDATES matching rows, unranked"""
+        sql = f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s"
+        params = [match]
+        if kind:
+            sql += " AND kind = %s"
+            params.append(kind)
+        return f"{sql} LIMIT {MAX_CANDIDATES}", params
+
+    def count(self, query, kind=None, prefix=False):
+        match = self._match(query, prefix)
+        if not match:
+            return 0
+        candidates, params = self._candidates(match, kind)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({candidates})", params)
+            return cursor.fetchone()[0]
+
+    def ranked(self, query, kind=None, offset=0, limit=10, prefix=False):
+        match = self._match(query, prefix)
+        if not match:
+            return []
+        candidates, params = self._candidates(match, kind)
+        # bm25 is lower-is-better; weight the heading ten times the body.
+        # bm25() needs the MATCH, the candidates turn it into rowid lookups
+        sql = (
+            f"SELECT kind, object_id, bm25({INDEX_TABLE}, 0, 0, 10.0, 1.0) AS rank "
+            f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s AND rowid IN ({candidates}) "
+            f"ORDER BY rank, kind, object_id LIMIT %s OFFSET %s"
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [match, *params, limit, offset])
+            return cursor.fetchall()
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+def get_backend(connection=None):
+    """return the search backend for the given connection, or the one the catalog is written to"""
+    connection = connection or connections[router.db_for_write(Book)]
+    try:
+        return BACKENDS[connection.vendor](connection)
+    except KeyError:
+        raise ImproperlyConfigured(f"full-text search is not supported on {connection.vendor}")
+
+def _read_backend():
+    # the index is read on the database the catalog is read from
+    return get_backend(connections[router.db_for_read(Book)])
+
+class SearchResults:
+    """
+    Lazily evaluated, relevance-ordered search hits.
+
+    Supports count() and slicing, so it can be handed straight to a Paginator;
+    each slice runs one ranked query plus one in_bulk() per kind on the page.
+    """
+
+    def __init__(self, query, kind=None, backend=None):
+        self.query = query
+        self.kind = kind
+        self.backend = backend or _read_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query, self.kind)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        limit = (key.stop if key.stop is not None else self.count()) - offset
+        if limit <= 0:
+            return []
+        rows = self.backend.ranked(self.query, self.kind, offset=offset, limit=limit)
+        objects = {}
+        for kind, model in KINDS.items():
+            pks = [pk for row_kind, pk, rank in rows if row_kind == kind]
+            if pks:
+                objects[kind] = model.objects.in_bulk(pks)
+        # skip ids whose object vanished between the two queries
+        return [
+            SearchHit(kind, objects[kind][pk], rank)
+            for kind, pk, rank in rows
+            if pk in objects.get(kind, {})
+        ]
+
+def search(query, kind=None):
+    """search books and authors, best matches first"""
+    return SearchResults(query, kind)
+
+def ranked_ids(query, kind, limit, prefix=False):
+    """ids of the best matches of one kind; prefix also matches the last word as a prefix"""
+    return [pk for _, pk, _ in _read_backend().ranked(query, kind, limit=limit, prefix=prefix)]
+
+def index(instance):
+    get_backend().index(instance)
+
+def remove(instance):
+    kind, _, _ = _document(instance)
+    get_backend().remove(kind, instance.pk)
+
+def index_many(model, pks):
+    """(re)index many books or authors with set-wise SQL, for bulk write paths"""
+    pks = list(pks)
+    if pks:
+        get_backend().index_many("book" if model is Book else "author", pks)
+
+def rebuild():
+    get_backend().rebuild()
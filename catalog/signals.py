@@ -0,0 +1,210 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from catalog import autocomplete, changes, counters, fragments, search, stats
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+# sent by bulk write paths (bulk_create/bulk_update) that bypass post_save,
+# with the primary keys of the rows they created or changed and, for
+# updates, the changed instances
+post_bulk_save = Signal()
+
+# keep the index page counters current
+@receiver(post_bulk_save, sender=Book)
+@receiver(post_bulk_save, sender=BookInstance)
+@receiver(post_bulk_save, sender=Author)
+@receiver(post_bulk_save, sender=Genre)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def invalidate_stats(sender, **kwargs):
+    stats.invalidate()
+
+# keep the change log (catalog/changes.py) in the transaction of the write;
+# these come first, the receivers below reset what instances were loaded with
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+def log_saved(sender, instance, **kwargs):
+    changes.record(sender, [instance.pk])
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def log_deleted(sender, instance, **kwargs):
+    changes.record(sender, [instance.pk], deleted=True)
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def log_copy(sender, instance, **kwargs):
+    # and the counters of the books it left and joined
+    book_ids = [instance.__dict__.get("book_id"), instance._loaded_book_id]
+    changes.record(BookInstance, [instance.pk], deleted="created" not in kwargs, book_ids=book_ids)
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def log_genre_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        changes.record(Book, [instance.pk])
+    elif reverse and action in ("post_add", "post_remove"):
+        changes.record(Book, pk_set)
+    elif reverse and action == "pre_clear":
+        changes.record(Book, Book.objects.filter(genre=instance).values_list("pk", flat=True))
+
+# deleting these nulls or removes the books' links to them
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Language)
+def log_unlinked_books(sender, instance, **kwargs):
+    field = {Author: "author", Genre: "genre", Language: "language"}[sender]
+    changes.record(Book, Book.objects.filter(**{field: instance}).values_list("pk", flat=True))
+
+@receiver(post_bulk_save, sender=Book)
+@receiver(post_bulk_save, sender=Author)
+@receiver(post_bulk_save, sender=BookInstance)
+def log_bulk_saved(sender, pks, instances=(), **kwargs):
+    book_ids = ()
+    if sender is BookInstance and instances:
+        book_ids = [id_ for instance in instances for id_ in (instance.book_id, instance._loaded_book_id)]
+    elif sender is BookInstance:
+        book_ids = BookInstance.objects.filter(pk__in=pks).values_list("book_id", flat=True).distinct()
+    changes.record(sender, pks, book_ids=book_ids)
+
+# keep the full-text search index current
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+def index_for_search(sender, instance, **kwargs):
+    search.index(instance)
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def remove_from_search(sender, instance, **kwargs):
+    search.remove(instance)
+
+@receiver(post_bulk_save, sender=Book)
+@receiver(post_bulk_save, sender=Author)
+def index_many_for_search(sender, pks, **kwargs):
+    search.index_many(sender, pks)
+
+# keep this worker's autocomplete index current once the write is committed
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+def update_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete.update(instance))
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    # delete() clears instance.pk before the commit callback runs
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.remove(sender, pk))
+
+@receiver(post_bulk_save, sender=Book)
+@receiver(post_bulk_save, sender=Author)
+def invalidate_autocomplete(sender, **kwargs):
+    transaction.on_commit(autocomplete.invalidate)
+
+# keep the per-book copy counters current
+@receiver(post_init, sender=BookInstance)
+def remember_counted_state(sender, instance, **kwargs):
+    # read __dict__ so deferred fields aren't loaded for every instance
+    instance._counted = (instance.__dict__.get("book_id"), instance.__dict__.get("status"))
+
+@receiver(pre_save, sender=BookInstance)
+@receiver(pre_delete, sender=BookInstance)
+def lock_counted_state(sender, instance, using, **kwargs):
+    # count from the row as it is now, not as it was loaded, or two stale
+    # copies of one row would both move the counters. the lock holds the row
+    # until the write commits (saves and deletes of copies run in a transaction)
+    if instance._state.adding:
+        return
+    current = sender._base_manager.using(using).select_for_update().filter(pk=instance.pk).values_list("book_id", "status").first()
+    instance._counted = current or (None, None)
+
+@receiver(post_save, sender=BookInstance)
+def count_saved_copy(sender, instance, created, **kwargs):
+    old_book_id, old_status = instance._counted
+    if created:
+        counters.adjust(instance.book_id, instance.status, 1)
+    elif "book_id" not in instance.__dict__ or "status" not in instance.__dict__:
+        counters.recount([old_book_id, instance.__dict__.get("book_id")])
+    elif (old_book_id, old_status) != (instance.book_id, instance.status):
+        counters.adjust(old_book_id, old_status, -1)
+        counters.adjust(instance.book_id, instance.status, 1)
+    instance._counted = (instance.__dict__.get("book_id"), instance.__dict__.get("status"))
+
+@receiver(post_delete, sender=BookInstance)
+def count_deleted_copy(sender, instance, **kwargs):
+    counters.adjust(*instance._counted, -1)
+
+@receiver(post_bulk_save, sender=BookInstance)
+def recount_bulk_copies(sender, pks, instances=(), **kwargs):
+    # bulk updates may have moved copies away from the books they were loaded with
+    book_ids = {instance._counted[0] for instance in instances}
+    book_ids.update(BookInstance.objects.filter(pk__in=pks).values_list("book_id", flat=True).distinct())
+    counters.recount(book_ids)
+
+# expire the cached page fragments showing changed rows
+@receiver(post_init, sender=Book)
+def remember_loaded_author(sender, instance, **kwargs):
+    instance._loaded_author_id = instance.__dict__.get("author_id")
+
+@receiver(post_init, sender=BookInstance)
+def remember_loaded_book(sender, instance, **kwargs):
+    instance._loaded_book_id = instance.__dict__.get("book_id")
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def expire_book_fragments(sender, instance, **kwargs):
+    # the book's page, the book list, and the pages of its new and previous author
+    author_ids = [instance.__dict__.get("author_id"), instance._loaded_author_id]
+    fragments.bump({"book_list"} | fragments.book_names([instance.pk]) | fragments.author_names(author_ids))
+    instance._loaded_author_id = instance.__dict__.get("author_id")
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def expire_copy_fragments(sender, instance, **kwargs):
+    fragments.bump({"copies"} | fragments.book_names([instance.__dict__.get("book_id"), instance._loaded_book_id]))
+    instance._loaded_book_id = instance.__dict__.get("book_id")
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def expire_genre_link_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    # the API's book list shows the genre links
+    if not reverse:
+        fragments.bump({"book_list"} | fragments.book_names([instance.pk]))
+    elif action == "pre_clear":
+        fragments.bump({"book_list"} | fragments.affected(Genre, [instance.pk]))
+    else:
+        fragments.bump({"book_list"} | fragments.book_names(pk_set))
+
+# related pages must be found before a delete nulls or removes the links
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Language)
+def expire_related_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.affected(sender, [instance.pk]))
+
+@receiver(post_bulk_save, sender=Book)
+@receiver(post_bulk_save, sender=BookInstance)
+@receiver(post_bulk_save, sender=Author)
+@receiver(post_bulk_save, sender=Genre)
+@receiver(post_bulk_save, sender=Language)
+def expire_bulk_fragments(sender, pks, instances=(), **kwargs):
+    # with the instances at hand the related pages need no query; include the
+    # book or author they were loaded with, bulk updates may have changed it
+    if sender is BookInstance and instances:
+        book_ids = [id_ for instance in instances for id_ in (instance.book_id, instance._loaded_book_id)]
+        fragments.bump({"copies"} | fragments.book_names(book_ids))
+    elif sender is Book and instances:
+        author_ids = [id_ for instance in instances for id_ in (instance.author_id, instance._loaded_author_id)]
+        fragments.bump({"book_list"} | fragments.book_names(pks) | fragments.author_names(author_ids))
+    else:
+        fragments.bump(fragments.affected(sender, pks))
@@ -0,0 +1,58 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from catalog.models import Author, Book, BookInstance, Genre
+
+# the counters are stored under a key that includes a generation number;
+# invalidating bumps the generation, so a reader that computed the counters
+# just before a write can only ever fill the (now unused) previous key
+STATS_GENERATION_KEY = "catalog:stats:generation"
+STATS_CACHE_KEY = "catalog:stats:{}"
+
+def _compute():
+    """count books, copies, available copies, authors and genres in one query"""
+    qn = connection.ops.quote_name
+    books = qn(Book._meta.db_table)
+    instances = qn(BookInstance._meta.db_table)
+    authors = qn(Author._meta.db_table)
+    genres = qn(Genre._meta.db_table)
+    status = qn(BookInstance._meta.get_field("status").column)
+    sql = (
+        f"SELECT (SELECT COUNT(*) FROM {books}), "
+        f"(SELECT COUNT(*) FROM {instances}), "
+        f"(SELECT COUNT(*) FROM {instances} WHERE {status} = %s), "
+        f"(SELECT COUNT(*) FROM {authors}), "
+        f"(SELECT COUNT(*) FROM {genres})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ["a"])
+        row = cursor.fetchone()
+    keys = ("num_books", "num_instances", "num_instances_available", "num_authors", "num_genres")
+    return dict(zip(keys, row))
+
+def _generation():
+    # seed with the clock so a flushed cache never hands out an old generation again
+    cache.add(STATS_GENERATION_KEY, int(time.time() * 1000), None)
+    return cache.get(STATS_GENERATION_KEY)
+
+def get_stats():
+    """return the catalog counters, computing and caching them on a miss"""
+    key = STATS_CACHE_KEY.format(_generation())
+    stats = cache.get(key)
+    if stats is None:
+        stats = _compute()
+        cache.set(key, stats, None)
+    return stats
+
+def _bump():
+    try:
+        cache.incr(STATS_GENERATION_KEY)
+    except ValueError:
+        # generation was evicted, the next reader seeds a fresh one
+        pass
+
+def invalidate():
+    """bump the counters generation once the current transaction commits"""
+    transaction.on_commit(_bump)
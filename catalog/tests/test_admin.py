@@ -0,0 +1,129 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.pagination import EstimatedCountPaginator
+
+class AdminTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="librarian", password="librarian")
+        cls.author = Author.objects.create(first_name="Jorge", middle_name="Luis", last_name="Borges")
+        cls.language = Language.objects.create(name="Spanish")
+        cls.genres = [Genre.objects.create(name=name) for name in ("Fantasy", "Essay", "Poetry")]
+        cls.book = Book.objects.create(title="Ficciones", summary="Labyrinths", isbn="FICCIONES", author=cls.author, language=cls.language)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def add_books(self, count):
+        start = Book.objects.count()
+        for number in range(start, start + count):
+            book = Book.objects.create(title=f"Aleph {number:02d}", summary="Mirrors", isbn=f"ALEPH{number}", author=self.author, language=self.language)
+            book.genre.set(self.genres)
+
+class ChangelistTest(AdminTestCase):
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f"admin:catalog_{model}_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_book_changelist_queries_do_not_grow_with_rows(self):
+        self.add_books(2)
+        few = self.changelist_queries("book")
+        self.add_books(10)
+        self.assertEqual(self.changelist_queries("book"), few)
+
+    def test_copy_changelist_queries_do_not_grow_with_rows(self):
+        borrower = User.objects.create_user(username="reader", email="reader@example.com")
+        BookInstance.objects.create(book=self.book, imprint="Sur, 1944", status="o", borrower=borrower)
+        few = self.changelist_queries("bookinstance")
+        for _ in range(10):
+            BookInstance.objects.create(book=self.book, imprint="Sur, 1944", status="o", borrower=borrower)
+        self.assertEqual(self.changelist_queries("bookinstance"), few)
+
+    def test_search_uses_the_index_with_prefixes(self):
+        self.add_books(3)
+        response = self.client.get(reverse("admin:catalog_book_changelist"), {"q": "ficc"})
+        self.assertEqual([book.title for book in response.context["cl"].result_list], ["Ficciones"])
+        response = self.client.get(reverse("admin:catalog_author_changelist"), {"q": "borg"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.author])
+
+    def test_autocomplete(self):
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {"term": "bor", "app_label": "catalog", "model_name": "book", "field_name": "author"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["id"] for result in response.json()["results"]], [str(self.author.pk)])
+
+class EstimatedCountTest(AdminTestCase):
+
+    def test_unfiltered_count_is_estimated_from_statistics(self):
+        self.add_books(4)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.add_books(2)
+        paginator = EstimatedCountPaginator(Book.objects.all(), 10)
+        paginator.estimate_threshold = 1
+        # ANALYZE saw 5 books, not the 7 there are now
+        self.assertEqual(paginator.count, 5)
+
+    def test_filtered_and_small_counts_are_exact(self):
+        self.add_books(4)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.add_books(2)
+        self.assertEqual(EstimatedCountPaginator(Book.objects.all(), 10).count, 7)
+        paginator = EstimatedCountPaginator(Book.objects.filter(title__startswith="Aleph"), 10)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.count, 6)
+
+class ChangeFormTest(AdminTestCase):
+
+    def test_foreign_keys_use_autocomplete_widgets(self):
+        response = self.client.get(reverse("admin:catalog_book_change", args=[self.book.pk]))
+        content = response.content.decode()
+        self.assertIn('class="admin-autocomplete', content)
+        # no <option> per author, genre or borrower
+        self.assertNotIn(f'<option value="{self.author.pk}">', content)
+
+    def test_inline_shows_one_page(self):
+        for _ in range(25):
+            BookInstance.objects.create(book=self.book, imprint="Sur, 1944")
+        url = reverse("admin:catalog_book_change", args=[self.book.pk])
+        response = self.client.get(url)
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(formset.initial_form_count(), 20)
+        self.assertContains(response, f"?{formset.page_param}=2")
+        response = self.client.get(url, {formset.page_param: 2})
+        self.assertEqual(response.context["inline_admin_formsets"][0].formset.initial_form_count(), 5)
+
+    def test_saving_a_page_of_the_inline(self):
+        copies = [BookInstance.objects.create(book=self.book, imprint="Sur, 1944") for _ in range(25)]
+        url = reverse("admin:catalog_book_change", args=[self.book.pk])
+        formset = self.client.get(url, {"bookinstance_set-page": 2}).context["inline_admin_formsets"][0].formset
+        data = {
+            "title": self.book.title, "summary": self.book.summary, "isbn": self.book.isbn,
+            "author": self.author.pk, "language": self.language.pk, "genre": [self.genres[0].pk],
+            "bookinstance_set-TOTAL_FORMS": 5, "bookinstance_set-INITIAL_FORMS": 5,
+            "bookinstance_set-MIN_NUM_FORMS": 0, "bookinstance_set-MAX_NUM_FORMS": 1000,
+        }
+        for number, form in enumerate(formset.forms):
+            prefix = f"bookinstance_set-{number}"
+            data.update({
+                f"{prefix}-id": form.instance.pk, f"{prefix}-book": self.book.pk,
+                f"{prefix}-imprint": "Emecé, 1956", f"{prefix}-status": "m",
+            })
+        response = self.client.post(f"{url}?bookinstance_set-page=2", data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(BookInstance.objects.filter(imprint="Emecé, 1956").count(), 5)
+        self.assertEqual(len(copies), BookInstance.objects.filter(book=self.book).count())
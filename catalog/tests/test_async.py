@@ -0,0 +1,93 @@
+import asyncio
+import json
+import threading
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from api.urls import router
+from catalog import views
+from catalog.models import Author, Book
+from local_library import metrics
+from local_library.async_views import async_patterns, async_view, database_sync_to_async
+
+class AsyncViewTest(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name="Octavia", last_name="Butler")
+        self.book = Book.objects.create(title="Kindred", summary="Time travel", isbn="KINDRED", author=author)
+
+    def request(self, path, method="get"):
+        request = getattr(AsyncRequestFactory(), method)(path)
+        request.user = AnonymousUser()
+        return request
+
+    async def test_pages_render_off_the_event_loop(self):
+        for view, path, kwargs, expected in (
+            (views.BookListView.as_view(), reverse("catalog:book_list"), {}, "Kindred"),
+            (views.BookDetailView.as_view(), reverse("catalog:book_detail", args=[self.book.pk]), {"pk": self.book.pk}, "Time travel"),
+            (views.AuthorListView.as_view(), reverse("catalog:author_list"), {}, "Butler"),
+        ):
+            # the ORM raises SynchronousOnlyOperation if it is used on the loop
+            response = await async_view(view)(self.request(path), **kwargs)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_rendered)
+            self.assertIn(expected, response.content.decode())
+
+    async def test_reads_use_the_thread_pool(self):
+        threads = []
+
+        def view(request):
+            threads.append(threading.get_ident())
+            return HttpResponse()
+
+        await async_view(view)(self.request("/"))
+        await async_view(view)(self.request("/", "post"))
+        loop_thread = threading.get_ident()
+        # a read runs in the pool; a write in the thread Django runs sync views in
+        self.assertNotIn(threads[0], (loop_thread, threading.main_thread().ident))
+        self.assertEqual(threads[1], threading.main_thread().ident)
+
+    async def test_export_streams_on_the_event_loop(self):
+        # Django's ASGI handler iterates a streaming body on the loop
+        export = next(pattern for pattern in async_patterns(router.urls) if pattern.name == "book-export")
+        request = self.request("/api/books/export/ndjson/")
+        request.user = await database_sync_to_async(User.objects.create_user)(username="apiuser")
+        response = await export.callback(request, export_format="ndjson")
+        self.assertEqual(response.status_code, 200)
+        books = [json.loads(line) for line in b"".join(response).splitlines()]
+        self.assertEqual([book["title"] for book in books], ["Kindred"])
+
+    def test_api_patterns_are_async(self):
+        patterns = async_patterns(router.urls)
+        self.assertEqual([pattern.name for pattern in patterns], [pattern.name for pattern in router.urls])
+        self.assertTrue(all(asyncio.iscoroutinefunction(pattern.callback) for pattern in patterns))
+        # DRF's view attributes (csrf exemption, the viewset class) survive
+        self.assertTrue(all(pattern.callback.csrf_exempt for pattern in patterns))
+
+class AsyncMetricsTest(TestCase):
+
+    async def test_counts_queries_run_in_other_threads(self):
+        def query():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return HttpResponse()
+
+        async def get_response(request):
+            await database_sync_to_async(query)()
+            await database_sync_to_async(query)()
+            return await database_sync_to_async(query)()
+
+        middleware = metrics.MetricsMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = AsyncRequestFactory().get("/")
+        request.resolver_match = None
+        before = metrics.registry.snapshot()["series"].get((metrics.UNRESOLVED, "GET"), metrics._empty_series())
+        await middleware(request)
+        after = metrics.registry.snapshot()["series"][metrics.UNRESOLVED, "GET"]
+        self.assertEqual(after[2] - before[2], 3)
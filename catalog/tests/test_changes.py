@@ -0,0 +1,102 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from catalog import changes, loans
+from catalog.models import Author, Book, BookInstance, Change, Genre
+
+def logged(**filters):
+    return list(Change.objects.filter(**filters).values_list("kind", "object_id", "deleted"))
+
+class ChangeLogTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name="Octavia", last_name="Butler")
+        cls.book = Book.objects.create(title="Kindred", summary="Dana", isbn="KINDRED", author=cls.author)
+
+    def setUp(self):
+        self.start = Change.objects.order_by("id").last().id
+
+    def test_saves_and_deletes_are_logged(self):
+        self.author.first_name = "Octavia E."
+        self.author.save()
+        copy = BookInstance.objects.create(book=self.book, imprint="Doubleday, 1979", status="a")
+        copy_id = str(copy.pk)
+        copy.delete()
+        self.assertEqual(logged(id__gt=self.start), [
+            ("author", str(self.author.pk), False),
+            # a copy write changes its book's counters
+            ("copy", copy_id, False),
+            ("book", str(self.book.pk), False),
+            ("copy", copy_id, True),
+            ("book", str(self.book.pk), False),
+        ])
+
+    def test_unlinking_deletes_log_the_books(self):
+        genre = Genre.objects.create(name="Science Fiction")
+        self.book.genre.add(genre)
+        genre.delete()
+        author_id = str(self.author.pk)
+        self.author.delete()
+        self.assertEqual(logged(id__gt=self.start), [
+            ("book", str(self.book.pk), False),
+            ("book", str(self.book.pk), False),
+            ("book", str(self.book.pk), False),
+            ("author", author_id, True),
+        ])
+
+    def test_checkout_is_logged(self):
+        copy = BookInstance.objects.create(book=self.book, imprint="Doubleday, 1979", status="a")
+        start = Change.objects.order_by("id").last().id
+        loans.checkout(self.book.pk, User.objects.create_user(username="reader"))
+        self.assertEqual(logged(id__gt=start), [("copy", str(copy.pk), False), ("book", str(self.book.pk), False)])
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+    def test_page_keeps_the_latest_change_per_object(self):
+        for name in ("Octavia E.", "O. E."):
+            self.author.first_name = name
+            self.author.save()
+        book_id = str(self.book.pk)
+        self.book.delete()
+        entries, last, more = changes.page(self.start, limit=10)
+        self.assertEqual(entries, [("author", str(self.author.pk), False), ("book", book_id, True)])
+        self.assertEqual((last, more), (Change.objects.order_by("id").last().id, False))
+        entries, last, more = changes.page(self.start, limit=1)
+        self.assertEqual((len(entries), last, more), (1, self.start + 1, True))
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=60)
+    def test_page_waits_for_changes_to_settle(self):
+        self.author.save()
+        self.assertEqual(changes.page(self.start), ([], self.start, False))
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=10)
+    def test_page_stops_at_the_first_unsettled_change(self):
+        # a lower id can carry a later time, from a concurrent or skewed writer
+        first = Change.objects.create(kind="author", object_id="1")
+        second = Change.objects.create(kind="author", object_id="2")
+        now = timezone.now()
+        Change.objects.filter(pk=first.pk).update(changed_at=now - datetime.timedelta(seconds=9.5))
+        Change.objects.filter(pk=second.pk).update(changed_at=now - datetime.timedelta(seconds=10.5))
+        self.assertEqual(changes.page(self.start), ([], self.start, False))
+        with override_settings(CHANGE_FEED_SETTLE_SECONDS=9):
+            entries, last, more = changes.page(self.start)
+        self.assertEqual((entries, last), ([("author", "1", False), ("author", "2", False)], second.pk))
+
+    def test_cursors(self):
+        self.assertEqual(changes.decode_cursor(changes.encode_cursor(1234)), 1234)
+        for cursor in ("", "1234", changes.encode_cursor("x"), "!!"):
+            with self.assertRaises(ValueError):
+                changes.decode_cursor(cursor)
+
+class ChangeLogTransactionTest(TransactionTestCase):
+
+    def test_write_fails_with_its_log_row(self):
+        with mock.patch.object(Change.objects, "bulk_create", side_effect=DatabaseError("log unavailable")):
+            with self.assertRaises(DatabaseError):
+                Author.objects.create(first_name="Ursula", last_name="Le Guin")
+        self.assertFalse(Author.objects.exists())
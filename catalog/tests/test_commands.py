@@ -0,0 +1,162 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from catalog import benchmark, search
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+# testing the bulk import command
+class ImportCatalogCommandTest(TestCase):
+
+    def run_import(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False) as handle:
+            handle.write(content)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_catalog", handle.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv(self):
+        Author.objects.create(first_name="Mary", last_name="Shelley")
+        Genre.objects.create(name="Horror")
+        content = (
+            "title,isbn,summary,author_first_name,author_middle_name,author_last_name,genres,language,imprint,status,due_back,copies\n"
+            "Frankenstein,9780141439471,A modern Prometheus,Mary,,Shelley,Horror;Gothic,English,Penguin,a,,3\n"
+            "Frankenstein,9780141439471,A modern Prometheus,Mary,,Shelley,Horror;Gothic,English,Lackington,o,2030-01-01,1\n"
+            "Dracula,9780141439846,Letters and diaries,Bram,,Stoker,Gothic,English,Penguin,m,,2\n"
+        )
+        out, err = self.run_import(content, ".csv", "--batch-size", "2")
+
+        self.assertIn("rows/sec", out)
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Language.objects.get().name, "English")
+        frankenstein = Book.objects.get(isbn="9780141439471")
+        self.assertEqual(frankenstein.author.last_name, "Shelley")
+        self.assertEqual(sorted(frankenstein.genre.values_list("name", flat=True)), ["Gothic", "Horror"])
+        self.assertEqual(frankenstein.bookinstance_set.filter(status="a").count(), 3)
+        self.assertEqual(frankenstein.bookinstance_set.get(status="o").due_back, datetime.date(2030, 1, 1))
+        self.assertEqual(BookInstance.objects.count(), 6)
+
+    def test_import_jsonl_skips_bad_rows_and_indexes_books(self):
+        rows = [
+            {"title": "Solaris", "isbn": "9780156027601", "summary": "An ocean planet", "author_first_name": "Stanislaw",
+             "author_last_name": "Lem", "genres": ["Science Fiction"], "imprint": "Harcourt", "status": "a"},
+            {"title": "", "isbn": "MISSINGTITLE"},
+            {"title": "Bad status", "isbn": "BADSTATUS", "status": "x"},
+        ]
+        out, err = self.run_import("\n".join(json.dumps(row) for row in rows), ".jsonl")
+
+        self.assertEqual(Book.objects.get().title, "Solaris")
+        self.assertIn("2 rows skipped", out)
+        self.assertIn("row 2", err)
+        hits = search.search("ocean planet")[0:10]
+        self.assertEqual([hit.object.title for hit in hits], ["Solaris"])
+
+    def test_existing_isbn_only_adds_copies(self):
+        book = Book.objects.create(title="Emma", isbn="9780141439587", summary="Matchmaking")
+        self.run_import("title,isbn,copies\nEmma (reprint),9780141439587,4\n", ".csv")
+        self.assertEqual(Book.objects.get().title, "Emma")
+        self.assertEqual(book.bookinstance_set.count(), 4)
+
+# testing the benchmark command
+# testing the streaming export command
+class ExportCatalogCommandTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name="Jane", last_name="Austen")
+        language = Language.objects.create(name="English")
+        genres = [Genre.objects.create(name=name) for name in ("Romance", "Satire")]
+        for number in range(5):
+            book = Book.objects.create(title=f"Emma {number}", summary="Matchmaking", isbn=f"EMMA{number}", author=author, language=language)
+            book.genre.set(genres[: number % 3])
+            BookInstance.objects.create(book=book, imprint="John Murray, 1815", status="a")
+
+    def run_export(self, kind, suffix, *args):
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as handle:
+            pass
+        call_command("export_catalog", kind, handle.name, *args, stdout=io.StringIO())
+        opener = gzip.open if suffix.endswith(".gz") else open
+        with opener(handle.name, "rt", encoding="utf-8", newline="") as stream:
+            return stream.read()
+
+    def test_export_books_csv_in_chunks(self):
+        rows = list(csv.DictReader(io.StringIO(self.run_export("books", ".csv", "--chunk-size", "2"))))
+        self.assertEqual([row["isbn"] for row in rows], [f"EMMA{number}" for number in range(5)])
+        self.assertEqual(rows[2]["genres"], "Romance;Satire")
+        self.assertEqual((rows[0]["author_last_name"], rows[0]["language"], rows[0]["copies_total"]), ("Austen", "English", "1"))
+
+    def test_export_copies_ndjson_gzipped(self):
+        lines = self.run_export("copies", ".ndjson.gz").splitlines()
+        self.assertEqual(len(lines), 5)
+        copy = json.loads(lines[0])
+        self.assertEqual(copy["status"], "a")
+        self.assertNotIn("borrower", copy)
+        self.assertEqual(str(BookInstance.objects.get(pk=copy["id"]).book_id), str(copy["book_id"]))
+
+    def test_queries_grow_with_chunks_not_rows(self):
+        # the books, then the genres of each chunk of 3
+        with self.assertNumQueries(3):
+            self.run_export("books", ".ndjson", "--chunk-size", "3")
+
+class BenchmarkCommandTest(TestCase):
+
+    def run_benchmark(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("benchmark", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_generates_and_times_every_url(self):
+        output = tempfile.NamedTemporaryFile(suffix=".json", delete=False).name
+        self.run_benchmark("--authors", "20", "--books", "50", "--copies", "200", "--repeat", "2", "--output", output)
+
+        self.assertEqual((Author.objects.count(), Book.objects.count(), BookInstance.objects.count()), (20, 50, 200))
+        # counters and the search index are rebuilt after the bulk inserts
+        self.assertEqual(sum(Book.objects.values_list("copies_total", flat=True)), 200)
+        self.assertTrue(search.search("river")[0:1])
+
+        with open(output) as handle:
+            results = json.load(handle)["results"]
+        for name in ("catalog:book_detail", "catalog:overdue", "catalog:renew_book_librarian", "book-list", "bookinstance-overdue"):
+            self.assertEqual(results[name]["status"], 200, name)
+        self.assertNotIn("catalog:book-list", results)
+        self.assertNotIn("catalog:rest_framework:logout", results)
+        self.assertEqual(set(results["book-list"]), {"path", "status", "p50_ms", "p95_ms", "queries"})
+
+    def test_generation_is_deterministic(self):
+        benchmark.generate(5, 10, 20, seed=7)
+        first = list(Book.objects.order_by("isbn").values_list("title", "isbn"))
+        copies = sorted(BookInstance.objects.values_list("id", flat=True))
+        BookInstance.objects.all().delete()
+        Book.objects.all().delete()
+        Author.objects.all().delete()
+        Genre.objects.all().delete()
+        Language.objects.all().delete()
+        User.objects.all().delete()
+        benchmark.generate(5, 10, 20, seed=7)
+        self.assertEqual(list(Book.objects.order_by("isbn").values_list("title", "isbn")), first)
+        self.assertEqual(sorted(BookInstance.objects.values_list("id", flat=True)), copies)
+        self.assertFalse(User.objects.get(username="bench-librarian").has_usable_password())
+
+    def test_refuses_a_filled_catalog(self):
+        Author.objects.create(first_name="Mary", last_name="Shelley")
+        with self.assertRaises(CommandError):
+            self.run_benchmark()
+
+    def test_flags_regressions(self):
+        result = {"path": "/", "status": 200, "p50_ms": 10.0, "p95_ms": 20.0, "queries": 3}
+        self.assertEqual(benchmark.compare({"index": result}, {"index": result}), [])
+        slower = dict(result, p95_ms=30.0, queries=4)
+        self.assertEqual(
+            benchmark.compare({"index": slower}, {"index": result}),
+            ["index: queries 3 -> 4", "index: p95_ms 20.00 -> 30.00"],
+        )
+        # below the noise floor
+        self.assertEqual(benchmark.compare({"index": dict(result, p50_ms=0.3)}, {"index": dict(result, p50_ms=0.1)}), [])
@@ -0,0 +1,200 @@
+import datetime
+import random
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from catalog import loans
+from catalog.models import Author, Book, BookInstance, Hold
+
+class LoanTestCase:
+
+    def make_book(self, copies, status="a"):
+        author = Author.objects.get_or_create(first_name="Ray", last_name="Bradbury")[0]
+        book = Book.objects.create(title="Fahrenheit 451", summary="Firemen", isbn=f"F451-{Book.objects.count()}", author=author)
+        for _ in range(copies):
+            BookInstance.objects.create(book=book, imprint="Ballantine, 1953", status=status)
+        return book
+
+    def assertCounters(self, book):
+        book.refresh_from_db()
+        actual = Counter(BookInstance.objects.filter(book=book).values_list("status", flat=True))
+        self.assertEqual(
+            (book.copies_total, book.copies_available, book.copies_on_loan, book.copies_reserved),
+            (sum(actual.values()), actual["a"], actual["o"], actual["r"]),
+        )
+
+class CheckoutTest(LoanTestCase, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.readers = [User.objects.create_user(username=f"reader{number}") for number in range(3)]
+
+    def test_checkout_lends_an_available_copy(self):
+        book = self.make_book(2)
+        copy = loans.checkout(book.pk, self.readers[0], today=datetime.date(2026, 1, 5))
+        self.assertEqual((copy.status, copy.borrower, copy.due_back), ("o", self.readers[0], datetime.date(2026, 1, 26)))
+        self.assertCounters(book)
+
+    def test_no_copy_left(self):
+        book = self.make_book(1)
+        loans.checkout(book.pk, self.readers[0])
+        with self.assertRaises(loans.NoCopyAvailable):
+            loans.checkout(book.pk, self.readers[1])
+        self.assertEqual(BookInstance.objects.filter(book=book, status="o").count(), 1)
+
+    def test_returned_copies_go_to_holds_in_order(self):
+        book = self.make_book(2)
+        copies = [loans.checkout(book.pk, reader) for reader in self.readers[:2]]
+        loans.place_hold(book.pk, self.readers[2])
+        loans.place_hold(book.pk, self.readers[0])
+        # placing a hold twice keeps its place
+        loans.place_hold(book.pk, self.readers[2])
+
+        returned = loans.checkin(copies[0].pk, today=datetime.date(2026, 1, 5))
+        self.assertEqual((returned.status, returned.borrower_id, returned.due_back), ("r", self.readers[2].pk, datetime.date(2026, 1, 12)))
+        # the reserved copy is for its holder only
+        with self.assertRaises(loans.NoCopyAvailable):
+            loans.checkout(book.pk, self.readers[1])
+        self.assertEqual(loans.checkout(book.pk, self.readers[2]).pk, copies[0].pk)
+
+        loans.checkin(copies[1].pk)
+        self.assertEqual(BookInstance.objects.get(pk=copies[1].pk).borrower, self.readers[0])
+        self.assertFalse(Hold.objects.exists())
+        self.assertCounters(book)
+
+    def test_available_copies_serve_the_queue_first(self):
+        book = self.make_book(0)
+        loans.place_hold(book.pk, self.readers[0])
+        loans.place_hold(book.pk, self.readers[1])
+        # a copy added outside checkin() goes to the head of the queue
+        BookInstance.objects.create(book=book, imprint="Ballantine, 1953", status="a")
+        with self.assertRaises(loans.NoCopyAvailable):
+            loans.checkout(book.pk, self.readers[1])
+        loans.checkout(book.pk, self.readers[0])
+        self.assertEqual(list(Hold.objects.values_list("user", flat=True)), [self.readers[1].pk])
+
+    def test_holds_only_keep_the_copies_they_need(self):
+        book = self.make_book(2)
+        loans.place_hold(book.pk, self.readers[0])
+        loans.place_hold(book.pk, self.readers[1])
+        with self.assertRaises(loans.NoCopyAvailable):
+            loans.checkout(book.pk, self.readers[2])
+        # one reader ahead, two copies
+        loans.checkout(book.pk, self.readers[1])
+        BookInstance.objects.create(book=book, imprint="Ballantine, 1953", status="a")
+        loans.checkout(book.pk, self.readers[2])
+        self.assertEqual(list(Hold.objects.values_list("user", flat=True)), [self.readers[0].pk])
+        self.assertCounters(book)
+
+    def test_checkout_locks_the_hold(self):
+        book = self.make_book(1)
+        loans.place_hold(book.pk, self.readers[0])
+        with CaptureQueriesContext(connection) as queries:
+            loans.checkout(book.pk, self.readers[0])
+        hold_table = Hold._meta.db_table
+        sql = [query["sql"] for query in queries.captured_queries]
+        lock = next(index for index, query in enumerate(sql) if query.startswith("SELECT") and f'FROM "{hold_table}" WHERE "{hold_table}"."id"' in query)
+        delete = next(index for index, query in enumerate(sql) if query.startswith(f'DELETE FROM "{hold_table}"'))
+        self.assertLess(lock, delete)
+
+    def test_checkin_needs_a_loan(self):
+        book = self.make_book(1)
+        copy = BookInstance.objects.get(book=book)
+        with self.assertRaises(loans.NotOnLoan):
+            loans.checkin(copy.pk)
+        loans.checkout(book.pk, self.readers[0])
+        self.assertEqual(loans.checkin(copy.pk).status, "a")
+        self.assertCounters(book)
+
+    def test_checkin_locks_the_copy_without_a_join(self):
+        book = self.make_book(1)
+        copy = loans.checkout(book.pk, self.readers[0])
+        with CaptureQueriesContext(connection) as queries:
+            loans.checkin(copy.pk)
+        # SELECT ... FOR UPDATE over a LEFT OUTER JOIN (book is nullable) fails on PostgreSQL
+        lock = next(query["sql"] for query in queries.captured_queries if query["sql"].startswith("SELECT"))
+        self.assertNotIn("JOIN", lock)
+
+class CheckoutStressTest(LoanTestCase, TransactionTestCase):
+    """many desks checking out the same title at once"""
+
+    WORKERS = 8
+    ATTEMPTS = 10
+    COPIES = 40
+
+    def setUp(self):
+        self.readers = [User.objects.create_user(username=f"reader{number}") for number in range(self.WORKERS)]
+
+    def run_workers(self, work):
+        errors = []
+        start = threading.Barrier(self.WORKERS)
+
+        def worker(reader):
+            start.wait()
+            try:
+                work(reader)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(reader,)) for reader in self.readers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def retrying(self, operation):
+        # SQLite refuses a second concurrent writer outright instead of waiting
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                return operation()
+            except OperationalError:
+                if connection.vendor != "sqlite" or time.monotonic() > deadline:
+                    raise
+                time.sleep(random.uniform(0.001, 0.01))
+
+    def test_concurrent_checkouts_never_share_a_copy(self):
+        book = self.make_book(self.COPIES)
+        lent, refused = [], []
+
+        def work(reader):
+            for _ in range(self.ATTEMPTS):
+                try:
+                    lent.append(self.retrying(lambda: loans.checkout(book.pk, reader)).pk)
+                except loans.NoCopyAvailable:
+                    refused.append(reader)
+
+        self.run_workers(work)
+        # 80 attempts at 40 copies: every copy is lent exactly once
+        self.assertEqual(len(lent), self.COPIES)
+        self.assertEqual(len(set(lent)), self.COPIES)
+        self.assertEqual(len(refused), self.WORKERS * self.ATTEMPTS - self.COPIES)
+        self.assertFalse(BookInstance.objects.filter(book=book, status="a").exists())
+        self.assertCounters(book)
+
+    def test_concurrent_checkouts_and_returns(self):
+        book = self.make_book(self.WORKERS // 2)
+        lent = []
+
+        def work(reader):
+            for _ in range(self.ATTEMPTS):
+                try:
+                    copy = self.retrying(lambda: loans.checkout(book.pk, reader))
+                except loans.NoCopyAvailable:
+                    continue
+                lent.append((copy.pk, reader.pk))
+                self.retrying(lambda: loans.checkin(copy.pk))
+
+        self.run_workers(work)
+        self.assertTrue(lent)
+        self.assertEqual(BookInstance.objects.filter(book=book, status="a").count(), self.WORKERS // 2)
+        self.assertCounters(book)
@@ -0,0 +1,89 @@
+import re
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Author
+from local_library import metrics
+
+def _sample(text, name, **labels):
+    """return the value of one sample in a Prometheus text page, or 0"""
+    for line in text.splitlines():
+        if line.startswith(f"{name}{{") and all(f'{label}="{value}"' in line for label, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0
+
+@override_settings(METRICS_TOKEN="secret")
+class MetricsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for author_id in range(3):
+            Author.objects.create(first_name=f"First {author_id}", last_name=f"Last {author_id}")
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_records_requests_by_url_name(self):
+        before = self.scrape()
+        self.client.get(reverse("catalog:author_list"))
+        self.client.get(reverse("catalog:author_list"))
+        self.client.get("/api/authors/")
+        after = self.scrape()
+
+        view = {"view": "catalog:author_list", "method": "GET"}
+        self.assertEqual(
+            _sample(after, "django_http_request_duration_seconds_count", **view)
+            - _sample(before, "django_http_request_duration_seconds_count", **view),
+            2,
+        )
+        self.assertGreater(_sample(after, "django_db_queries_per_request_sum", **view), 0)
+        self.assertEqual(
+            _sample(after, "django_http_responses_total", status="200", **view)
+            - _sample(before, "django_http_responses_total", status="200", **view),
+            2,
+        )
+        # DRF router routes are named too
+        self.assertGreater(_sample(after, "django_http_request_duration_seconds_count", view="author-list", method="GET"), 0)
+
+    def test_buckets_are_cumulative(self):
+        self.client.get(reverse("catalog:author_list"))
+        text = self.scrape()
+        counts = [
+            float(value) for value in re.findall(
+                r'django_http_request_duration_seconds_bucket\{view="catalog:author_list",method="GET",le="[^"]+"\} (\S+)', text,
+            )
+        ]
+        self.assertEqual(len(counts), len(metrics.LATENCY_BUCKETS) + 1)
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[-1], _sample(text, "django_http_request_duration_seconds_count", view="catalog:author_list"))
+
+    def test_merges_worker_snapshots(self):
+        other = {
+            "series": {("catalog:author_list", "GET"): [5, 1.0, 10, 0.5] + [0] * (len(metrics.LATENCY_BUCKETS) + len(metrics.QUERY_BUCKETS) + 2)},
+            "responses": {("catalog:author_list", "GET", 200): 5},
+        }
+        before = self.scrape()
+        cache.set("metrics:worker:other", other)
+        cache.set(metrics.WORKERS_CACHE_KEY, cache.get(metrics.WORKERS_CACHE_KEY) + ["other"])
+        try:
+            after = self.scrape()
+        finally:
+            cache.delete("metrics:worker:other")
+        view = {"view": "catalog:author_list", "method": "GET", "status": "200"}
+        # the other worker's five responses are added to this worker's
+        self.assertEqual(_sample(after, "django_http_responses_total", **view), _sample(before, "django_http_responses_total", **view) + 5)
+
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer guess").status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
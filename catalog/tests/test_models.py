@@ -1,8 +1,11 @@
 import datetime
+import io
 
+from django.core.management import call_command
 from django.test import TestCase
 
-from catalog.models import Author
+from catalog.models import Author, Book, BookInstance
+from catalog.signals import post_bulk_save
 
 class AuthorModelTest(TestCase):
 
@@ -48,4 +51,65 @@ class AuthorModelTest(TestCase):
         #author = Author.objects.get(first_name="Hugh")
         author = Author.objects.get(pk=1)
         expected_object_name = f"{author.last_name}, {author.first_name}"
-        self.assertEqual(str(author), expected_object_name)
\ No newline at end of file
+        self.assertEqual(str(author), expected_object_name)
+
+class BookCopyCountersTest(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title="Middlemarch", summary="Provincial life", isbn="MIDDLE")
+        self.other = Book.objects.create(title="Silas Marner", summary="The weaver", isbn="SILAS")
+
+    def counts(self, book):
+        book.refresh_from_db()
+        return (book.copies_total, book.copies_available, book.copies_on_loan, book.copies_maintenance, book.copies_reserved)
+
+    def test_counters_follow_create_status_change_and_delete(self):
+        copy = BookInstance.objects.create(book=self.book, imprint="Penguin", status="a")
+        BookInstance.objects.create(book=self.book, imprint="Penguin", status="m")
+        self.assertEqual(self.counts(self.book), (2, 1, 0, 1, 0))
+
+        copy.status = "o"
+        copy.save()
+        self.assertEqual(self.counts(self.book), (2, 0, 1, 1, 0))
+
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.book = self.other
+        copy.status = "r"
+        copy.save()
+        self.assertEqual(self.counts(self.book), (1, 0, 0, 1, 0))
+        self.assertEqual(self.counts(self.other), (1, 0, 0, 0, 1))
+
+        copy.delete()
+        self.assertEqual(self.counts(self.other), (0, 0, 0, 0, 0))
+
+    def test_saving_a_stale_book_keeps_counters(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        BookInstance.objects.create(book=self.book, imprint="Penguin", status="a")
+        stale.title = "Middlemarch: A Study of Provincial Life"
+        stale.save()
+        self.assertEqual(self.counts(self.book), (1, 1, 0, 0, 0))
+
+    def test_saving_stale_copies_counts_once(self):
+        BookInstance.objects.create(book=self.book, imprint="Penguin", status="o")
+        first, second = BookInstance.objects.all(), BookInstance.objects.all()
+        for copy in (first[0], second[0]):
+            copy.status = "a"
+            copy.save()
+        self.assertEqual(self.counts(self.book), (1, 1, 0, 0, 0))
+        stale = BookInstance.objects.get()
+        BookInstance.objects.get().delete()
+        stale.delete()
+        self.assertEqual(self.counts(self.book), (0, 0, 0, 0, 0))
+
+    def test_recount_repairs_counters(self):
+        BookInstance.objects.bulk_create([BookInstance(book=self.book, imprint="Penguin", status="a") for _ in range(3)])
+        self.assertEqual(self.counts(self.book), (0, 0, 0, 0, 0))
+        out = io.StringIO()
+        call_command("recount_book_copies", stdout=out)
+        self.assertEqual(self.counts(self.book), (3, 3, 0, 0, 0))
+        self.assertEqual(self.counts(self.other), (0, 0, 0, 0, 0))
+
+    def test_bulk_save_signal_recounts(self):
+        copies = BookInstance.objects.bulk_create([BookInstance(book=self.book, imprint="Penguin", status="o") for _ in range(2)])
+        post_bulk_save.send(sender=BookInstance, pks=[copy.pk for copy in copies])
+        self.assertEqual(self.counts(self.book), (2, 0, 2, 0, 0))
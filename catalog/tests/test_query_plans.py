@@ -0,0 +1,130 @@
+import datetime
+import re
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import reminders
+from catalog.models import Author, Book, BookInstance
+
+# the hot list views must stay on their indexes: every query they run on a
+# large catalog is EXPLAINed and may neither scan a whole table nor sort
+
+NUMBER_OF_AUTHORS = 2000
+NUMBER_OF_BOOKS = 3000
+COPIES_PER_BOOK = 3
+
+def _bad_plan_lines(plan):
+    """return the plan lines that show a full table scan or a sort"""
+    if connection.vendor == "postgresql":
+        return [line for line in plan if re.search(r"\bSeq Scan\b|\bSort\b", line)]
+    # SQLite: a bare "SCAN table" reads every row; "USING (COVERING) INDEX" walks one
+    return [line for line in plan if re.search(r"\bSCAN \w+$|USE TEMP B-TREE", line)]
+
+def _explain(sql, params):
+    prefix = "EXPLAIN" if connection.vendor == "postgresql" else "EXPLAIN QUERY PLAN"
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        # SQLite returns (id, parent, notused, detail) rows, PostgreSQL one text column
+        return [row[-1] for row in cursor.fetchall()]
+
+class QueryRecorder:
+    """connection.execute_wrapper that keeps the catalog SELECTs a request runs"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith("SELECT") and '"catalog_' in sql:
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+class QueryPlanTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="librarian", password="1X<ISRUkw+tuK")
+        cls.staff.user_permissions.add(Permission.objects.get(codename="can_mark_returned"))
+        borrowers = [User.objects.create_user(username=f"borrower{number}") for number in range(20)]
+
+        Author.objects.bulk_create(
+            Author(first_name=f"First {number}", last_name=f"Last {number % 500}") for number in range(NUMBER_OF_AUTHORS)
+        )
+        author_ids = list(Author.objects.values_list("id", flat=True))
+        Book.objects.bulk_create(
+            Book(title=f"Title {number}", isbn=str(number), summary="", author_id=author_ids[number % len(author_ids)])
+            for number in range(NUMBER_OF_BOOKS)
+        )
+        today = datetime.date.today()
+        statuses = ["a", "o", "m", "r", "a", "a"]
+        BookInstance.objects.bulk_create(
+            BookInstance(
+                book_id=book_id,
+                status=statuses[(book_id + copy) % len(statuses)],
+                borrower=borrowers[(book_id + copy) % len(borrowers)],
+                due_back=today + datetime.timedelta(days=(book_id * 7 + copy) % 60 - 30),
+            )
+            for book_id in Book.objects.values_list("id", flat=True)
+            for copy in range(COPIES_PER_BOOK)
+        )
+        # give the planner real statistics, as a production database has
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        # a cached page fragment would skip the queries under test
+        cache.clear()
+
+    def assertIndexedPlans(self, url, params=None, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(recorder.queries)
+        for sql, query_params in recorder.queries:
+            # counting a whole table reads all of it on any plan; keyset pages skip the count
+            if sql.startswith("SELECT COUNT(*)") and " WHERE " not in sql:
+                continue
+            plan = _explain(sql, query_params)
+            self.assertEqual(_bad_plan_lines(plan), [], f"{url}\n{sql}\n" + "\n".join(plan))
+        return response
+
+    def test_book_list(self):
+        self.assertIndexedPlans(reverse("catalog:book_list"))
+        self.assertIndexedPlans(reverse("catalog:book_list"), {"page": 20})
+
+    def test_book_list_keyset(self):
+        response = self.assertIndexedPlans(reverse("catalog:book_list"), {"cursor": ""})
+        self.assertIndexedPlans(reverse("catalog:book_list"), {"cursor": response.context["page_obj"].next_cursor})
+
+    def test_author_list(self):
+        self.assertIndexedPlans(reverse("catalog:author_list"))
+        response = self.assertIndexedPlans(reverse("catalog:author_list"), {"cursor": ""})
+        self.assertIndexedPlans(reverse("catalog:author_list"), {"cursor": response.context["page_obj"].next_cursor})
+
+    def test_borrowed_by_user(self):
+        borrower = User.objects.get(username="borrower3")
+        self.assertIndexedPlans(reverse("catalog:my_borrowed"), user=borrower)
+        response = self.assertIndexedPlans(reverse("catalog:my_borrowed"), {"cursor": ""}, user=borrower)
+        self.assertIndexedPlans(reverse("catalog:my_borrowed"), {"cursor": response.context["page_obj"].next_cursor})
+
+    def test_all_borrowed(self):
+        self.assertIndexedPlans(reverse("catalog:all_borrowed"), user=self.staff)
+        response = self.assertIndexedPlans(reverse("catalog:all_borrowed"), {"cursor": ""}, user=self.staff)
+        self.assertIndexedPlans(reverse("catalog:all_borrowed"), {"cursor": response.context["page_obj"].next_cursor})
+
+    def test_overdue_report(self):
+        response = self.assertIndexedPlans(reverse("catalog:overdue"), user=self.staff)
+        self.assertIndexedPlans(reverse("catalog:overdue"), {"cursor": response.context["page_obj"].next_cursor})
+
+    def test_overdue_reminders(self):
+        User.objects.filter(username__startswith="borrower").update(email="reader@example.com")
+        queryset = reminders.due()
+        sql, params = queryset.query.sql_with_params()
+        plan = _explain(sql, params)
+        self.assertEqual(_bad_plan_lines(plan), [], f"{sql}\n" + "\n".join(plan))
@@ -0,0 +1,136 @@
+import datetime
+import io
+import socketserver
+import threading
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from mailer.models import PRIORITY_DEFERRED, Message, MessageLog
+
+from catalog import reminders
+from catalog.models import Author, Book, BookInstance
+
+class SMTPStandIn(socketserver.StreamRequestHandler):
+    """just enough SMTP for Django's SMTP backend; refuses recipients starting with "refuse" """
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost")
+        data = None
+        for line in self.rfile:
+            if data is not None:
+                if line == b".\r\n":
+                    self.server.messages.append(b"".join(data).decode())
+                    data = None
+                    self.reply("250 queued")
+                else:
+                    data.append(line)
+                continue
+            command = line[:4].upper()
+            if command == b"DATA":
+                data = []
+                self.reply("354 go ahead")
+            elif command == b"QUIT":
+                self.reply("221 bye")
+                return
+            elif command == b"RCPT" and b"<refuse" in line:
+                self.reply("550 no such user")
+            else:
+                self.reply("250 localhost")
+
+class OverdueRemindersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = datetime.date.today()
+        author = Author.objects.create(first_name="Agatha", last_name="Christie")
+        books = [
+            Book.objects.create(title=title, summary="Murder", isbn=title.upper()[:13], author=author)
+            for title in ("Curtain", "Nemesis", "Endless Night")
+        ]
+        cls.alice = User.objects.create_user(username="alice", email="alice@example.com")
+        bob = User.objects.create_user(username="bob", email="bob@example.com")
+        nobody = User.objects.create_user(username="nobody")
+        refused = User.objects.create_user(username="refused", email="refuse@example.com")
+
+        def loan(book, borrower, days):
+            BookInstance.objects.create(book=book, imprint="Collins", status="o", borrower=borrower, due_back=today + datetime.timedelta(days=days))
+
+        loan(books[0], cls.alice, -3)
+        loan(books[1], cls.alice, -10)
+        loan(books[2], bob, -1)
+        loan(books[0], bob, 5)
+        loan(books[1], nobody, -2)
+        loan(books[2], refused, -4)
+
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPStandIn)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        self.server.messages = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings = override_settings(
+            MAILER_EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            MAILER_USE_FILE_LOCK=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command("send_overdue_reminders", *args, stdout=out)
+        return out.getvalue()
+
+    def test_sends_one_digest_per_borrower_over_one_connection(self):
+        out = self.run_command("--batch-size", "2")
+
+        self.assertIn("Queued 3 reminders covering 4 overdue loans", out)
+        self.assertIn("Sent 2 messages, deferred 1", out)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.messages), 2)
+        alice = next(message for message in self.server.messages if "To: alice@example.com" in message)
+        self.assertIn("Subject: Local Library: 2 overdue books", alice)
+        # most overdue first
+        self.assertLess(alice.index("Nemesis"), alice.index("Curtain"))
+
+        # the refused recipient stays queued, deferred
+        self.assertEqual(Message.objects.get().priority, PRIORITY_DEFERRED)
+        self.assertEqual(MessageLog.objects.count(), 3)
+
+    def test_second_run_on_the_same_day_sends_nothing(self):
+        self.run_command()
+        self.assertIn("Queued 0 reminders", self.run_command())
+        self.assertEqual(len(self.server.messages), 2)
+
+    def test_new_overdue_loan_gets_a_full_digest(self):
+        self.run_command()
+        curtain = Book.objects.get(title="Curtain")
+        BookInstance.objects.create(
+            book=curtain, imprint="Fontana", status="o", borrower=self.alice,
+            due_back=datetime.date.today() - datetime.timedelta(days=1),
+        )
+        self.assertIn("Queued 1 reminders covering 3 overdue loans", self.run_command())
+
+    def test_queueing_reads_loans_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(reminders.enqueue(batch_size=1), (3, 4))
+        self.assertEqual(len([query for query in queries.captured_queries if query["sql"].startswith("SELECT")]), 1)
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_queue_only(self):
+        self.run_command("--queue-only")
+        self.assertEqual(self.server.messages, [])
+        self.assertEqual(Message.objects.count(), 3)
@@ -0,0 +1,83 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from catalog import search, visits
+from catalog.models import Author, VisitCounter
+from local_library import routers
+
+# "replica" is a second local test database that nothing replicates to: the
+# same author is stored on both under different first names, so a response
+# shows which database served it. local_library/test_settings.py defines it
+@skipUnless("replica" in settings.DATABASES, "needs the replica database of local_library.test_settings")
+@override_settings(REPLICA_DATABASES=["replica"], REPLICA_PIN_SECONDS=60, REPLICA_CACHE_TIMEOUT=5)
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="1X<ISRUkw+tuK")
+        self.author = Author.objects.create(first_name="Primary", last_name="Lovelace")
+        # bulk_create skips the signals, which index and cache on the primary
+        Author.objects.using("replica").bulk_create([Author(pk=self.author.pk, first_name="Replica", last_name="Lovelace")])
+        search.get_backend(connections["replica"]).rebuild()
+        self.client.force_login(self.user)
+
+    def first_name(self):
+        response = self.client.get(f"/api/authors/{self.author.pk}/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["first_name"]
+
+    def searched_name(self):
+        response = self.client.get(reverse("catalog:search"), {"search": "lovelace"})
+        return response.context["results"][0].object.first_name
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.first_name(), "Replica")
+        self.assertEqual(self.searched_name(), "Replica")
+
+    def test_writes_go_to_the_primary_and_pin_the_writer(self):
+        response = self.client.post("/api/authors/", {"first_name": "Ada", "last_name": "Byron"})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Author.objects.using("default").filter(last_name="Byron").exists())
+        self.assertFalse(Author.objects.using("replica").filter(last_name="Byron").exists())
+        # the writer reads their writes
+        self.assertEqual(self.first_name(), "Primary")
+        self.assertEqual(self.searched_name(), "Primary")
+
+        # others don't
+        other = User.objects.create_user(username="other")
+        self.client.force_login(other)
+        self.assertEqual(self.first_name(), "Replica")
+
+        # and the pin runs out
+        self.client.force_login(self.user)
+        cache.delete(routers.PIN_CACHE_KEY.format(self.user.pk))
+        self.assertEqual(self.first_name(), "Replica")
+
+    def test_only_marked_reads_use_the_replica(self):
+        self.assertEqual(router.db_for_read(Author), "default")
+        with routers.replica_reads(self.user):
+            self.assertEqual(router.db_for_read(Author), "replica")
+            self.assertEqual(router.db_for_write(Author), "default")
+            self.assertEqual(routers.cache_timeout(None), 5)
+            # a transaction reads its own writes
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Author), "default")
+        self.assertEqual(routers.cache_timeout(None), None)
+
+    def test_visit_counts_are_read_from_the_primary(self):
+        # cached until the next flush, so a replica lagging behind one would stick
+        VisitCounter.objects.create(name="index", count=5)
+        VisitCounter.objects.using("replica").bulk_create([VisitCounter(name="index", count=1)])
+        with routers.replica_reads(self.user):
+            self.assertEqual(visits.persisted("index"), 5)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.assertEqual(self.first_name(), "Primary")
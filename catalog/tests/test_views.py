@@ -1,19 +1,380 @@
 import datetime
 import uuid
+from unittest import mock
 
 from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
+from django.db import connection
 from django.http import response
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from catalog import autocomplete, fragments, search
 from catalog.models import Author, Book, BookInstance, Genre, Language
 
+# testing index page stats
+class IndexViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        test_author = Author.objects.create(first_name="Ida", last_name="Index")
+        Genre.objects.create(name="Poetry")
+        test_book = Book.objects.create(
+            title = "Counting Rhymes",
+            summary = "One, two, three",
+            isbn = "COUNT",
+            author = test_author,
+        )
+        for status in ("a", "a", "o"):
+            BookInstance.objects.create(book=test_book, imprint="Stats Press, 1900", status=status)
+
+    def test_index_shows_catalog_counts(self):
+        response = self.client.get(reverse("catalog:index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["num_books"], 1)
+        self.assertEqual(response.context["num_instances"], 3)
+        self.assertEqual(response.context["num_instances_available"], 2)
+        self.assertEqual(response.context["num_authors"], 1)
+        self.assertEqual(response.context["num_genres"], 1)
+
+    def test_cached_counts_skip_count_queries(self):
+        self.client.get(reverse("catalog:index"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("catalog:index"))
+        self.assertFalse(any("COUNT" in query["sql"] for query in queries.captured_queries))
+
+    def test_counts_refresh_after_write(self):
+        self.client.get(reverse("catalog:index"))
+        with self.captureOnCommitCallbacks(execute=True):
+            BookInstance.objects.filter(status="o").get().delete()
+        response = self.client.get(reverse("catalog:index"))
+        self.assertEqual(response.context["num_instances"], 2)
+
+# testing full-text search
+class SearchViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name="Ursula", middle_name="Kroeber", last_name="Le Guin")
+        cls.exact = Book.objects.create(
+            title = "The Dispossessed",
+            summary = "An ambiguous utopia.",
+            isbn = "9780061054884",
+            author = cls.author,
+        )
+        cls.mention = Book.objects.create(
+            title = "Four Ways to Forgiveness",
+            summary = "Stories set near the dispossessed worlds of Werel and Yeowe.",
+            isbn = "9780061057694",
+            author = cls.author,
+        )
+        for number in range(12):
+            Book.objects.create(title=f"Earthsea {number}", summary="Wizards", isbn=f"EARTH{number}", author=cls.author)
+
+    def test_title_match_ranks_above_summary_match(self):
+        response = self.client.get(reverse("catalog:search"), {"search": "dispossessed"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hit.object for hit in response.context["results"]], [self.exact, self.mention])
+
+    def test_search_by_isbn(self):
+        response = self.client.get(reverse("catalog:search"), {"search": "9780061057694"})
+        self.assertEqual([hit.object for hit in response.context["results"]], [self.mention])
+
+    def test_search_by_author_middle_name(self):
+        response = self.client.get(reverse("catalog:search"), {"search": "kroeber"})
+        self.assertEqual([(hit.kind, hit.object) for hit in response.context["results"]], [("author", self.author)])
+
+    def test_results_are_paginated(self):
+        response = self.client.get(reverse("catalog:search"), {"search": "earthsea", "page": 2})
+        self.assertTrue(response.context["is_paginated"])
+        self.assertEqual(response.context["page_obj"].paginator.count, 12)
+        self.assertEqual(len(response.context["results"]), 2)
+
+    def test_matches_are_bounded(self):
+        with mock.patch.object(search, "MAX_CANDIDATES", 5):
+            response = self.client.get(reverse("catalog:search"), {"search": "earthsea"})
+            self.assertEqual(response.context["page_obj"].paginator.count, 5)
+            self.assertEqual(len(response.context["results"]), 5)
+            self.assertEqual(len(search.ranked_ids("earthsea", "book", 10)), 5)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.exact.title = "The Left Hand of Darkness"
+        self.exact.save()
+        response = self.client.get(reverse("catalog:search"), {"search": "darkness"})
+        self.assertEqual([hit.object for hit in response.context["results"]], [self.exact])
+
+        self.mention.delete()
+        response = self.client.get(reverse("catalog:search"), {"search": "forgiveness"})
+        self.assertEqual(list(response.context["results"]), [])
+
+    def test_empty_search(self):
+        response = self.client.get(reverse("catalog:search"), {"search": ""})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["results"]), [])
+
+# testing search-as-you-type suggestions
+class AutocompleteViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name="Octavia", middle_name="Estelle", last_name="Butler")
+        self.book = Book.objects.create(title="Parable of the Sower", summary="Earthseed", isbn="SOWER", author=self.author)
+        for number in range(15):
+            Book.objects.create(title=f"Patternist {number}", summary="Psionics", isbn=f"PATTERN{number}", author=self.author)
+        autocomplete.build()
+
+    def test_matches_start_of_any_word(self):
+        response = self.client.get(reverse("catalog:autocomplete"), {"q": "sow"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [
+            {"kind": "book", "label": "Parable of the Sower", "url": reverse("catalog:book_detail", args=[self.book.pk])},
+        ])
+
+    def test_matches_author_names(self):
+        response = self.client.get(reverse("catalog:autocomplete"), {"q": "octavia est"})
+        self.assertEqual([result["label"] for result in response.json()["results"]], [str(self.author)])
+
+    def test_result_count_is_bounded(self):
+        response = self.client.get(reverse("catalog:autocomplete"), {"q": "pat", "limit": 100})
+        self.assertEqual(len(response.json()["results"]), autocomplete.MAX_RESULTS)
+
+    def test_lookup_does_not_query_database(self):
+        with self.assertNumQueries(0):
+            self.client.get(reverse("catalog:autocomplete"), {"q": "parable"})
+
+    def test_index_follows_updates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = "Kindred"
+            self.book.save()
+        response = self.client.get(reverse("catalog:autocomplete"), {"q": "parable"})
+        self.assertEqual(response.json()["results"], [])
+        response = self.client.get(reverse("catalog:autocomplete"), {"q": "kin"})
+        self.assertEqual([result["label"] for result in response.json()["results"]], ["Kindred"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        response = self.client.get(reverse("catalog:autocomplete"), {"q": "kin"})
+        self.assertEqual(response.json()["results"], [])
+
+    def other_worker_writes(self, change):
+        # publish without this worker's signal receivers applying the change
+        with mock.patch.dict(autocomplete._state, built=False, version=None):
+            autocomplete._publish(change)
+        autocomplete._state["checked"] = 0.0
+
+    def test_changes_of_other_workers_are_applied_without_a_reload(self):
+        self.other_worker_writes(("book", self.book.pk, "Kindred", ["Kindred"]))
+        self.other_worker_writes(("author", self.author.pk, None, None))
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete.suggest("kin"), [("book", self.book.pk, "Kindred")])
+        self.assertEqual(autocomplete.suggest("octavia"), [])
+
+    def test_missed_changes_reload(self):
+        self.other_worker_writes(("book", self.book.pk, "Kindred", ["Kindred"]))
+        cache.delete(autocomplete.CHANGE_CACHE_KEY.format(cache.get(autocomplete.VERSION_CACHE_KEY)))
+        # missing at first: it may be about to be published
+        self.assertEqual(autocomplete.suggest("kin"), [])
+        autocomplete._state["checked"] = 0.0
+        with self.assertNumQueries(2):
+            autocomplete.suggest("kin")
+
+    def test_updates_leave_the_keys_being_read_alone(self):
+        index = autocomplete.PrefixIndex()
+        index.load([("book", 1, "Kindred", ["Kindred"]), ("book", 2, "Dawn", ["Dawn"])])
+        keys = index._keys
+        index.add("book", 3, "Imago", ["Imago"])
+        index.remove("book", 1)
+        self.assertEqual(keys, [("dawn", "book", 2), ("kindred", "book", 1)])
+        self.assertEqual(index.lookup("i"), [("book", 3, "Imago")])
+
+# testing detail view query counts
+class DetailViewQueryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name="Terry", last_name="Pratchett")
+        language = Language.objects.create(name="English")
+        genres = [Genre.objects.create(name=name) for name in ("Fantasy", "Satire")]
+        cls.book = Book.objects.create(title="Mort", summary="Death takes an apprentice.", isbn="MORT", author=cls.author, language=language)
+        cls.book.genre.set(genres)
+        for number in range(25):
+            Book.objects.create(title=f"Discworld {number:02}", summary="Turtles", isbn=f"DISC{number}", author=cls.author)
+        for status in "aaaoomr":
+            BookInstance.objects.create(book=cls.book, imprint="Gollancz, 1987", status=status, due_back=datetime.date.today())
+
+    def setUp(self):
+        # pages are cached as fragments; start every test from a miss
+        cache.clear()
+
+    def test_book_detail_query_count_is_fixed(self):
+        # Last-Modified, book, genres, copies
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("catalog:book_detail", args=[self.book.pk]))
+        self.assertEqual(response.status_code, 200)
+        book = response.context["book"]
+        self.assertEqual(book.copies_total, 7)
+        self.assertEqual(book.copies_available, 3)
+        self.assertEqual(book.copies_on_loan, 2)
+        self.assertEqual(book.copies_maintenance, 1)
+        self.assertEqual(book.copies_reserved, 1)
+
+    def test_author_detail_paginates_books(self):
+        # Last-Modified, author, book count, one page of books
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("catalog:author_detail", args=[self.author.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["is_paginated"])
+        self.assertEqual(len(response.context["book_list"]), 10)
+
+        response = self.client.get(reverse("catalog:author_detail", args=[self.author.pk]) + "?page=3")
+        self.assertEqual(len(response.context["book_list"]), 6)
+
+    def test_book_detail_paginates_copies(self):
+        url = reverse("catalog:book_detail", args=[self.book.pk])
+        with mock.patch("catalog.views.BookDetailView.paginate_copies_by", 5):
+            response = self.client.get(url)
+            self.assertTrue(response.context["is_paginated"])
+            self.assertEqual([copy.status for copy in response.context["copy_list"]], list("aaamo"))
+            response = self.client.get(url + "?page=2")
+        self.assertEqual([copy.status for copy in response.context["copy_list"]], list("or"))
+
+class FragmentCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name="Ursula", last_name="Le Guin")
+        cls.genre = Genre.objects.create(name="Science Fiction")
+        cls.book = Book.objects.create(title="The Dispossessed", summary="Anarres", isbn="DISPOSSESSED", author=cls.author)
+        cls.book.genre.set([cls.genre])
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint="Harper, 1974", status="a")
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_hit_skips_the_database(self):
+        for url in (
+            reverse("catalog:book_detail", args=[self.book.pk]),
+            reverse("catalog:author_detail", args=[self.author.pk]),
+            reverse("catalog:book_list"),
+            reverse("catalog:author_list"),
+        ):
+            first = self.get(url)
+            # only the Last-Modified aggregate
+            with self.assertNumQueries(1):
+                self.assertEqual(self.get(url), first)
+
+    def test_book_page_follows_its_rows(self):
+        url = reverse("catalog:book_detail", args=[self.book.pk])
+        self.assertIn("Available: <strong>1</strong>", self.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.copy.status = "o"
+            self.copy.save()
+        self.assertIn("Available: <strong>0</strong>", self.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = "U. K."
+            self.author.save()
+        self.assertIn("Le Guin, U. K.", self.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.name = "Utopian fiction"
+            self.genre.save()
+        self.assertIn("Utopian fiction", self.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.delete()
+        self.assertNotIn("Utopian fiction", self.get(url))
+
+    def test_language_edits_bump_one_name(self):
+        language = Language.objects.create(name="English")
+        Book.objects.filter(pk=self.book.pk).update(language=language)
+        url = reverse("catalog:book_detail", args=[self.book.pk])
+        self.assertIn("English", self.get(url))
+        self.assertEqual(fragments.affected(Language, [language.pk]), {"language_list", "book_list"})
+        with self.captureOnCommitCallbacks(execute=True):
+            language.name = "Anarresti"
+            language.save()
+        self.assertIn("Anarresti", self.get(url))
+
+    def test_lists_follow_new_rows(self):
+        self.assertNotIn("The Left Hand of Darkness", self.get(reverse("catalog:book_list")))
+        self.assertNotIn("The Left Hand of Darkness", self.get(reverse("catalog:author_detail", args=[self.author.pk])))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title="The Left Hand of Darkness", summary="Gethen", isbn="LEFTHAND", author=self.author)
+        self.assertIn("The Left Hand of Darkness", self.get(reverse("catalog:book_list")))
+        self.assertIn("The Left Hand of Darkness", self.get(reverse("catalog:author_detail", args=[self.author.pk])))
+
+    def test_superusers_get_their_own_list(self):
+        self.assertNotIn("Create Book", self.get(reverse("catalog:book_list")))
+        admin = User.objects.create_superuser(username="admin", password="1X<ISRUkw+tuK")
+        self.client.force_login(admin)
+        self.assertIn("Create Book", self.get(reverse("catalog:book_list")))
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name="Ursula", last_name="Le Guin")
+        cls.book = Book.objects.create(title="The Dispossessed", summary="Anarres", isbn="DISPOSSESSED", author=cls.author)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint="Harper, 1974", status="a")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse("catalog:book_detail", args=[self.book.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        # the version lookup and the Last-Modified aggregate; nothing is loaded
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_write_changes_the_validators(self):
+        url = reverse("catalog:book_list")
+        first = self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = "The Dispossessed: An Ambiguous Utopia"
+            self.book.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertIn("An Ambiguous Utopia", response.content.decode())
+
+    def test_if_modified_since(self):
+        url = reverse("catalog:author_detail", args=[self.author.pk])
+        last_modified = self.client.get(url)["Last-Modified"]
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # a change to one of the author's books changes the page
+        Book.objects.filter(pk=self.book.pk).update(updated_at=timezone.now() + datetime.timedelta(seconds=2))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_etag_varies_on_the_user(self):
+        url = reverse("catalog:book_list")
+        anonymous = self.client.get(url)["ETag"]
+        self.client.force_login(User.objects.create_user(username="reader"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=anonymous).status_code, 200)
+
 # tesing class-based views
 class AuthorListViewTest(TestCase):
 
     def setUp(self):
         """set up mock data for tests"""
+        cache.clear()
         number_of_authors = 13
 
         for author_id in range(number_of_authors):
@@ -50,6 +411,34 @@ class AuthorListViewTest(TestCase):
         self.assertTrue(response.context["is_paginated"] == True)
         self.assertEqual(len(response.context["author_list"]), 3)
 
+    def test_keyset_pagination_walks_all_authors(self):
+        response = self.client.get(reverse("catalog:author_list") + "?cursor=")
+        self.assertEqual(response.status_code, 200)
+        first_page = list(response.context["author_list"])
+        self.assertEqual(len(first_page), 10)
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+        next_cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("catalog:author_list"), {"cursor": next_cursor})
+        second_page = list(response.context["author_list"])
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(response.context["page_obj"].has_next())
+        self.assertEqual(first_page + second_page, list(Author.objects.order_by("last_name", "first_name", "middle_name", "id")))
+
+        previous_cursor = response.context["page_obj"].previous_cursor
+        response = self.client.get(reverse("catalog:author_list"), {"cursor": previous_cursor})
+        self.assertEqual(list(response.context["author_list"]), first_page)
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+    def test_keyset_pagination_skips_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("catalog:author_list") + "?cursor=")
+        self.assertFalse(any("COUNT" in query["sql"] for query in queries.captured_queries))
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse("catalog:author_list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
 # tests for login required views
 class LoanedBookInstanceByUserListView(TestCase):
 
@@ -157,6 +546,85 @@ class LoanedBookInstanceByUserListView(TestCase):
                 self.assertTrue(last_date <= book.due_back)
                 last_date = book.due_back
 
+    def test_keyset_pages_follow_due_date_including_undated_loans(self):
+        undated = BookInstance.objects.all()[:3]
+        for book in BookInstance.objects.all():
+            book.status = "o"
+            book.due_back = None if book in undated else book.due_back
+            book.save()
+
+        login = self.client.login(username="testuserone", password="1X<ISRUkw+tuK")
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            response = self.client.get(reverse("catalog:my_borrowed"), {"cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.context["bookinstance_list"])
+            cursor = response.context["page_obj"].next_cursor
+
+        expected = BookInstance.objects.filter(borrower__username="testuserone", status="o")
+        self.assertEqual(len(seen), expected.count())
+        self.assertEqual(set(seen), set(expected))
+        dated = [book.due_back for book in seen if book.due_back is not None]
+        self.assertEqual(dated, sorted(dated))
+        self.assertTrue(all(book.due_back is None for book in seen[:len(seen) - len(dated)]))
+
+class OverdueReportViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="librarian", password="1X<ISRUkw+tuK")
+        cls.staff.user_permissions.add(Permission.objects.get(codename="can_mark_returned"))
+        User.objects.create_user(username="reader", password="2HJ1vRV0Z&3iD")
+        borrowers = [User.objects.create_user(username=f"borrower{number}") for number in range(3)]
+
+        author = Author.objects.create(first_name="Hank", last_name="Hagg")
+        book = Book.objects.create(title="Scary Book Title", summary="All the scary details", isbn="XXXXX", author=author)
+        today = datetime.date.today()
+        for copy in range(40):
+            BookInstance.objects.create(
+                book=book,
+                imprint="Old Publisher, 1800",
+                borrower=borrowers[copy % 3],
+                # every fourth copy is still in time, every fifth is not on loan
+                due_back=today + datetime.timedelta(days=3 if copy % 4 == 0 else -(copy + 1)),
+                status="m" if copy % 5 == 0 else "o",
+            )
+
+    def test_requires_permission(self):
+        self.client.login(username="reader", password="2HJ1vRV0Z&3iD")
+        response = self.client.get(reverse("catalog:overdue"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_pages_through_overdue_loans_grouped_by_borrower(self):
+        self.client.login(username="librarian", password="1X<ISRUkw+tuK")
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("catalog:overdue"), {"cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            # one query for the page, none per row; the rest is session and permissions
+            page_queries = [
+                query for query in queries.captured_queries
+                if "catalog_bookinstance" in query["sql"] and "MAX(" not in query["sql"]
+            ]
+            self.assertEqual(len(page_queries), 1)
+            seen.extend(response.context["bookinstance_list"])
+            cursor = response.context["page_obj"].next_cursor
+
+        expected = [copy for copy in BookInstance.objects.all() if copy.status == "o" and copy.is_overdue]
+        self.assertEqual(len(seen), len(expected))
+        self.assertEqual(set(seen), set(expected))
+        self.assertEqual(seen, sorted(seen, key=lambda copy: (copy.borrower_id, copy.due_back)))
+
+    def test_first_page_without_cursor(self):
+        self.client.login(username="librarian", password="1X<ISRUkw+tuK")
+        response = self.client.get(reverse("catalog:overdue"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["page_obj"].is_keyset)
+        self.assertContains(response, "borrower0")
+
 # testing form view
 class RenewBookInstanceViewTest(TestCase):
 
@@ -0,0 +1,72 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from catalog import visits
+from catalog.models import VisitCounter
+
+def _writes(queries):
+    return [query["sql"] for query in queries.captured_queries if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+
+@override_settings(VISIT_COUNTING="cache", VISIT_FLUSH_THRESHOLD=3)
+class BufferedVisitsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def visit(self):
+        response = self.client.get(reverse("catalog:index"))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_counts_without_writing_every_visit(self):
+        seen = []
+        for number in range(5):
+            with CaptureQueriesContext(connection) as queries:
+                seen.append(self.visit().context["num_visits"])
+            # only the visit that reaches the threshold writes (the first flush creates the row)
+            self.assertEqual(bool(_writes(queries)), number == 2)
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+        self.assertEqual(VisitCounter.objects.get(name="index").count, 3)
+        self.assertEqual(visits.pending("index"), 2)
+        self.assertNotIn("sessionid", self.client.cookies)
+
+    def test_flush_command(self):
+        for _ in range(2):
+            self.visit()
+        out = io.StringIO()
+        call_command("flush_visits", stdout=out)
+        self.assertIn("Flushed 2 visits.", out.getvalue())
+        self.assertEqual(VisitCounter.objects.get(name="index").count, 2)
+        self.assertEqual(visits.pending("index"), 0)
+        self.assertEqual(self.visit().context["num_visits"], 2)
+
+    def test_flush_is_skipped_while_another_runs(self):
+        self.visit()
+        cache.add("visits:flushing:index", 1)
+        self.assertEqual(visits.flush("index"), 0)
+        self.assertEqual(visits.pending("index"), 1)
+
+@override_settings(VISIT_COUNTING="cookie")
+class CookieVisitsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_in_a_cookie(self):
+        for number in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("catalog:index"))
+            self.assertEqual(_writes(queries), [])
+            self.assertEqual(response.context["num_visits"], number)
+            self.assertEqual(response.cookies[visits.COOKIE_NAME].value, str(number + 1))
+        self.assertFalse(VisitCounter.objects.exists())
+
+    def test_ignores_a_bad_cookie(self):
+        self.client.cookies[visits.COOKIE_NAME] = "many"
+        self.assertEqual(self.client.get(reverse("catalog:index")).context["num_visits"], 0)
@@ -1,18 +1,26 @@
+from django.conf import settings
 from django.conf.urls import url
 from django.urls import include, path
 from catalog import views
+from local_library.async_views import async_view
+from local_library.routers import replica_view
+
+# the read-only pages read from the replicas, and run as async views when serving under ASGI
+read = (lambda view: async_view(replica_view(view))) if settings.ASYNC_VIEWS else replica_view
 
 app_name = "catalog"
 
 urlpatterns = [
-    path("", views.index, name="index"),
-    path("books/", views.BookListView.as_view(), name="book_list" ),
-    path("book/<int:pk>/", views.BookDetailView.as_view(), name="book_detail"),
-    path("authors/", views.AuthorListView.as_view(), name="author_list"),
-    path("author/<int:pk>/", views.AuthorDetailView.as_view(), name="author_detail"),
-    path("search", views.search, name="search"),
-    path("mybooks/", views.LoanedBooksByUserListView.as_view(), name="my_borrowed"),
-    path("borrowed/", views.LoanedBooksStaffListView.as_view(), name="all_borrowed"),
+    path("", read(views.index), name="index"),
+    path("books/", read(views.BookListView.as_view()), name="book_list" ),
+    path("book/<int:pk>/", read(views.BookDetailView.as_view()), name="book_detail"),
+    path("authors/", read(views.AuthorListView.as_view()), name="author_list"),
+    path("author/<int:pk>/", read(views.AuthorDetailView.as_view()), name="author_detail"),
+    path("search", read(views.search), name="search"),
+    path("autocomplete/", read(views.autocomplete), name="autocomplete"),
+    path("mybooks/", replica_view(views.LoanedBooksByUserListView.as_view()), name="my_borrowed"),
+    path("borrowed/", replica_view(views.LoanedBooksStaffListView.as_view()), name="all_borrowed"),
+    path("overdue/", replica_view(views.OverdueReportView.as_view()), name="overdue"),
     path("book/<uuid:pk>/renew/", views.renew_book_librarian, name="renew_book_librarian"),
     path("author/create/", views.AuthorCreate.as_view(), name="author_create"),
     path("author/<int:pk>/update/", views.AuthorUpdate.as_view(), name="author_update"),
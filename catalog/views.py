@@ -3,79 +3,202 @@ import datetime
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core import mail
+from django.core.paginator import Paginator
 from django.db.models import Q
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls.base import reverse, reverse_lazy
 from django.views import generic
 from django.views.generic import CreateView, UpdateView, DeleteView
 
+from catalog import autocomplete as autocomplete_index
+from catalog import conditional, fragments
+from catalog import search as search_index
+from catalog import stats, visits
+from catalog.conditional import ConditionalGetMixin
 from catalog.forms import RenewBookForm
+from catalog.fragments import FragmentCacheMixin
+from catalog.pagination import KeysetPaginationMixin
 from catalog.models import Author, Book, BookInstance, Genre
 
 # index page view.
 def index(request):
     """View for rendering index page"""
-    # get count for book and instance objects
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-    # available books
-    num_instances_available = BookInstance.objects.filter(status__exact="a").count()
-    # get author count
-    num_authors = Author.objects.all().count()
-    # number of genres
-    num_genres = Genre.objects.all().count()
-    # number of visits, counted with the session variable
-    num_visits = request.session.get("num_visits", 0)
-    request.session["num_visits"] = num_visits + 1
+    # counters come from the cache, refreshed after catalog writes
+    catalog_stats = stats.get_stats()
+    # number of visits, buffered in the cache or kept in a cookie (no session write)
+    if visits.uses_cookie():
+        num_visits = visits.from_cookie(request)
+    else:
+        num_visits = visits.record("index")
     # context dict to pass to template
     context = {
-        "num_books": num_books,
-        "num_instances": num_instances,
-        "num_instances_available": num_instances_available,
-        "num_genres": num_genres,
-        "num_authors": num_authors,
+        **catalog_stats,
         "num_visits": num_visits,
     }
-    return render(request, "catalog/index.html", context)
+    response = render(request, "catalog/index.html", context)
+    if visits.uses_cookie():
+        visits.set_cookie(response, num_visits)
+    return response
 
 # class-based views
-class BookListView(generic.ListView):
+class BookListView(ConditionalGetMixin, FragmentCacheMixin, KeysetPaginationMixin, generic.ListView):
     model = Book
     template_name = "catalog/book_list.html"
+    fragment_template_name = "catalog/fragments/book_list.html"
     paginate_by = 10
+    keyset_ordering = ["title"]
+
+    def get_etag_names(self):
+        return ["book_list"]
+
+    def get_last_modified(self):
+        return conditional.last_modified(Book.objects.all())
+
+    def get_fragment_names(self):
+        return ["book_list"]
+
+    def get_fragment_vary(self):
+        return super().get_fragment_vary() + [self.request.user.is_superuser]
 
-class AuthorListView(generic.ListView):
+class AuthorListView(ConditionalGetMixin, FragmentCacheMixin, KeysetPaginationMixin, generic.ListView):
     model = Author
     template_name = "catalog/author_list.html"
+    fragment_template_name = "catalog/fragments/author_list.html"
     paginate_by = 10
 
-class BookDetailView(generic.DetailView):
+    def get_etag_names(self):
+        return ["author_list"]
+
+    def get_last_modified(self):
+        return conditional.last_modified(Author.objects.all())
+
+    def get_fragment_names(self):
+        return ["author_list"]
+
+    def get_fragment_vary(self):
+        return super().get_fragment_vary() + [self.request.user.is_superuser]
+
+class BookDetailView(ConditionalGetMixin, FragmentCacheMixin, generic.DetailView):
     model = Book
     template_name = "catalog/book_detail.html"
+    fragment_template_name = "catalog/fragments/book_detail.html"
+    changes_daily = True
+    paginate_copies_by = 50
 
-class AuthorDetailView(generic.DetailView):
+    def get_etag_names(self):
+        return self.get_fragment_names()
+
+    def get_last_modified(self):
+        # copy changes update the book's counters, and so its updated_at
+        return conditional.last_modified(Book.objects.filter(pk=self.kwargs["pk"]), "updated_at", "author__updated_at")
+
+    def get_fragment_names(self):
+        return fragments.book_page_names(self.kwargs["pk"])
+
+    def get_fragment_vary(self):
+        # overdue copies are highlighted, which changes with the date
+        return super().get_fragment_vary() + [datetime.date.today()]
+
+    def get_queryset(self):
+        # book, author and language in one query (copy counts are stored on
+        # the book), then one query for the genres
+        return Book.objects.select_related("author", "language").prefetch_related("genre")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # page through the copies instead of rendering all of them; the
+        # stored copies_total saves counting them
+        copies = BookInstance.objects.filter(book=self.object).only("id", "book_id", "status", "due_back")
+        paginator = Paginator(copies.order_by("status", "due_back", "id"), self.paginate_copies_by)
+        paginator.count = self.object.copies_total
+        page_obj = paginator.get_page(self.request.GET.get("page"))
+        context.update({
+            "copy_list": page_obj.object_list,
+            "page_obj": page_obj,
+            "is_paginated": page_obj.has_other_pages(),
+        })
+        return context
+
+class AuthorDetailView(ConditionalGetMixin, FragmentCacheMixin, generic.DetailView):
     model = Author
     template_name = "catalog/author_detail.html"
+    fragment_template_name = "catalog/fragments/author_detail.html"
+    paginate_books_by = 10
+
+    def get_etag_names(self):
+        return self.get_fragment_names()
+
+    def get_last_modified(self):
+        return conditional.last_modified(Author.objects.filter(pk=self.kwargs["pk"]), "updated_at", "book__updated_at")
+
+    def get_fragment_names(self):
+        return fragments.author_names([self.kwargs["pk"]])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # page through the author's books instead of rendering all of them
+        books = self.object.book_set.only("id", "title", "author").order_by("title", "id")
+        paginator = Paginator(books, self.paginate_books_by)
+        page_obj = paginator.get_page(self.request.GET.get("page"))
+        context.update({
+            "book_list": page_obj.object_list,
+            "page_obj": page_obj,
+            "is_paginated": page_obj.has_other_pages(),
+        })
+        return context
 
 # login required view
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+class LoanedBooksByUserListView(LoginRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, generic.ListView):
     model = BookInstance
     template_name = "catalog/bookinstance_list_borrowed_user.html"
     paginate_by = 10
+    changes_daily = True
+
+    def get_etag_names(self):
+        return ["copies", "book_list"]
+
+    def get_last_modified(self):
+        return conditional.last_modified(BookInstance.objects.filter(borrower=self.request.user), "updated_at", "book__updated_at")
 
     def get_queryset(self):
-        return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact="o").order_by("due_back")
+        return BookInstance.objects.filter(borrower=self.request.user).on_loan()
 
 # permission required view
-class LoanedBooksStaffListView(PermissionRequiredMixin, generic.ListView):
+class LoanedBooksStaffListView(PermissionRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, generic.ListView):
     model = BookInstance
     template_name = "catalog/bookinstance_list_borrowed_admin.html"
     permission_required = "catalog.can_mark_returned"
     paginate_by = 10
+    changes_daily = True
+
+    def get_etag_names(self):
+        return ["copies", "book_list"]
+
+    def get_last_modified(self):
+        return conditional.last_modified(BookInstance.objects.all())
 
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact="o").order_by("due_back")
+        return BookInstance.objects.on_loan()
+
+# overdue loans, grouped by borrower
+class OverdueReportView(PermissionRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, generic.ListView):
+    model = BookInstance
+    template_name = "catalog/bookinstance_list_overdue.html"
+    permission_required = "catalog.can_mark_returned"
+    paginate_by = 50
+    keyset_ordering = ["borrower", "due_back"]
+    keyset_default = True
+    changes_daily = True
+
+    def get_etag_names(self):
+        return ["copies", "book_list"]
+
+    def get_last_modified(self):
+        return conditional.last_modified(BookInstance.objects.all())
+
+    def get_queryset(self):
+        return BookInstance.objects.overdue().select_related("book", "borrower")
 
 # generic views editing for Author model
 class AuthorCreate(CreateView, PermissionRequiredMixin):
@@ -103,17 +226,33 @@ class BookDelete(DeleteView, PermissionRequiredMixin):
 
 # searching for book or author
 def search(request):
-    """searching for book title from search bar"""
-    user_search = request.GET['search']
-
-    if user_search:
-        books = Book.objects.filter(Q(title__icontains=user_search))
-        authors = Author.objects.all().filter(Q(first_name__icontains=user_search))
-        context = {
-            "books": books,
-            "authors": authors,
-            }
-        return render(request, "catalog/search.html", context)
+    """ranked full-text search over book titles, summaries and ISBNs, and author names"""
+    user_search = request.GET.get("search", "").strip()
+    results = search_index.search(user_search) if user_search else []
+
+    paginator = Paginator(results, 10)
+    page_obj = paginator.get_page(request.GET.get("page"))
+    context = {
+        "search": user_search,
+        "results": page_obj.object_list,
+        "page_obj": page_obj,
+        "is_paginated": page_obj.has_other_pages(),
+        }
+    return render(request, "catalog/search.html", context)
+
+# search-as-you-type suggestions
+def autocomplete(request):
+    """suggest book titles and author names for a partially typed search"""
+    try:
+        limit = int(request.GET.get("limit", autocomplete_index.MAX_RESULTS))
+    except ValueError:
+        limit = autocomplete_index.MAX_RESULTS
+
+    results = []
+    for kind, pk, label in autocomplete_index.suggest(request.GET.get("q", ""), limit):
+        url_name = "catalog:book_detail" if kind == "book" else "catalog:author_detail"
+        results.append({"kind": kind, "label": label, "url": reverse(url_name, args=[pk])})
+    return JsonResponse({"results": results})
 
 # for renewing books
 @login_required
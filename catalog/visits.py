@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from catalog.models import VisitCounter
+
+# page visit counting without a database write per visit
+#
+# "cache" mode counts visits in the cache and adds them to the page's
+# VisitCounter row in one UPDATE once VISIT_FLUSH_THRESHOLD are pending (or
+# when the flush_visits command runs). visits still pending when the cache
+# loses its entries are not counted, which is fine for a visit counter.
+# "cookie" mode keeps each visitor's own count in a cookie instead, as the
+# session did, and touches neither the cache nor the database.
+
+# the counted pages; the cache can't be listed, so flush_all() goes by these
+PAGES = ("index",)
+COOKIE_NAME = "num_visits"
+COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+# a flush holds this lock so two flushes never take the same pending visits
+FLUSH_LOCK_TIMEOUT = 60
+
+def _pending_key(name):
+    return f"visits:pending:{name}"
+
+def _count_key(name):
+    return f"visits:count:{name}"
+
+def uses_cookie():
+    return settings.VISIT_COUNTING == "cookie"
+
+def pending(name):
+    return cache.get(_pending_key(name)) or 0
+
+def persisted(name):
+    """return the page's count in the database, cached until the next flush"""
+    count = cache.get(_count_key(name))
+    if count is None:
+        # from the primary: a replica may not have the last flush yet, and
+        # this is cached until the next one
+        counters = VisitCounter.objects.using(DEFAULT_DB_ALIAS)
+        count = counters.filter(name=name).values_list("count", flat=True).first() or 0
+        cache.set(_count_key(name), count, None)
+    return count
+
+def record(name):
+    """count one visit of a page and return its visits before this one"""
+    key = _pending_key(name)
+    cache.add(key, 0, None)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, 1, None)
+        count = 1
+    if count >= settings.VISIT_FLUSH_THRESHOLD:
+        flush(name)
+    return persisted(name) + pending(name) - 1
+
+def flush(name):
+    """move a page's pending visits to its VisitCounter row, returning how many were moved"""
+    lock = f"visits:flushing:{name}"
+    if not cache.add(lock, 1, FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        taken = pending(name)
+        if not taken:
+            return 0
+        # decr() keeps the visits counted while this flush ran
+        cache.decr(_pending_key(name), taken)
+        if not VisitCounter.objects.filter(name=name).update(count=F("count") + taken):
+            counter, created = VisitCounter.objects.get_or_create(name=name, defaults={"count": taken})
+            if not created:
+                VisitCounter.objects.filter(name=name).update(count=F("count") + taken)
+        cache.delete(_count_key(name))
+        return taken
+    finally:
+        cache.delete(lock)
+
+def flush_all():
+    return sum(flush(name) for name in PAGES)
+
+def from_cookie(request):
+    """return the visitor's visits before this one, as counted by the cookie"""
+    try:
+        return max(int(request.COOKIES.get(COOKIE_NAME, 0)), 0)
+    except ValueError:
+        return 0
+
+def set_cookie(response, num_visits):
+    response.set_cookie(COOKIE_NAME, str(num_visits + 1), max_age=COOKIE_MAX_AGE, samesite="Lax")
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'local_library.settings')
 
 application = get_asgi_application()
+
+# each worker loads its autocomplete index before serving, not on a request
+from catalog import autocomplete  # noqa: E402
+
+autocomplete.warm()
@@ -0,0 +1,89 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+# async entry points for the read-only views, for serving under ASGI
+#
+# Django runs a sync view under ASGI in one shared thread, so a slow query
+# holds up every other request of the process. async_view() runs the view in
+# the thread pool instead, with that thread's own database connection, and
+# keeps the event loop free while it waits. writes stay in the shared thread,
+# where Django would run them anyway.
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def database_sync_to_async(func):
+    """sync_to_async in the thread pool, closing the thread's expired connections around func"""
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+def async_view(view):
+    """async version of a sync view that reads in the thread pool"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_to_async(view)(request, *args, **kwargs)
+
+        def respond():
+            response = view(request, *args, **kwargs)
+            # TemplateResponse renders later, and rendering can still query
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+            return response
+        return await database_sync_to_async(respond)()
+    return wrapper
+
+def async_patterns(patterns):
+    """the same URL patterns with async_view() views"""
+    return [
+        URLPattern(pattern.pattern, async_view(pattern.callback), pattern.default_args, pattern.name)
+        for pattern in patterns
+    ]
+
+def _in_own_thread(iterator):
+    """iterate in a thread of the iterator's own, with that thread's connections"""
+    def close():
+        try:
+            if hasattr(iterator, "close"):
+                iterator.close()
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            while (piece := executor.submit(next, iterator, None).result()) is not None:
+                yield piece
+        finally:
+            executor.submit(close).result()
+
+def streaming_content(iterator, request):
+    """
+    the body of a StreamingHttpResponse over an iterator that queries
+
+    under ASGI Django (4.2 on) reads a sync iterator into memory before sending
+    it, so the iterator is wrapped in an async one pulling each piece in the
+    shared sync thread, where its connection and server-side cursor stay.
+    older versions iterate on the event loop, where queries aren't allowed, so
+    each piece is pulled in a thread of the iterator's own instead (the loop
+    still waits for it, as it does for any sync iterator there).
+    """
+    if not isinstance(request, ASGIRequest):
+        return iterator
+    if django.VERSION < (4, 2):
+        return _in_own_thread(iterator)
+
+    async def pieces():
+        step = sync_to_async(next, thread_sensitive=True)
+        while (piece := await step(iterator, None)) is not None:
+            yield piece
+    return pieces()
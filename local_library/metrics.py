@@ -0,0 +1,244 @@
+import asyncio
+import contextvars
+import hmac
+import os
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+# per-view request metrics in Prometheus text format
+#
+# every request adds its latency, DB query count and DB time to an
+# in-process registry keyed by resolved URL name. each worker publishes a
+# cumulative snapshot of its registry to the cache every FLUSH_SECONDS, and
+# /metrics sums the snapshots of all workers. snapshots are cumulative, so a
+# lost or repeated flush never double counts.
+#
+# under ASGI a request's queries run in worker threads, on those threads'
+# connections; every connection therefore carries one execute wrapper that
+# hands the query to the timer of the request whose context it runs in.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+FLUSH_SECONDS = 10
+# a worker that stopped flushing drops out of the totals after this long
+SNAPSHOT_TTL = 24 * 60 * 60
+WORKERS_CACHE_KEY = "metrics:workers"
+UNRESOLVED = "<unresolved>"
+
+class QueryTimer:
+    """connection.execute_wrapper counting queries and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+# the QueryTimer of the request being served; sync_to_async copies it into
+# the threads that do the request's database work
+current_timer = contextvars.ContextVar("metrics_query_timer", default=None)
+
+def _dispatch(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+def install(connection, **kwargs):
+    """give a connection the timing execute wrapper, once"""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+connection_created.connect(install)
+
+def _empty_series():
+    # [requests, seconds, db queries, db seconds, latency buckets..., query buckets...]
+    return [0, 0.0, 0, 0.0] + [0] * (len(LATENCY_BUCKETS) + 1) + [0] * (len(QUERY_BUCKETS) + 1)
+
+class Registry:
+    """this worker's totals: series per (view, method), response counts per (view, method, status)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.series = {}
+        self.responses = {}
+        self._worker = None
+        self._flushed = 0.0
+
+    def observe(self, view, method, status, seconds, queries, db_seconds):
+        latency_bucket = 4 + bisect_left(LATENCY_BUCKETS, seconds)
+        query_bucket = 4 + len(LATENCY_BUCKETS) + 1 + bisect_left(QUERY_BUCKETS, queries)
+        with self._lock:
+            series = self.series.get((view, method))
+            if series is None:
+                series = self.series[view, method] = _empty_series()
+            series[0] += 1
+            series[1] += seconds
+            series[2] += queries
+            series[3] += db_seconds
+            series[latency_bucket] += 1
+            series[query_bucket] += 1
+            key = (view, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "series": {key: list(values) for key, values in self.series.items()},
+                "responses": dict(self.responses),
+            }
+
+    @property
+    def worker(self):
+        # gunicorn forks workers after import, so the id is made per process
+        if self._worker is None or self._worker[0] != os.getpid():
+            self._worker = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+        return self._worker[1]
+
+    def flush(self, force=False):
+        """publish this worker's snapshot to the cache, at most every FLUSH_SECONDS"""
+        now = time.monotonic()
+        if not force and now - self._flushed < FLUSH_SECONDS:
+            return
+        self._flushed = now
+        worker = self.worker
+        cache.set(f"metrics:worker:{worker}", self.snapshot(), SNAPSHOT_TTL)
+        workers = cache.get(WORKERS_CACHE_KEY) or []
+        if worker not in workers:
+            cache.set(WORKERS_CACHE_KEY, workers + [worker], None)
+
+registry = Registry()
+
+def collect():
+    """return the summed snapshots of every live worker"""
+    registry.flush(force=True)
+    workers = cache.get(WORKERS_CACHE_KEY) or []
+    snapshots = cache.get_many([f"metrics:worker:{worker}" for worker in workers])
+    # forget workers whose snapshot expired
+    live = [worker for worker in workers if f"metrics:worker:{worker}" in snapshots]
+    if live != workers:
+        cache.set(WORKERS_CACHE_KEY, live, None)
+
+    series, responses = {}, {}
+    for snapshot in snapshots.values():
+        for key, values in snapshot["series"].items():
+            total = series.setdefault(key, _empty_series())
+            for position, value in enumerate(values):
+                total[position] += value
+        for key, count in snapshot["responses"].items():
+            responses[key] = responses.get(key, 0) + count
+    return series, responses
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _histogram(lines, name, key, buckets, values, total):
+    view, method = key
+    cumulative = 0
+    for bound, count in zip(list(buckets) + ["+Inf"], values):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(view=view, method=method, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(view=view, method=method)} {total}")
+    lines.append(f"{name}_count{_labels(view=view, method=method)} {cumulative}")
+
+def render(series, responses):
+    """format the totals in the Prometheus text exposition format"""
+    first_query_bucket = 4 + len(LATENCY_BUCKETS) + 1
+    lines = [
+        "# HELP django_http_request_duration_seconds Request latency by view.",
+        "# TYPE django_http_request_duration_seconds histogram",
+    ]
+    for key, values in sorted(series.items()):
+        _histogram(lines, "django_http_request_duration_seconds", key, LATENCY_BUCKETS, values[4:first_query_bucket], values[1])
+    lines += [
+        "# HELP django_db_queries_per_request Database queries per request by view.",
+        "# TYPE django_db_queries_per_request histogram",
+    ]
+    for key, values in sorted(series.items()):
+        _histogram(lines, "django_db_queries_per_request", key, QUERY_BUCKETS, values[first_query_bucket:], values[2])
+    lines += [
+        "# HELP django_db_query_duration_seconds_total Time spent in database queries by view.",
+        "# TYPE django_db_query_duration_seconds_total counter",
+    ]
+    for (view, method), values in sorted(series.items()):
+        lines.append(f"django_db_query_duration_seconds_total{_labels(view=view, method=method)} {values[3]}")
+    lines += [
+        "# HELP django_http_responses_total Responses by view and status code.",
+        "# TYPE django_http_responses_total counter",
+    ]
+    for (view, method, status), count in sorted(responses.items()):
+        lines.append(f"django_http_responses_total{_labels(view=view, method=method, status=status)} {count}")
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """record latency, DB query count and DB time of every request, by resolved URL name"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # mark the instance as a coroutine function, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        for connection in connections.all():
+            install(connection)
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        registry.flush()
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        await sync_to_async(registry.flush, thread_sensitive=False)()
+        return response
+
+    def observe(self, request, response, elapsed, timer):
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED
+        registry.observe(view, request.method, response.status_code, elapsed, timer.count, timer.seconds)
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; requires "Authorization: Bearer <METRICS_TOKEN>", and without a token only serves under DEBUG"""
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(render(*collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,99 @@
+import functools
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# read replica routing
+#
+# writes always go to the primary ("default"). reads go to a random replica
+# (settings.REPLICA_DATABASES) only inside a replica_reads() block, which the
+# read-only catalog views and the API's list/retrieve actions open; any other
+# read, and every read inside a transaction, stays on the primary.
+#
+# replicas lag behind the primary, so a user who just wrote is pinned to the
+# primary for REPLICA_PIN_SECONDS (ReplicaPinMiddleware sets the pin after
+# every unsafe request) and reads back what they wrote. what is cached from a
+# replica read expires after REPLICA_CACHE_TIMEOUT, so a lagging replica can't
+# leave stale data in the cache under a current version.
+
+PIN_CACHE_KEY = "replica:pin:{}"
+
+_reading = ContextVar("replica_reads", default=False)
+
+def replicas():
+    return getattr(settings, "REPLICA_DATABASES", [])
+
+def pin(user):
+    """keep user's reads on the primary for REPLICA_PIN_SECONDS"""
+    if user.is_authenticated and replicas():
+        cache.set(PIN_CACHE_KEY.format(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(PIN_CACHE_KEY.format(user.pk)) is not None
+
+def start_replica_reads(user):
+    """route reads to a replica unless user is pinned; returns a token for stop_replica_reads(), or None"""
+    if not replicas() or is_pinned(user):
+        return None
+    return _reading.set(True)
+
+def stop_replica_reads(token):
+    if token is not None:
+        _reading.reset(token)
+
+class replica_reads:
+    """context manager reading from a replica for user, unless they are pinned"""
+
+    def __init__(self, user):
+        self.user = user
+
+    def __enter__(self):
+        self.token = start_replica_reads(self.user)
+
+    def __exit__(self, *exc_info):
+        stop_replica_reads(self.token)
+
+def replica_view(view):
+    """a read-only view that reads from a replica when serving GET and HEAD"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        with replica_reads(request.user):
+            response = view(request, *args, **kwargs)
+            # TemplateResponse renders later, and rendering can still query
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+    return wrapper
+
+def read_alias(user):
+    """a database to read from for user outside a replica_reads() block: a replica unless user is pinned"""
+    if not replicas() or is_pinned(user):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas())
+
+def reading_from_replica():
+    return _reading.get() and bool(replicas()) and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+def cache_timeout(timeout):
+    """the timeout for caching what was just read: short when it came from a replica"""
+    if not reading_from_replica():
+        return timeout
+    return settings.REPLICA_CACHE_TIMEOUT if timeout is None else min(timeout, settings.REPLICA_CACHE_TIMEOUT)
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return random.choice(replicas())
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every database holds the same rows
+        return True
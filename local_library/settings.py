@@ -47,12 +47,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'local_library.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'local_library.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'local_library.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -93,6 +95,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# shared memcached when a server list is configured, per-process memory otherwise
+if os.environ.get('MEMCACHED_SERVERS'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_SERVERS'].split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -167,6 +188,42 @@ db_from_env = dj_database_url.config(conn_max_age=600)
 DATABASES['default'].update(db_from_env)
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CatalogPagination',
     'PAGE_SIZE': 10
-}
\ No newline at end of file
+}
+
+# bulk create/update through the API: rows per INSERT/UPDATE and items per request
+API_BULK_BATCH_SIZE = 500
+API_BULK_MAX_ITEMS = 1000
+# seconds a rendered API list/detail response is kept in the cache; writes
+# supersede entries sooner (see api/views.py ResponseCacheMixin)
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 60 * 60))
+# seconds a change log row waits before the change feed serves it, so writes
+# committing out of id order are not skipped (see catalog/changes.py)
+CHANGE_FEED_SETTLE_SECONDS = int(os.environ.get('CHANGE_FEED_SETTLE_SECONDS', 10))
+
+# /metrics requires "Authorization: Bearer <token>"; without a token it is
+# only served when DEBUG is on
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# index page visits: 'cache' buffers a site-wide count in the cache and writes
+# it to the database every VISIT_FLUSH_THRESHOLD visits; 'cookie' counts each
+# visitor's own visits in a cookie and writes nothing
+VISIT_COUNTING = os.environ.get('VISIT_COUNTING', 'cache')
+VISIT_FLUSH_THRESHOLD = int(os.environ.get('VISIT_FLUSH_THRESHOLD', 100))
+
+# serve the read-only catalog pages and API reads as async views that query
+# in the thread pool; set when running under ASGI (see Procfile)
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == 'True'
+
+# read replicas, as comma-separated database URLs; the read-only pages and API
+# reads are served from them (see local_library/routers.py)
+REPLICA_DATABASES = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    DATABASES[f'replica{number}'] = dict(dj_database_url.parse(url, conn_max_age=600), TEST={'MIRROR': 'default'})
+    REPLICA_DATABASES.append(f'replica{number}')
+DATABASE_ROUTERS = ['local_library.routers.ReplicaRouter']
+# seconds a user's reads stay on the primary after they wrote
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+# seconds what was read from a replica may be cached, bounding what its lag can leave stale
+REPLICA_CACHE_TIMEOUT = int(os.environ.get('REPLICA_CACHE_TIMEOUT', 60))
@@ -0,0 +1,13 @@
+from local_library.settings import *  # noqa: F401,F403
+from local_library.settings import DATABASES
+
+# settings for running the test suite:
+#
+#   python manage.py test --settings=local_library.test_settings
+#
+# the replica routing tests (catalog/tests/test_replicas.py) read through a
+# second database that nothing replicates to, so they can tell which database
+# served a read. SQLite test databases are in memory, one per alias.
+DATABASES['replica'] = dict(DATABASES['default'], TEST={})
+if DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+    DATABASES['replica']['TEST'] = {'NAME': f"test_{DATABASES['default']['NAME']}_replica"}
@@ -17,10 +17,13 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import RedirectView
 
+from local_library import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', RedirectView.as_view(url='catalog/', permanent=True)),
     path('catalog/', include('catalog.urls')),
     path("accounts/", include("django.contrib.auth.urls")),
     path('api/', include('api.urls')),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
\ No newline at end of file